@@ -1,9 +1,15 @@
 from typing import Dict, Any, List, Optional
 from langgraph.graph import StateGraph, END
 import os
+import asyncio
+import random
+import uuid
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.store.postgres import PostgresStore
-from psycopg_pool import ConnectionPool
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
 
 from ..states.raggraph_state import RAGGraphState, create_initial_rag_state
 from ..contexts.raggraph_context import RAGContext
@@ -40,6 +46,12 @@ class RAGGraph:
         self.enable_checkpointer = enable_checkpointer
         self.conn_pool = None  # 初始化连接池引用
 
+        # 请求内节点级checkpoint（用于流式失败后从失败节点恢复），首次异步调用时懒加载
+        self.recovery_checkpointer = None
+        self.recovery_graph = None
+        self.async_conn_pool = None
+        self._recovery_lock = asyncio.Lock()
+
         # 存储用户配置的模型
         self.llm = llm
         self.embedding_model = embedding_model
@@ -85,10 +97,7 @@ class RAGGraph:
         if self.enable_checkpointer:
             try:
                 # 创建数据库连接字符串
-                connection_string = (
-                    f"postgresql://{self.db_config['user']}:{self.db_config['password']}"
-                    f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
-                )
+                connection_string = self._get_connection_string()
 
                 # 创建连接池
                 conn_pool = ConnectionPool(connection_string, min_size=1, max_size=5)
@@ -139,6 +148,13 @@ class RAGGraph:
 
     def _build_graph(self) -> None:
         """构建状态图"""
+        workflow = self._create_workflow()
+
+        # 编译图，启用checkpoint
+        self.graph = workflow.compile(checkpointer=self.checkpointer,store=self.memory_store)
+
+    def _create_workflow(self) -> StateGraph:
+        """创建未编译的状态图（节点和边）"""
         # 创建状态图，指定context_schema
         workflow = StateGraph(
             RAGGraphState,
@@ -161,8 +177,57 @@ class RAGGraph:
         # 添加边和条件边
         self._add_edges(workflow)
 
-        # 编译图，启用checkpoint
-        self.graph = workflow.compile(checkpointer=self.checkpointer,store=self.memory_store)
+        return workflow
+
+    def _get_connection_string(self) -> str:
+        """获取PostgreSQL连接字符串"""
+        return (
+            f"postgresql://{self.db_config['user']}:{self.db_config['password']}"
+            f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+        )
+
+    async def _ensure_recovery_graph(self):
+        """懒加载用于失败恢复的图
+
+        启用checkpointer时使用AsyncPostgresSaver（异步，不阻塞事件循环），
+        否则（或PostgreSQL不可用时）使用轻量的InMemorySaver。
+        每个节点执行完成后都会写入checkpoint，失败重试时只需从失败的节点继续。
+        """
+        if self.recovery_graph is not None:
+            return self.recovery_graph
+
+        async with self._recovery_lock:
+            if self.recovery_graph is not None:
+                return self.recovery_graph
+
+            checkpointer = None
+            if self.enable_checkpointer:
+                try:
+                    async_pool = AsyncConnectionPool(
+                        self._get_connection_string(),
+                        min_size=1,
+                        max_size=5,
+                        open=False,
+                        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+                    )
+                    await async_pool.open()
+                    checkpointer = AsyncPostgresSaver(conn=async_pool)
+                    await checkpointer.setup()
+                    self.async_conn_pool = async_pool
+                    print("[RAG Graph] AsyncPostgresSaver已启用（失败恢复）")
+                except Exception as e:
+                    print(f"[RAG Graph] AsyncPostgresSaver设置失败，使用内存checkpoint: {e}")
+                    checkpointer = None
+
+            if checkpointer is None:
+                checkpointer = InMemorySaver()
+
+            self.recovery_checkpointer = checkpointer
+            self.recovery_graph = self._create_workflow().compile(
+                checkpointer=checkpointer,
+                store=self.memory_store
+            )
+            return self.recovery_graph
 
     def _add_edges(self, workflow: StateGraph) -> None:
         """添加图的边和条件边"""
@@ -345,6 +410,99 @@ class RAGGraph:
             async for step in self.graph.astream(initial_state, context=context, config=config):
                 yield step
 
+    async def astream_resumable(
+        self,
+        input_data: Dict[str, Any],
+        context: RAGContext,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 8.0
+    ):
+        """可恢复的异步流式执行（mix模式，同时输出messages和updates）
+
+        每个节点的结果都会写入checkpoint。当流式执行抛出异常时，按有界指数退避等待后
+        以 None 作为输入继续执行，LangGraph会从最后一个checkpoint（即第一个失败的节点）恢复，
+        已成功的节点（及其LLM调用）不会重复执行。
+
+        启用PostgreSQL checkpoint且有session_id时直接在会话线程上执行，节点结果写入会话checkpoint，
+        多轮对话记忆与 astream 一致；否则（内存checkpoint）使用由会话ID派生的一次性线程，请求结束后清理。
+
+        失败节点重新执行时会重新输出LLM token，调用方收到 "retry" 后应丢弃 next_nodes 已输出的内容。
+
+        Args:
+            input_data: 输入数据，包含messages等字段
+            context: RAG上下文配置
+            max_retries: 最大重试次数
+            base_delay: 首次重试前的等待秒数
+            max_delay: 单次重试等待的上限秒数
+
+        Yields:
+            (mode, chunk) 元组；mode为 "messages"、"updates"，
+            或在每次重试前输出的 "retry"（chunk包含attempt、delay、error、next_nodes）
+
+        Raises:
+            Exception: 重试次数用尽后抛出最后一次的异常
+        """
+        graph = await self._ensure_recovery_graph()
+
+        session_thread_id = context.get_langgraph_config()["configurable"].get("thread_id")
+        use_session_thread = bool(
+            self.checkpointer and session_thread_id
+            and isinstance(self.recovery_checkpointer, AsyncPostgresSaver)
+        )
+        thread_id = session_thread_id if use_session_thread else (
+            f"{context.session_id or 'default'}:run:{uuid.uuid4().hex}"
+        )
+        config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "user_id": context.user_id
+            }
+        }
+
+        initial_state = create_initial_rag_state(
+            context=context,
+            input_data=input_data
+        )
+
+        attempt = 0
+        stream_input = initial_state
+        try:
+            while True:
+                try:
+                    async for step in graph.astream(stream_input, context=context, config=config, stream_mode=["messages", "updates"]):
+                        yield step
+                    return
+                except Exception as e:
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise
+
+                    snapshot = await graph.aget_state(config)
+                    next_nodes = list(snapshot.next) if snapshot else []
+                    # 本次输入还没有写入checkpoint（没有待执行的节点）时只能从头执行；
+                    # 会话线程上已结束的上一轮对话同样没有待执行节点，不会被误当作恢复点
+                    stream_input = None if next_nodes else initial_state
+
+                    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+                    delay = delay * (0.5 + random.random() / 2)  # 抖动，避免同时重试
+                    print(f"[RAG Graph] 流式执行失败，{delay:.2f}秒后从节点 {next_nodes} 恢复 (第{attempt}/{max_retries}次): {e}")
+                    yield "retry", {
+                        "attempt": attempt,
+                        "max_retries": max_retries,
+                        "delay": delay,
+                        "error": str(e),
+                        "next_nodes": next_nodes
+                    }
+                    await asyncio.sleep(delay)
+        finally:
+            # 一次性线程在请求结束后清理，会话线程保留
+            if not use_session_thread:
+                try:
+                    await self.recovery_checkpointer.adelete_thread(thread_id)
+                except Exception as cleanup_error:
+                    print(f"[RAG Graph] 清理请求checkpoint失败: {cleanup_error}")
+
     def get_state(self, thread_id: str) -> Optional[RAGGraphState]:
         """获取指定线程的状态
 
@@ -422,4 +580,15 @@ class RAGGraph:
                 self.conn_pool.close()
                 print("[RAG Graph] PostgreSQL连接池已关闭")
             except Exception as e:
-                print(f"[RAG Graph] 关闭连接池时出错: {e}")
\ No newline at end of file
+                print(f"[RAG Graph] 关闭连接池时出错: {e}")
+
+    async def aclose(self):
+        """关闭失败恢复使用的异步连接池"""
+        if self.async_conn_pool:
+            try:
+                await self.async_conn_pool.close()
+                print("[RAG Graph] PostgreSQL异步连接池已关闭")
+            except Exception as e:
+                print(f"[RAG Graph] 关闭异步连接池时出错: {e}")
+            finally:
+                self.async_conn_pool = None
\ No newline at end of file
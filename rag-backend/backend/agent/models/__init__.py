@@ -8,9 +8,14 @@ from .chat_model import (
 
 # 从 embeddings 模块导出  
 from .embeddings import (
+    CachedEmbeddings,
+    get_shared_embeddings,
     load_embeddings,
-    register_embeddings_provider
+    register_embeddings_provider,
+    with_embedding_cache
 )
+from .local_embeddings import LocalEmbeddings
+from .query_batcher import QueryBatchingEmbeddings, with_query_batching
 
 __all__ = [
     # 聊天模型相关
@@ -19,5 +24,11 @@ __all__ = [
     
     # 嵌入模型相关
     "load_embeddings", 
-    "register_embeddings_provider"
+    "register_embeddings_provider",
+    "CachedEmbeddings",
+    "get_shared_embeddings",
+    "with_embedding_cache",
+    "LocalEmbeddings",
+    "QueryBatchingEmbeddings",
+    "with_query_batching"
 ]
\ No newline at end of file
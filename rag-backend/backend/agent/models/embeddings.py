@@ -1,5 +1,11 @@
+import asyncio
+import hashlib
 import os
-from typing import Any, Optional, Union
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from langchain.embeddings.base import Embeddings, _SUPPORTED_PROVIDERS, init_embeddings
 from langchain_core.runnables import Runnable
@@ -8,6 +14,10 @@ from langchain_core.runnables import Runnable
 # 用于存储注册的嵌入模型提供方信息
 _EMBEDDINGS_PROVIDERS_DICT = {}
 
+# 进程内共享的嵌入模型实例（键通常为 模型名:维度）
+_SHARED_EMBEDDINGS: Dict[str, Embeddings] = {}
+_SHARED_EMBEDDINGS_LOCK = threading.Lock()
+
 
 def _parse_model_string(model_name: str) -> tuple[str, str]:
     """解析模型字符串，提取提供方和模型名称。
@@ -142,6 +152,248 @@ def load_embeddings(
         # 如果是自定义 Embeddings 类，则直接实例化
         return embeddings(model=model, **kwargs)
     
+class CachedEmbeddings(Embeddings):
+    """带内容寻址缓存的嵌入模型包装器。
+
+    缓存键为 (模型名, 维度, sha256(文本))，分两级：
+      - 内存 LRU：进程内热点文本（重复查询、页面公共段落）
+      - 本地 SQLite：向量以 float32 二进制存储，跨进程/重启复用（重复爬取未变化的页面）
+
+    批量请求只把缓存未命中（且去重后）的文本发送给底层模型。
+    查询和文档使用不同前缀的模型（如e5）按加上前缀后的文本计算缓存键，同一文本的查询向量和文档向量互不混用。
+
+    参数:
+        embeddings: 被包装的 LangChain Embeddings 实例
+        model: 模型名称，默认取 embeddings.model
+        dimensions: 向量维度，默认取 embeddings.dimensions
+        cache_path: SQLite 文件路径，为 None 时只使用内存缓存
+        max_memory_items: 内存 LRU 最多保存的向量数
+        query_prefix: 底层模型为查询文本添加的前缀
+        document_prefix: 底层模型为文档文本添加的前缀
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        cache_path: Optional[str] = None,
+        max_memory_items: int = 10000,
+        query_prefix: str = "",
+        document_prefix: str = "",
+    ):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.dimensions = dimensions if dimensions is not None else getattr(embeddings, "dimensions", None)
+        self.cache_path = cache_path
+        self.max_memory_items = max_memory_items
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _cache_key(self, text: str) -> str:
+        """生成缓存键：模型、维度与文本内容哈希"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{self.dimensions}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """依次查询内存和磁盘缓存，返回命中的 {key: vector}"""
+        found: Dict[str, List[float]] = {}
+        disk_keys = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                elif key not in found:
+                    disk_keys.append(key)
+
+            if self._conn is not None and disk_keys:
+                unique_disk_keys = list(dict.fromkeys(disk_keys))
+                # SQLite 单条语句参数个数有限，分段查询
+                for i in range(0, len(unique_disk_keys), 500):
+                    part = unique_disk_keys[i:i + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+        return found
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """写入内存 LRU（调用方需持有锁）"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """写入内存和磁盘缓存"""
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._conn is not None and items:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in items.items()],
+                )
+                self._conn.commit()
+
+    def _split(self, texts: List[str], prefix: str = ""):
+        """查询缓存，返回 (所有键, 已命中向量, 去重后未命中的文本)"""
+        keys = [self._cache_key(prefix + text) for text in texts]
+        memory_hits = sum(1 for key in keys if key in self._memory)
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        with self._lock:
+            self._stats["memory_hits"] += memory_hits
+            self._stats["disk_hits"] += len(texts) - memory_hits - sum(1 for key in keys if key in missing)
+            self._stats["misses"] += sum(1 for key in keys if key in missing)
+        return keys, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts, self.document_prefix)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._split([text], self.query_prefix)
+        if missing:
+            vector = self.embeddings.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 磁盘查询/写入放到线程中，避免阻塞事件循环
+        keys, found, missing = await asyncio.to_thread(self._split, texts, self.document_prefix)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await asyncio.to_thread(self._split, [text], self.query_prefix)
+        if missing:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, {keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "requests": total,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    def close(self) -> None:
+        """关闭磁盘缓存连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def get_shared_embeddings(key: str, factory: Callable[[], Embeddings]) -> Embeddings:
+    """获取进程内共享的嵌入模型实例，不存在时调用 factory 创建。
+
+    Milvus 和 LightRAG 使用同一个实例时，两者的向量维度一致，且共享同一份缓存和连接，
+    同一段文本只会请求一次向量模型。
+
+    参数:
+        key: 实例键，相同键返回同一个实例（如 'text-embedding-v4:1536'）
+        factory: 创建嵌入模型的无参函数
+
+    返回:
+        共享的嵌入模型实例
+    """
+    with _SHARED_EMBEDDINGS_LOCK:
+        embeddings = _SHARED_EMBEDDINGS.get(key)
+        if embeddings is None:
+            embeddings = factory()
+            _SHARED_EMBEDDINGS[key] = embeddings
+        return embeddings
+
+
+def with_embedding_cache(
+    embeddings: Embeddings,
+    cache_path: Optional[str] = None,
+    max_memory_items: Optional[int] = None,
+    **kwargs: Any,
+) -> Embeddings:
+    """为嵌入模型添加缓存（由环境变量控制）。
+
+    环境变量:
+        EMBEDDING_CACHE_ENABLED: 是否启用缓存，默认 true
+        EMBEDDING_CACHE_PATH: SQLite 缓存文件路径，设为空字符串时只使用内存缓存
+        EMBEDDING_CACHE_MEMORY_ITEMS: 内存 LRU 最多保存的向量数，默认 10000
+
+    参数:
+        embeddings: 被包装的嵌入模型实例
+        cache_path: 缓存文件路径，默认读取环境变量
+        max_memory_items: 内存缓存大小，默认读取环境变量
+        **kwargs: 传递给 CachedEmbeddings 的其他参数（如 model, dimensions）
+
+    返回:
+        启用缓存时返回 CachedEmbeddings，否则原样返回
+    """
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return embeddings
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings
+
+    if cache_path is None:
+        cache_path = os.getenv(
+            "EMBEDDING_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "..", "..", "rag", "storage", "embedding_cache", "embeddings.sqlite3"),
+        )
+    if max_memory_items is None:
+        max_memory_items = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+
+    return CachedEmbeddings(
+        embeddings,
+        cache_path=cache_path or None,
+        max_memory_items=max_memory_items,
+        **kwargs,
+    )
+
+
 '''
 https://tbice123123.github.io/langchain-dev-utils-docs/zh/
 # 注册自定义embedding提供商
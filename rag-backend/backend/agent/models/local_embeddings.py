@@ -0,0 +1,286 @@
+"""本地CPU嵌入模型（ONNX Runtime）
+
+在本机CPU上运行（量化的）多语言嵌入模型，查询和分块向量化都不再需要访问远程API，
+适合离线部署和对查询延迟敏感的场景。
+
+模型目录需包含 tokenizer.json 和 ONNX 模型文件（如 HuggingFace 上 Xenova/、onnx-community/
+导出的 multilingual-e5-small / bge-m3 等），依赖 onnxruntime 和 tokenizers：
+    pip install onnxruntime tokenizers
+
+通过 register_embeddings_provider 注册后与远程提供方使用方式相同：
+    register_embeddings_provider("local", LocalEmbeddings)
+    embeddings = load_embeddings("local:/models/multilingual-e5-small", max_seq_length=512)
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# 未指定模型文件时按顺序查找（优先使用量化模型）
+_DEFAULT_ONNX_FILES = (
+    "model_quantized.onnx",
+    "model_int8.onnx",
+    "model.onnx",
+    os.path.join("onnx", "model_quantized.onnx"),
+    os.path.join("onnx", "model_int8.onnx"),
+    os.path.join("onnx", "model.onnx"),
+)
+
+
+def _find_onnx_file(model_dir: str, onnx_file: Optional[str]) -> str:
+    if onnx_file:
+        path = onnx_file if os.path.isabs(onnx_file) else os.path.join(model_dir, onnx_file)
+        if not os.path.isfile(path):
+            raise ValueError(f"ONNX模型文件不存在: {path}")
+        return path
+    for name in _DEFAULT_ONNX_FILES:
+        path = os.path.join(model_dir, name)
+        if os.path.isfile(path):
+            return path
+    raise ValueError(f"模型目录 {model_dir} 中未找到ONNX模型文件，请通过 onnx_file 指定")
+
+
+def _mmap_model_path(model_path: str) -> str:
+    """返回权重可被内存映射的模型路径
+
+    ONNX Runtime 加载外部数据（external data）格式的权重时直接mmap数据文件，多个进程/worker共享同一份
+    物理内存（页缓存），模型不常驻进程私有内存。单文件模型首次加载时转换为外部数据格式并保存在同目录下
+    （需安装onnx），之后直接复用；转换失败时使用原模型。
+    """
+    stem, _ = os.path.splitext(model_path)
+    mmap_path = f"{stem}.mmap.onnx"
+    data_name = os.path.basename(f"{stem}.mmap.onnx_data")
+    if os.path.isfile(mmap_path) and os.path.getmtime(mmap_path) >= os.path.getmtime(model_path):
+        return mmap_path
+
+    try:
+        import onnx
+
+        model = onnx.load(model_path, load_external_data=False)
+        if any(tensor.data_location == onnx.TensorProto.EXTERNAL for tensor in model.graph.initializer):
+            # 已经是外部数据格式
+            return model_path
+        model = onnx.load(model_path)
+        onnx.save_model(model, mmap_path, save_as_external_data=True, all_tensors_to_one_file=True,
+                        location=data_name, size_threshold=1024)
+        logger.info(f"已将模型转换为外部数据格式以便内存映射: {mmap_path}")
+        return mmap_path
+    except ImportError:
+        logger.warning("未安装onnx，无法转换为外部数据格式，模型权重将加载到进程内存")
+    except Exception as e:
+        logger.warning(f"模型转换为外部数据格式失败，使用原模型: {e}")
+    return model_path
+
+
+class LocalEmbeddings(Embeddings):
+    """基于 ONNX Runtime 的本地CPU嵌入模型。
+
+    - 动态批处理：按token长度排序后分批，每批不超过 batch_size 个文本、且 填充后长度×文本数 不超过
+      max_batch_tokens，长短文本不混在同一批，减少填充计算
+    - 线程池推理：各批次提交到 num_workers 个线程并发执行（ONNX Runtime推理时释放GIL），
+      每个推理调用使用 intra_op_threads 个线程
+    - 内存映射：权重以外部数据格式由ONNX Runtime mmap加载（见 _mmap_model_path）
+    - 超过 max_seq_length 的文本被截断
+
+    参数:
+        model: 模型目录（包含 tokenizer.json 和 ONNX 模型文件）
+        onnx_file: 模型文件（相对模型目录或绝对路径），默认优先查找量化模型
+        dimensions: 输出维度，小于模型维度时截取前N维并重新归一化（仅适用于Matryoshka训练的模型）
+        max_seq_length: 最大token数
+        batch_size: 每批最多文本数
+        max_batch_tokens: 每批 填充后长度×文本数 上限
+        num_workers: 推理线程池大小
+        intra_op_threads: 单次推理的线程数，默认 CPU核数 / num_workers
+        pooling: 池化方式，mean（平均池化，e5/gte等）或 cls（bge等）
+        normalize: 是否L2归一化
+        query_prefix: 查询文本前缀（如e5的 "query: "）
+        document_prefix: 文档文本前缀（如e5的 "passage: "）
+        use_mmap: 是否内存映射模型权重
+    """
+
+    def __init__(
+        self,
+        model: str,
+        onnx_file: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        max_seq_length: int = 512,
+        batch_size: int = 32,
+        max_batch_tokens: int = 8192,
+        num_workers: int = 2,
+        intra_op_threads: Optional[int] = None,
+        pooling: str = "mean",
+        normalize: bool = True,
+        query_prefix: str = "",
+        document_prefix: str = "",
+        use_mmap: bool = True,
+        **kwargs: Any,
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("本地嵌入模型需要安装 onnxruntime 和 tokenizers: pip install onnxruntime tokenizers") from e
+
+        if pooling not in ("mean", "cls"):
+            raise ValueError(f"不支持的池化方式: {pooling}，可选 mean / cls")
+        if kwargs:
+            logger.debug(f"本地嵌入模型忽略参数: {sorted(kwargs)}")
+
+        self.model = model
+        self.max_seq_length = max_seq_length
+        self.batch_size = max(1, batch_size)
+        self.max_batch_tokens = max(max_seq_length, max_batch_tokens)
+        self.num_workers = max(1, num_workers)
+        self.pooling = pooling
+        self.normalize = normalize
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+        tokenizer_path = os.path.join(model, "tokenizer.json")
+        if not os.path.isfile(tokenizer_path):
+            raise ValueError(f"模型目录 {model} 中未找到 tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.pad_id = self.tokenizer.token_to_id("<pad>")
+        if self.pad_id is None:
+            self.pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+
+        model_path = _find_onnx_file(model, onnx_file)
+        if use_mmap:
+            model_path = _mmap_model_path(model_path)
+        self.model_path = model_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+        options.inter_op_num_threads = 1
+        # 同一个session可被多个线程同时调用
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        output = self.session.get_outputs()[0]
+        self.output_name = output.name
+        self._sentence_output = len(output.shape) == 2
+        model_dim = output.shape[-1] if isinstance(output.shape[-1], int) else None
+        if dimensions and model_dim and dimensions > model_dim:
+            raise ValueError(f"dimensions={dimensions} 超过模型输出维度 {model_dim}")
+        self.dimensions = dimensions or model_dim
+
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="local-embed")
+        logger.info(
+            f"本地嵌入模型加载完成: {model_path}，维度 {self.dimensions}，max_seq_length={max_seq_length}，"
+            f"{self.num_workers} 个推理线程 × {options.intra_op_num_threads} 个计算线程"
+        )
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """按token长度规划批次
+
+        Args:
+            lengths: 每个文本截断后的token数
+
+        Returns:
+            List[List[int]]: 每批文本在输入中的下标
+        """
+        order = sorted(range(len(lengths)), key=lambda idx: lengths[idx])
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for idx in order:
+            # 已按长度升序排列，加入后该批的填充长度即为当前文本长度
+            if current and (len(current) >= self.batch_size or
+                            (len(current) + 1) * lengths[idx] > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _run_batch(self, encodings: List[Any]) -> np.ndarray:
+        """对一批已分词的文本推理，返回 (批大小, 维度) 的向量"""
+        seq_len = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.full((len(encodings), seq_len), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), seq_len), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+        output = self.session.run([self.output_name], feeds)[0]
+
+        if self._sentence_output:
+            vectors = output
+        elif self.pooling == "cls":
+            vectors = output[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(output.dtype)
+            vectors = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+        vectors = vectors.astype(np.float32)
+        if self.dimensions and vectors.shape[1] > self.dimensions:
+            vectors = vectors[:, :self.dimensions]
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def _submit(self, texts: List[str]) -> Tuple[List[List[int]], List[Future]]:
+        """分词、规划批次并提交到线程池"""
+        encodings = self.tokenizer.encode_batch(texts)
+        batches = self.plan_batches([len(encoding.ids) for encoding in encodings])
+        futures = [
+            self._executor.submit(self._run_batch, [encodings[idx] for idx in batch])
+            for batch in batches
+        ]
+        return batches, futures
+
+    @staticmethod
+    def _collect(count: int, batches: List[List[int]], results: List[np.ndarray]) -> List[List[float]]:
+        """按原始顺序还原各批次的向量"""
+        vectors: List[Optional[List[float]]] = [None] * count
+        for batch, batch_vectors in zip(batches, results):
+            for idx, vector in zip(batch, batch_vectors.tolist()):
+                vectors[idx] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches, futures = self._submit([self.document_prefix + text for text in texts])
+        return self._collect(len(texts), batches, [future.result() for future in futures])
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """批量向量化查询（使用查询前缀），供查询微批处理调用"""
+        if not texts:
+            return []
+        batches, futures = self._submit([self.query_prefix + text for text in texts])
+        return self._collect(len(texts), batches, [future.result() for future in futures])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # 分词放到线程中，推理在线程池中执行，不阻塞事件循环
+        batches, futures = await asyncio.to_thread(self._submit, [self.document_prefix + text for text in texts])
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        return self._collect(len(texts), batches, list(results))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        batches, futures = await asyncio.to_thread(self._submit, [self.query_prefix + text])
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        return self._collect(1, batches, list(results))[0]
+
+    def close(self) -> None:
+        """关闭推理线程池"""
+        self._executor.shutdown(wait=False)
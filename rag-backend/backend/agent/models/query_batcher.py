@@ -0,0 +1,202 @@
+"""查询向量的跨请求微批处理
+
+高峰期每个聊天请求分别向量化原始问题和子问题，同时有大量单条文本的embedding请求。
+QueryBatchingEmbeddings 把所有并发请求的查询文本在一个很短的时间窗口内（几毫秒）或凑满
+max_batch_size 后合并为一次批量embedding调用，再把结果分发给各个调用方。
+
+同步调用（LangGraph节点在线程中执行检索）和任意事件循环中的异步调用都由同一个后台事件循环线程汇总，
+因此不同请求、不同线程的查询可以进入同一批。文档向量化（embed_documents）本身已经批量，直接透传。
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatchingEmbeddings(Embeddings):
+    """在嵌入模型前合并并发查询的微批处理器。
+
+    底层模型提供 embed_queries(texts) 时（如带查询前缀的本地模型）用它批量向量化查询，否则使用 embed_documents。
+    批量调用在线程中使用同步客户端执行，后台事件循环只负责收集和计时，不与其他事件循环共用异步HTTP连接。
+
+    参数:
+        embeddings: 被包装的嵌入模型
+        window_ms: 收到第一条查询后最多等待的毫秒数
+        max_batch_size: 单批最多查询数，凑满后立即发送（DashScope text-embedding-v4 上限为10）
+        delay_samples: 用于计算排队延迟分位数的最近样本数
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        window_ms: float = 5.0,
+        max_batch_size: int = 10,
+        delay_samples: int = 2000,
+    ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", None)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        # 以下状态只在后台事件循环线程中访问
+        self._pending: List[Tuple[str, Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "embedded_texts": 0, "errors": 0,
+                       "full_batches": 0, "queue_delay_seconds": 0.0}
+        self._delays: "deque[float]" = deque(maxlen=delay_samples)
+
+    # ==================== 后台事件循环 ====================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """延迟启动后台事件循环线程"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name="query-embed-batcher", daemon=True)
+                    thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def _submit(self, text: str) -> Future:
+        """提交一条查询，返回在结果就绪时完成的Future（线程安全）"""
+        future: Future = Future()
+        self._ensure_loop().call_soon_threadsafe(self._add, text, future, time.perf_counter())
+        return future
+
+    def _add(self, text: str, future: Future, enqueued_at: float) -> None:
+        self._pending.append((text, future, enqueued_at))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.window, self._flush)
+
+    def _flush(self) -> None:
+        """取出一批查询并发送，剩余查询重新开始计时"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = self._loop.call_later(self.window, self._flush)
+        if batch:
+            self._loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, Future, float]]) -> None:
+        dispatched_at = time.perf_counter()
+        delays = [dispatched_at - enqueued_at for _, _, enqueued_at in batch]
+        # 同一批中的重复查询只向量化一次
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["embedded_texts"] += len(texts)
+            self._stats["full_batches"] += len(batch) >= self.max_batch_size
+            self._stats["queue_delay_seconds"] += sum(delays)
+            self._delays.extend(delays)
+
+        try:
+            embed = getattr(self.embeddings, "embed_queries", None) or self.embeddings.embed_documents
+            vectors = dict(zip(texts, await asyncio.to_thread(embed, texts)))
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            logger.warning(f"批量查询向量化失败（{len(batch)} 条查询）: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    # ==================== Embeddings 接口 ====================
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def stats(self) -> Dict[str, Any]:
+        """返回微批处理统计
+
+        batch_fill 为平均每批查询数与 max_batch_size 之比；queue_delay_* 为查询从提交到所在批次发出的
+        等待时间（微批处理额外增加的延迟），分位数基于最近的样本。
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            delays = np.asarray(self._delays) * 1000 if self._delays else None
+        batches = stats["batches"]
+        requests = stats["requests"]
+        avg_batch_size = requests / batches if batches else 0.0
+        return {
+            "requests": requests,
+            "batches": batches,
+            "embedded_texts": stats["embedded_texts"],
+            "errors": stats["errors"],
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": round(avg_batch_size, 3),
+            "batch_fill": round(avg_batch_size / self.max_batch_size, 4),
+            "full_batch_ratio": round(stats["full_batches"] / batches, 4) if batches else 0.0,
+            "calls_saved": requests - batches,
+            "queue_delay_avg_ms": round(stats["queue_delay_seconds"] / requests * 1000, 3) if requests else 0.0,
+            "queue_delay_p50_ms": round(float(np.percentile(delays, 50)), 3) if delays is not None else 0.0,
+            "queue_delay_p99_ms": round(float(np.percentile(delays, 99)), 3) if delays is not None else 0.0,
+        }
+
+
+def with_query_batching(
+    embeddings: Embeddings,
+    window_ms: Optional[float] = None,
+    max_batch_size: Optional[int] = None,
+) -> Embeddings:
+    """为嵌入模型添加查询微批处理（由环境变量控制）。
+
+    环境变量:
+        QUERY_EMBED_BATCH_ENABLED: 是否启用，默认 true
+        QUERY_EMBED_BATCH_WINDOW_MS: 收集查询的时间窗口（毫秒），默认 5
+        QUERY_EMBED_MAX_BATCH_SIZE: 单批最多查询数，默认 10
+
+    参数:
+        embeddings: 被包装的嵌入模型实例
+        window_ms: 时间窗口，默认读取环境变量
+        max_batch_size: 单批最多查询数，默认读取环境变量
+
+    返回:
+        启用时返回 QueryBatchingEmbeddings，否则原样返回
+    """
+    if os.getenv("QUERY_EMBED_BATCH_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return embeddings
+    if isinstance(embeddings, QueryBatchingEmbeddings):
+        return embeddings
+
+    if window_ms is None:
+        window_ms = float(os.getenv("QUERY_EMBED_BATCH_WINDOW_MS", "5"))
+    if max_batch_size is None:
+        max_batch_size = int(os.getenv("QUERY_EMBED_MAX_BATCH_SIZE", "10"))
+    if max_batch_size <= 1:
+        return embeddings
+    return QueryBatchingEmbeddings(embeddings, window_ms=window_ms, max_batch_size=max_batch_size)
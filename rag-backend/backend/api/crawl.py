@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from backend.param.common import Response
-from backend.service.crawl import get_crawl_status, get_all_crawl_status
+from backend.service.crawl import get_crawl_status, get_all_crawl_status, subscribe_crawl_events, is_final_crawl_status
 from backend.config.log import get_logger
+from backend.config.dependencies import get_current_user
 from typing import Optional
 from backend.param.crawl import CrawlRequest, UploadDocRequest
-from backend.service.crawl import initialize_collection_and_store
+from backend.service.crawl import initialize_collection_and_store, enqueue_crawl_job
+from backend.service.ingestion_queue import IngestionQueue
 from backend.config.oss import get_presigned_url_for_upload, get_presigned_url_for_download
 import asyncio
+import json
 import os
 
 
@@ -20,6 +24,20 @@ router = APIRouter(
 def run_task(request: CrawlRequest):
     asyncio.run(initialize_collection_and_store(request))
 
+
+async def submit_ingestion(request: CrawlRequest) -> dict:
+    """提交爬取入库任务
+
+    默认写入Redis任务队列，由独立的worker进程（worker.py）执行；
+    INGEST_USE_QUEUE=false 时退化为在API进程内后台执行（本地开发无worker时使用）。
+    """
+    if os.getenv("INGEST_USE_QUEUE", "true").lower() in ("1", "true", "yes"):
+        job_id = await enqueue_crawl_job(request)
+        return {"collection_id": request.collection_id, "job_id": job_id}
+
+    asyncio.create_task(initialize_collection_and_store(request))
+    return {"collection_id": request.collection_id}
+
 @router.post('/site')
 async def crawl_site_and_store(request: CrawlRequest) -> Response:
     """
@@ -34,12 +52,10 @@ async def crawl_site_and_store(request: CrawlRequest) -> Response:
     try:
         logger.info(f"触发爬取任务: {request.url}")
         
-        # 初始化集合并存储数据,走异步调用非等待，直接返回
-        asyncio.create_task(initialize_collection_and_store(request))
+        # 提交到任务队列，不等待执行完成，直接返回
+        data = await submit_ingestion(request)
         
-        return Response.success_with_msg({
-            "collection_id": request.collection_id,
-        }, f"接收到爬取任务: {request.url}")
+        return Response.success_with_msg(data, f"接收到爬取任务: {request.url}")
         
     except Exception as e:
         logger.error(f"触发爬取任务异常: {str(e)}")
@@ -59,12 +75,10 @@ async def get_oss_doc_and_store(request: CrawlRequest) -> Response:
     try:
         logger.info(f"触发从OSS获取文档任务: {request.url}")
         
-        # 初始化集合并存储数据,走异步调用非等待，直接返回
-        asyncio.create_task(initialize_collection_and_store(request))
+        # 提交到任务队列，不等待执行完成，直接返回
+        data = await submit_ingestion(request)
         
-        return Response.success_with_msg({
-            "collection_id": request.collection_id,
-        }, f"接收到从OSS获取文档任务: {request.url}")
+        return Response.success_with_msg(data, f"接收到从OSS获取文档任务: {request.url}")
         
     except Exception as e:
         logger.error(f"触发从OSS获取文档任务异常: {str(e)}")
@@ -150,3 +164,83 @@ async def get_crawl_status_api(collection_name: str) -> Response:
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
 
 
+@router.get('/status/{collection_name}/stream')
+async def stream_crawl_status_api(collection_name: str, request: Request, last_event_id: Optional[str] = None):
+    """
+    推送指定集合的爬虫进度（SSE），替代前端轮询
+    
+    先推送一次当前状态快照，之后每有状态更新或页面计数变化推送一条事件，
+    收到带 final 标记的状态（爬虫完成或整体失败）后结束。断线重连时可通过 Last-Event-ID 请求头或 last_event_id 参数续传。
+    
+    Args:
+        collection_name: 集合名称
+        last_event_id: 从该事件ID之后继续推送
+        
+    Returns:
+        StreamingResponse: text/event-stream 流
+    """
+    if not collection_name or not collection_name.strip():
+        raise HTTPException(status_code=400, detail="集合名称不能为空")
+    collection_id = collection_name.strip()
+    resume_id = last_event_id or request.headers.get("last-event-id")
+
+    async def generate_events():
+        try:
+            if not resume_id:
+                status_data = await get_crawl_status(collection_id)
+                yield f"event: snapshot\ndata: {json.dumps(status_data, ensure_ascii=False)}\n\n"
+                if is_final_crawl_status(status_data):
+                    return
+
+            async for item in subscribe_crawl_events(collection_id, last_event_id=resume_id or "$"):
+                if await request.is_disconnected():
+                    break
+                if item is None:
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, event = item
+                yield f"id: {event_id}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                # 最后一条状态（完成或整体失败）带 final 标记；单个页面失败的 error 状态不结束推送
+                if is_final_crawl_status(event):
+                    break
+        except Exception as e:
+            logger.error(f"推送爬虫进度失败: {str(e)}")
+            error_event = {"type": "error", "message": f"推送爬虫进度失败: {str(e)}"}
+            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# 任务状态接口返回的字段，任务参数（payload）不对外暴露
+JOB_PUBLIC_FIELDS = ("job_id", "type", "status", "attempts", "max_attempts", "error", "result", "created_at", "updated_at")
+
+
+@router.get('/job/{job_id}')
+async def get_ingestion_job_api(job_id: str, current_user: int = Depends(get_current_user)) -> Response:
+    """
+    获取摄取任务状态
+    
+    Args:
+        job_id: 任务ID
+        current_user: 当前登录用户
+        
+    Returns:
+        Response: 任务状态（queued/running/retrying/succeeded/failed）、尝试次数、错误信息、执行结果
+    """
+    try:
+        job = await IngestionQueue().get_job(job_id)
+        if not job:
+            return Response.error("任务不存在或已过期")
+        return Response.success({field: job[field] for field in JOB_PUBLIC_FIELDS if field in job})
+    except Exception as e:
+        logger.error(f"获取任务状态异常: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
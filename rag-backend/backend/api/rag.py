@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, Depends
+
+from backend.config.dependencies import get_current_user
+from backend.config.embedding import get_embedding_stats
 
 router = APIRouter(
     prefix="/rag",
@@ -12,3 +17,11 @@ async def query_rag(q: str):
 @router.post("/index")
 async def index_document(document: str):
     return {"status": "success", "document": document}
+
+@router.get("/embedding/stats")
+async def embedding_stats(current_user: int = Depends(get_current_user)):
+    """向量模型统计：缓存命中率、查询微批处理的批次填充率和排队延迟"""
+    try:
+        return await asyncio.to_thread(get_embedding_stats)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, Query
+import gzip
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from backend.config.log import get_logger
 from backend.config.dependencies import get_current_user
-from backend.service.visual_graph import VisualGraphService
+from backend.service.visual_graph import VisualGraphService, to_compact
 
 logger = get_logger(__name__)
 
@@ -10,13 +14,114 @@ router = APIRouter(
     tags=["VISUAL_GRAPH"]
 )
 
+# 超过该字节数且客户端支持时使用gzip压缩响应
+_GZIP_MIN_BYTES = 1024
+
+
+def _graph_response(request: Request, data) -> Response:
+    """紧凑JSON编码，客户端支持gzip时压缩（大图的节点/边列表压缩率很高）"""
+    body = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= _GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/graph/{collection_id}")
 async def get_visual_graph(
+    request: Request,
     collection_id: str,
     label: str = Query(..., description="Label to get knowledge graph for"),
+    max_depth: int = Query(3, ge=1, description="Maximum depth of the subgraph"),
+    max_nodes: int = Query(1000, ge=1, le=5000, description="Maximum number of nodes"),
+    format: str = Query("full", pattern="^(full|compact)$", description="full: 完整属性; compact: 紧凑编码"),
     current_user: int = Depends(get_current_user),
 ):
     """获取知识库的可视化图"""
     logger.info(f"用户 {current_user} 请求获取知识库 {collection_id} 的可视化图，label={label}")
     visualgraph = VisualGraphService(collection_id)
-    return await visualgraph.get_knowledge_graph(node_label=label)
+    try:
+        graph = await visualgraph.get_knowledge_graph(node_label=label, max_depth=max_depth, max_nodes=max_nodes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _graph_response(request, to_compact(graph) if format == "compact" else graph)
+
+
+@router.get("/graph/{collection_id}/neighbors")
+async def get_node_neighbors(
+    request: Request,
+    collection_id: str,
+    node_id: str = Query(..., description="Node to expand"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    format: str = Query("full", pattern="^(full|compact)$", description="full: 完整属性; compact: 紧凑编码"),
+    current_user: int = Depends(get_current_user),
+):
+    """增量展开单个节点的邻居（按度数排序分页）"""
+    logger.info(f"用户 {current_user} 请求展开知识库 {collection_id} 的节点 {node_id}，offset={offset}，limit={limit}")
+    visualgraph = VisualGraphService(collection_id)
+    try:
+        neighbors = await visualgraph.get_neighbors(node_id=node_id, offset=offset, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if format == "compact":
+        neighbors = neighbors.model_copy(update={"graph": to_compact(neighbors.graph)})
+    return _graph_response(request, neighbors)
+
+
+@router.get("/graph/{collection_id}/overview")
+async def get_graph_overview(
+    request: Request,
+    collection_id: str,
+    rank_by: str = Query("pagerank", pattern="^(pagerank|degree)$", description="节点排序方式"),
+    top_nodes: int = Query(0, ge=0, le=2000, description="同时返回全局排名前N的实体"),
+    format: str = Query("full", pattern="^(full|compact)$", description="full: 完整属性; compact: 紧凑编码"),
+    current_user: int = Depends(get_current_user),
+):
+    """获取大图谱的社区概览（超级节点 + 社区间的边 + 预计算布局坐标）"""
+    logger.info(f"用户 {current_user} 请求知识库 {collection_id} 的图谱概览，rank_by={rank_by}，top_nodes={top_nodes}")
+    visualgraph = VisualGraphService(collection_id)
+    try:
+        overview = await visualgraph.get_overview(rank_by=rank_by, top_nodes=top_nodes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "compact" and overview.graph is not None:
+        overview = overview.model_copy(update={"graph": to_compact(overview.graph)})
+    return _graph_response(request, overview)
+
+
+@router.get("/graph/{collection_id}/clusters/{cluster_id}")
+async def get_graph_cluster(
+    request: Request,
+    collection_id: str,
+    cluster_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=2000),
+    rank_by: str = Query("pagerank", pattern="^(pagerank|degree)$", description="节点排序方式"),
+    format: str = Query("full", pattern="^(full|compact)$", description="full: 完整属性; compact: 紧凑编码"),
+    current_user: int = Depends(get_current_user),
+):
+    """展开概览中的一个社区（按排名分页，节点带布局坐标）"""
+    logger.info(f"用户 {current_user} 请求展开知识库 {collection_id} 的社区 {cluster_id}，offset={offset}，limit={limit}")
+    visualgraph = VisualGraphService(collection_id)
+    try:
+        cluster = await visualgraph.get_cluster(cluster_id=cluster_id, offset=offset, limit=limit, rank_by=rank_by)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if format == "compact":
+        cluster = cluster.model_copy(update={"graph": to_compact(cluster.graph)})
+    return _graph_response(request, cluster)
+
+
+@router.get("/graph/{collection_id}/labels")
+async def search_graph_labels(
+    collection_id: str,
+    q: str = Query("", max_length=200, description="输入的实体名称片段，为空时返回度数最高的实体"),
+    limit: int = Query(10, ge=1, le=100),
+    fuzzy: bool = Query(True, description="是否包含模糊匹配"),
+    current_user: int = Depends(get_current_user),
+):
+    """实体标签自动补全（前缀/子串/模糊匹配，按度数排序）"""
+    visualgraph = VisualGraphService(collection_id)
+    return await visualgraph.search_labels(query=q, limit=limit, fuzzy=fuzzy)
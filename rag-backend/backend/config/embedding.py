@@ -1,13 +1,100 @@
 from backend.agent.models import (
+    CachedEmbeddings,
+    QueryBatchingEmbeddings,
+    get_shared_embeddings,
     load_embeddings,
     register_embeddings_provider,
+    with_embedding_cache,
+    with_query_batching,
 )
 from backend.config.log import setup_default_logging, get_logger
 import os
+from typing import Any, Dict, Optional
 
 
 
-def get_embedding_model():
+def get_embedding_model(dimensions: Optional[int] = None, provider: Optional[str] = None):
+    """获取向量模型
+
+    同一模型和维度在进程内只创建一个实例，Milvus、LightRAG和检索共用，
+    同一段文本只会请求一次向量模型（并共用同一份向量缓存）。
+
+    Args:
+        dimensions: 向量维度，默认从环境变量VECTOR_EMBEDDING_DIMENSIONS获取
+        provider: dashscope（远程API）或 local（本地CPU模型），默认从环境变量EMBEDDING_PROVIDER获取
+    """
+    # text-embedding-v4 支持 2048/1536/1024/768/512/256/128/64 维，降低维度可减少Milvus内存占用
+    dimensions = dimensions or int(os.getenv("VECTOR_EMBEDDING_DIMENSIONS", "1536"))
+    provider = (provider or os.getenv("EMBEDDING_PROVIDER", "dashscope")).lower()
+    if provider == "local":
+        local_model = os.getenv("LOCAL_EMBEDDING_MODEL")
+        if not local_model:
+            raise ValueError("LOCAL_EMBEDDING_MODEL 环境变量未设置")
+        return get_shared_embeddings(
+            f"local:{local_model}:{dimensions}",
+            lambda: _create_local_embedding_model(local_model, dimensions)
+        )
+    if provider != "dashscope":
+        raise ValueError(f"不支持的向量模型提供方: {provider}，可选 dashscope / local")
+
+    embedding_model = os.getenv("VECTOR_DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v4")
+    return get_shared_embeddings(
+        f"{embedding_model}:{dimensions}",
+        lambda: _create_embedding_model(embedding_model, dimensions)
+    )
+
+
+def get_embedding_stats() -> Dict[str, Any]:
+    """返回共享向量模型的缓存命中和查询微批处理统计"""
+    embeddings_model = get_embedding_model()
+    stats: Dict[str, Any] = {"status": "success"}
+    if isinstance(embeddings_model, CachedEmbeddings):
+        stats["cache"] = embeddings_model.stats()
+        embeddings_model = embeddings_model.embeddings
+    if isinstance(embeddings_model, QueryBatchingEmbeddings):
+        stats["query_batching"] = embeddings_model.stats()
+    return stats
+
+
+def _create_local_embedding_model(local_model: str, dimensions: int):
+    """加载本地CPU向量模型（ONNX Runtime），查询和分块向量化都不访问远程API"""
+    from backend.agent.models.local_embeddings import LocalEmbeddings
+
+    setup_default_logging()
+    logger = get_logger(__name__)
+    logger.info("注册本地向量模型提供商...")
+    register_embeddings_provider(provider_name="local", embeddings_model=LocalEmbeddings)
+
+    threads = os.getenv("LOCAL_EMBEDDING_THREADS")
+    query_prefix = os.getenv("LOCAL_EMBEDDING_QUERY_PREFIX", "")
+    document_prefix = os.getenv("LOCAL_EMBEDDING_DOCUMENT_PREFIX", "")
+    embeddings_model = load_embeddings(
+        f"local:{local_model}",
+        onnx_file=os.getenv("LOCAL_EMBEDDING_ONNX_FILE") or None,
+        dimensions=dimensions,
+        max_seq_length=int(os.getenv("LOCAL_EMBEDDING_MAX_SEQ_LENGTH", "512")),
+        batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32")),
+        max_batch_tokens=int(os.getenv("LOCAL_EMBEDDING_MAX_BATCH_TOKENS", "8192")),
+        num_workers=int(os.getenv("LOCAL_EMBEDDING_WORKERS", "2")),
+        intra_op_threads=int(threads) if threads else None,
+        pooling=os.getenv("LOCAL_EMBEDDING_POOLING", "mean"),
+        normalize=os.getenv("LOCAL_EMBEDDING_NORMALIZE", "true").lower() in ("1", "true", "yes"),
+        query_prefix=query_prefix,
+        document_prefix=document_prefix,
+        use_mmap=os.getenv("LOCAL_EMBEDDING_MMAP", "true").lower() in ("1", "true", "yes"),
+    )
+    # 并发请求的查询合并为一次推理（缓存未命中的查询才进入批次）
+    embeddings_model = with_query_batching(embeddings_model)
+    # 缓存键使用模型目录名，不同本地模型的向量互不混用；前缀参与缓存键，查询和文档向量互不混用
+    embeddings_model = with_embedding_cache(
+        embeddings_model, model=f"local:{os.path.basename(os.path.normpath(local_model))}", dimensions=dimensions,
+        query_prefix=query_prefix, document_prefix=document_prefix,
+    )
+    logger.info(f"本地向量模型加载成功: {type(embeddings_model)}")
+    return embeddings_model
+
+
+def _create_embedding_model(embedding_model: str, dimensions: int):
     setup_default_logging()
     logger = get_logger(__name__)
     logger.info("初始化模型...")
@@ -15,7 +102,6 @@ def get_embedding_model():
 
     # 从环境变量获取向量模型配置
     api_base = os.getenv("VECTOR_DASHSCOPE_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-    embedding_model = os.getenv("VECTOR_DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v4")
 
     register_embeddings_provider(
         provider_name="ali",
@@ -33,7 +119,11 @@ def get_embedding_model():
         f"ali:{embedding_model}",
         api_key=api_key,
         check_embedding_ctx_length=False,
-        dimensions=1536
+        dimensions=dimensions
     )
+    # 并发请求的查询合并为一次批量请求（缓存未命中的查询才进入批次）
+    embeddings_model = with_query_batching(embeddings_model)
+    # 内容寻址缓存：重复文本（重复爬取、重复查询）不再请求向量模型
+    embeddings_model = with_embedding_cache(embeddings_model, model=embedding_model, dimensions=dimensions)
     logger.info(f"向量模型加载成功: {type(embeddings_model)}")
-    return embeddings_model
\ No newline at end of file
+    return embeddings_model
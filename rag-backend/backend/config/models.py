@@ -10,10 +10,9 @@ from typing import Tuple
 
 from backend.agent.models import (
     load_chat_model,
-    load_embeddings,
-    register_embeddings_provider,
     register_model_provider
 )
+from backend.config.embedding import get_embedding_model
 from backend.config.log import get_logger
 from langchain_qwq import ChatQwen
 
@@ -57,38 +56,16 @@ def initialize_embeddings_model():
     """
     初始化向量模型 (阿里云)
 
+    与 backend.config.embedding.get_embedding_model 返回同一个共享实例，
+    智能体检索与Milvus/LightRAG写入使用相同的模型、维度和向量缓存。
+
     Returns:
         embeddings_model: 初始化后的向量模型实例
 
     Raises:
         ValueError: 当VECTOR_DASHSCOPE_API_KEY环境变量未设置时
     """
-    logger.info("注册向量模型提供商...")
-    # 从环境变量获取向量模型配置
-    api_base = os.getenv("VECTOR_DASHSCOPE_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-    embedding_model = os.getenv("VECTOR_DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v4")
-
-    register_embeddings_provider(
-        provider_name="ali",
-        embeddings_model="openai",
-        base_url=api_base
-    )
-
-    logger.info("加载向量模型...")
-    # 从环境变量获取向量模型 API Key
-    api_key = os.getenv("VECTOR_DASHSCOPE_API_KEY")
-    if not api_key:
-        raise ValueError("VECTOR_DASHSCOPE_API_KEY 环境变量未设置")
-
-    embeddings_model = load_embeddings(
-        f"ali:{embedding_model}",
-        api_key=api_key,
-        check_embedding_ctx_length=False,
-        dimensions=1536
-    )
-    logger.info(f"向量模型加载成功: {type(embeddings_model)}")
-
-    return embeddings_model
+    return get_embedding_model()
 
 
 def initialize_models() -> Tuple:
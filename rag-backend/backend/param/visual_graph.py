@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, Optional, Union
 from pydantic import BaseModel
 
 
@@ -22,3 +22,80 @@ class KnowledgeGraph(BaseModel):
     is_truncated: bool = False
 
 
+class CompactKnowledgeGraph(BaseModel):
+    """大图的紧凑编码：节点按下标引用，只保留渲染需要的字段（节点详情通过邻居接口按需获取）"""
+    format: str = "compact"
+    node_ids: list[str] = []
+    entity_types: list[str] = []      # 实体类型字典
+    node_types: list[int] = []        # 每个节点的实体类型在 entity_types 中的下标，-1表示未知
+    edges: list[int] = []             # 扁平的边列表 [source0, target0, source1, target1, ...]，值为节点下标
+    edge_weights: list[float] = []
+    positions: list[float] = []       # 扁平的布局坐标 [x0, y0, x1, y1, ...]，节点带布局坐标时提供
+    is_truncated: bool = False
+
+
+class GraphPage(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    has_more: bool
+
+
+class NodeNeighbors(BaseModel):
+    """单个节点的邻居（增量展开），按邻居的度数从高到低分页"""
+    node_id: str
+    page: GraphPage
+    graph: Union[KnowledgeGraph, CompactKnowledgeGraph]
+
+
+class GraphCluster(BaseModel):
+    """社区超级节点"""
+    id: int
+    label: str                        # 社区内排名最高的实体
+    size: int
+    top_entities: list[str] = []
+    entity_type: Optional[str] = None  # 社区内最多的实体类型
+    x: float
+    y: float
+    radius: float
+    is_misc: bool = False             # 由小社区和孤立实体合并而成
+
+
+class GraphClusterEdge(BaseModel):
+    source: int
+    target: int
+    count: int                        # 两个社区之间的边数
+    weight: float
+
+
+class GraphOverview(BaseModel):
+    """整个图谱的粗粒度概览：社区超级节点、社区间的边，以及可选的全局排名靠前的实体"""
+    collection_id: str
+    version: str
+    total_nodes: int
+    total_edges: int
+    rank_by: str
+    clusters: list[GraphCluster] = []
+    cluster_edges: list[GraphClusterEdge] = []
+    graph: Optional[Union[KnowledgeGraph, CompactKnowledgeGraph]] = None
+
+
+class ClusterGraph(BaseModel):
+    """展开单个社区：社区内按排名分页的实体（带布局坐标）及它们之间的边"""
+    cluster: GraphCluster
+    page: GraphPage
+    graph: Union[KnowledgeGraph, CompactKnowledgeGraph]
+
+
+class LabelMatch(BaseModel):
+    label: str
+    degree: int
+    match: str                        # exact / prefix / substring / fuzzy
+
+
+class LabelSearchResult(BaseModel):
+    """实体标签自动补全结果，按匹配类型和实体度数排序"""
+    query: str
+    version: str
+    total_labels: int
+    labels: list[LabelMatch] = []
@@ -1,12 +1,207 @@
-from typing import List, Optional, Any, Union
+import asyncio
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
 
+import numpy as np
 from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
-from langchain_experimental.text_splitter import SemanticChunker
 from langchain.text_splitter import MarkdownHeaderTextSplitter
 from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
 
 from .models import ChunkStrategy, ChunkConfig, ChunkResult, DocumentContent
+from .tokenizer import get_token_counter
+
+# 混合分块时超长章节的切分优先级：段落 > 换行 > 句子 > 子句 > 词
+# 多进程分块的进程池（按进程数复用），避免每次调用都启动新进程
+_CHUNK_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_CHUNK_POOLS_LOCK = threading.Lock()
+
+
+def _get_chunk_pool(max_workers: int) -> ProcessPoolExecutor:
+    """获取分块进程池
+
+    与PDF提取进程池相同，服务进程中有事件循环和多个线程，使用forkserver（不支持时用spawn）启动子进程。
+    """
+    with _CHUNK_POOLS_LOCK:
+        pool = _CHUNK_POOLS.get(max_workers)
+        if pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+            _CHUNK_POOLS[max_workers] = pool
+        return pool
+
+
+_HYBRID_SEPARATORS = ["\n\n", "\n", "。", "！", "？", ". ", "；", "，", " ", ""]
+
+
+class SemanticSplitter:
+    """向量化语义切分器
+
+    流程与 LangChain SemanticChunker 一致：按句切分 -> 每句与前后各 buffer_size 句拼成窗口
+    -> 窗口向量化 -> 相邻窗口余弦距离超过阈值处断开。区别在于：
+    1. 重复窗口只向量化一次，窗口按批并发请求（embeddings_model 为 CachedEmbeddings 时
+       已缓存的窗口不再请求向量模型）；
+    2. 距离和阈值用NumPy整体计算，不逐句循环；
+    3. 分块保留原文中的标点和空白，并满足最小/最大长度约束：
+       短于 min_chunk_size 的分块与后续句子合并，超过 max_chunk_size 的分块
+       在内部语义距离最大处继续二分，单句超长时按字符截断。
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 breakpoint_threshold_type: str = "percentile",
+                 breakpoint_threshold_amount: float = 95,
+                 sentence_split_regex: str = r'[。！？.\n]',
+                 min_chunk_size: Optional[int] = None,
+                 max_chunk_size: Optional[int] = None,
+                 buffer_size: int = 1,
+                 embed_batch_size: Optional[int] = None,
+                 embed_concurrency: Optional[int] = None):
+        """
+        Args:
+            embeddings: 嵌入模型，建议使用带缓存的模型（backend.config.embedding.get_embedding_model）
+            breakpoint_threshold_type: 阈值类型，可选 percentile / standard_deviation / interquartile / gradient
+            breakpoint_threshold_amount: 阈值参数（百分位数或标准差、四分位距的倍数）
+            sentence_split_regex: 句子结束符正则，匹配到的字符保留在句尾
+            min_chunk_size: 分块最小字符数
+            max_chunk_size: 分块最大字符数
+            buffer_size: 向量化时每句前后各拼接的句子数
+            embed_batch_size: 单次embedding请求的文本数，默认从环境变量SEMANTIC_EMBED_BATCH_SIZE获取
+            embed_concurrency: 并发embedding请求数，默认从环境变量SEMANTIC_EMBED_CONCURRENCY获取
+        """
+        if breakpoint_threshold_type not in ("percentile", "standard_deviation", "interquartile", "gradient"):
+            raise ValueError(f"不支持的阈值类型: {breakpoint_threshold_type}")
+        self.embeddings = embeddings
+        self.breakpoint_threshold_type = breakpoint_threshold_type
+        self.breakpoint_threshold_amount = breakpoint_threshold_amount
+        self.sentence_pattern = re.compile(sentence_split_regex)
+        self.min_chunk_size = min_chunk_size or 0
+        self.max_chunk_size = max_chunk_size
+        self.buffer_size = buffer_size
+        self.embed_batch_size = max(1, embed_batch_size or int(os.getenv("SEMANTIC_EMBED_BATCH_SIZE", "10")))
+        self.embed_concurrency = max(1, embed_concurrency or int(os.getenv("SEMANTIC_EMBED_CONCURRENCY", "4")))
+
+    def split_text(self, text: str) -> List[str]:
+        """切分文本，返回分块文本列表"""
+        spans = self.split_sentences(text)
+        if not spans:
+            return []
+        if len(spans) == 1:
+            return self._enforce_max_size(text, spans, np.zeros(0))
+
+        sentences = [text[start:end] for start, end in spans]
+        distances = self.adjacent_distances(self.embed_windows(sentences))
+        breakpoints = self.find_breakpoints(distances)
+
+        # 按断点分组（句子下标区间），短于最小长度的分组并入后续句子
+        groups: List[Tuple[int, int]] = []
+        group_start = 0
+        for index in breakpoints:
+            if self._span_length(text, spans, group_start, index + 1) < self.min_chunk_size:
+                continue
+            groups.append((group_start, index + 1))
+            group_start = index + 1
+        groups.append((group_start, len(spans)))
+        if len(groups) > 1 and self._span_length(text, spans, *groups[-1]) < self.min_chunk_size:
+            groups[-2:] = [(groups[-2][0], groups[-1][1])]
+
+        chunks = []
+        for group_start, group_end in groups:
+            chunks.extend(self._enforce_max_size(
+                text, spans[group_start:group_end], distances[group_start:group_end - 1]
+            ))
+        return chunks
+
+    def split_sentences(self, text: str) -> List[Tuple[int, int]]:
+        """按句子结束符切分，返回每个句子（去掉首尾空白后）在原文中的 [start, end) 区间"""
+        spans = []
+        start = 0
+        for match in self.sentence_pattern.finditer(text):
+            if match.end() > start:
+                spans.append((start, match.end()))
+                start = match.end()
+        spans.append((start, len(text)))
+
+        stripped = []
+        for start, end in spans:
+            segment = text[start:end]
+            if not segment.strip():
+                continue
+            leading = len(segment) - len(segment.lstrip())
+            trailing = len(segment) - len(segment.rstrip())
+            stripped.append((start + leading, end - trailing))
+        return stripped
+
+    def embed_windows(self, sentences: List[str]) -> np.ndarray:
+        """将每句与前后 buffer_size 句拼成窗口并向量化，相同窗口只请求一次
+
+        Returns:
+            np.ndarray: 形状为 (句子数, 维度) 的向量矩阵
+        """
+        windows = [
+            " ".join(sentences[max(0, i - self.buffer_size): i + self.buffer_size + 1])
+            for i in range(len(sentences))
+        ]
+        unique_windows = list(dict.fromkeys(windows))
+        batches = [unique_windows[i:i + self.embed_batch_size]
+                   for i in range(0, len(unique_windows), self.embed_batch_size)]
+
+        if len(batches) == 1:
+            vectors = self.embeddings.embed_documents(batches[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.embed_concurrency, len(batches))) as pool:
+                vectors = [vector for batch_vectors in pool.map(self.embeddings.embed_documents, batches)
+                           for vector in batch_vectors]
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        row_of = {window: row for row, window in enumerate(unique_windows)}
+        return matrix[[row_of[window] for window in windows]]
+
+    @staticmethod
+    def adjacent_distances(vectors: np.ndarray) -> np.ndarray:
+        """相邻向量的余弦距离（1 - 余弦相似度），长度为 len(vectors) - 1"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        normalized = vectors / np.where(norms == 0, 1, norms)
+        return 1.0 - np.einsum("ij,ij->i", normalized[:-1], normalized[1:])
+
+    def find_breakpoints(self, distances: np.ndarray) -> np.ndarray:
+        """根据阈值类型计算断点，返回断点所在句子的下标（在该句之后断开）"""
+        if distances.size == 0:
+            return np.zeros(0, dtype=int)
+
+        amount = self.breakpoint_threshold_amount
+        values = distances
+        if self.breakpoint_threshold_type == "percentile":
+            threshold = np.percentile(distances, amount)
+        elif self.breakpoint_threshold_type == "standard_deviation":
+            threshold = np.mean(distances) + amount * np.std(distances)
+        elif self.breakpoint_threshold_type == "interquartile":
+            q1, q3 = np.percentile(distances, [25, 75])
+            threshold = np.mean(distances) + amount * (q3 - q1)
+        else:
+            values = np.gradient(distances) if distances.size > 1 else distances
+            threshold = np.percentile(values, amount)
+        return np.flatnonzero(values > threshold)
+
+    @staticmethod
+    def _span_length(text: str, spans: List[Tuple[int, int]], start: int, end: int) -> int:
+        return spans[end - 1][1] - spans[start][0]
+
+    def _enforce_max_size(self, text: str, spans: List[Tuple[int, int]], distances: np.ndarray) -> List[str]:
+        """超过最大长度的分块在内部语义距离最大处二分，单句超长时按字符截断"""
+        chunk = text[spans[0][0]:spans[-1][1]]
+        if not self.max_chunk_size or len(chunk) <= self.max_chunk_size:
+            return [chunk]
+        if len(spans) == 1:
+            return [chunk[i:i + self.max_chunk_size] for i in range(0, len(chunk), self.max_chunk_size)]
+
+        split = int(np.argmax(distances)) + 1
+        return (self._enforce_max_size(text, spans[:split], distances[:split - 1])
+                + self._enforce_max_size(text, spans[split:], distances[split:]))
 
 
 class TextChunker:
@@ -17,6 +212,7 @@ class TextChunker:
     2. 语义分块 - 基于语义相似度分割
     3. 递归分块 - 按分隔符优先级递归分割
     4. Markdown标题分块 - 按Markdown标题结构分割
+    5. Markdown混合分块 - 按标题分割后，超长章节按token数带重叠再切分，保留标题路径
     """
     
     def __init__(self, embeddings_model: Optional[Embeddings] = None):
@@ -54,6 +250,8 @@ class TextChunker:
                 return self._recursive_chunk(document.content, config, document.document_name)
             elif config.strategy == ChunkStrategy.MARKDOWN_HEADER:
                 return self._markdown_header_chunk(document.content, config, document.document_name)
+            elif config.strategy == ChunkStrategy.MARKDOWN_HYBRID:
+                return self._markdown_hybrid_chunk(document.content, config, document.document_name)
             else:
                 return ChunkResult(
                     chunks=[],
@@ -103,22 +301,16 @@ class TextChunker:
                 document_name=document_name
             )
         
-        semantic_chunker = SemanticChunker(
+        semantic_splitter = SemanticSplitter(
             embeddings=self.embeddings_model,
             breakpoint_threshold_type=config.breakpoint_threshold_type,
             breakpoint_threshold_amount=config.breakpoint_threshold_amount,
             sentence_split_regex=config.sentence_split_regex,
+            min_chunk_size=config.min_chunk_size,
+            max_chunk_size=config.max_chunk_size or config.chunk_size,
         )
         
-        # 如果设置了最小分块大小
-        if config.min_chunk_size:
-            semantic_chunker.min_chunk_size = config.min_chunk_size
-        
-        chunks = semantic_chunker.create_documents([text])
-        
-        # 清空metadata
-        for chunk in chunks:
-            chunk.metadata = {}
+        chunks = [Document(page_content=chunk, metadata={}) for chunk in semantic_splitter.split_text(text)]
         
         return ChunkResult(
             chunks=chunks,
@@ -175,6 +367,199 @@ class TextChunker:
             document_name=document_name
         )
     
+    def _markdown_hybrid_chunk(self, text: str, config: ChunkConfig, document_name: str) -> ChunkResult:
+        """Markdown混合分块
+
+        先按标题切分章节（保留标题行），token数超过 max_chunk_tokens 的章节再用递归分隔符
+        按token数切分，相邻分块重叠 chunk_overlap_tokens 个token，短于 min_chunk_tokens 的片段
+        在不超过 max_chunk_tokens 的前提下并入相邻片段；最后保证每块的UTF-8字节数
+        不超过 max_chunk_bytes。每个分块的metadata中记录标题路径（header_path），
+        如 "产品手册 > 安装 > 系统要求"，可用于检索过滤。
+        """
+        count_tokens = get_token_counter(config.tokenizer)
+        markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=config.headers_to_split_on,
+            strip_headers=False
+        )
+        header_keys = [name for _, name in config.headers_to_split_on]
+
+        documents = []
+        for section in markdown_splitter.split_text(text):
+            header_path = " > ".join(
+                section.metadata[key] for key in header_keys if section.metadata.get(key)
+            )
+            content = section.page_content
+            if count_tokens(content) > config.max_chunk_tokens:
+                pieces = self._merge_short_pieces(
+                    self._split_section(content, count_tokens, config), count_tokens,
+                    config.min_chunk_tokens, config.max_chunk_tokens
+                )
+            else:
+                pieces = [content]
+
+            for piece in pieces:
+                for part in self._split_by_bytes(piece, config.max_chunk_bytes):
+                    if part.strip():
+                        documents.append(Document(page_content=part, metadata={"header_path": header_path}))
+
+        return ChunkResult(
+            chunks=documents,
+            strategy=config.strategy,
+            total_chunks=len(documents),
+            document_name=document_name
+        )
+
+    @staticmethod
+    def _split_section(content: str, count_tokens, config: ChunkConfig) -> List[str]:
+        """按token数切分超长章节，章节开头的标题行并入第一个片段（为标题预留token数，合并后不超过上限）"""
+        heading, body = "", content
+        first_line, _, rest = content.partition("\n")
+        if first_line.startswith("#") and rest.strip():
+            heading, body = first_line.rstrip() + "\n\n", rest.lstrip("\n")
+        chunk_size = max(1, config.max_chunk_tokens - count_tokens(heading))
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=min(config.chunk_overlap_tokens, chunk_size // 2),
+            length_function=count_tokens,
+            separators=_HYBRID_SEPARATORS,
+            keep_separator="end"
+        )
+        pieces = splitter.split_text(body)
+        if heading and pieces:
+            pieces[0] = heading + pieces[0]
+        return pieces
+
+    @staticmethod
+    def _merge_short_pieces(pieces: List[str], count_tokens, min_tokens: int, max_tokens: int) -> List[str]:
+        """把过短的片段（如单独切出的标题行）并入下一个片段，合并后超过 max_tokens 时保持独立"""
+        merged = []
+        carry = ""
+        for piece in pieces:
+            if carry:
+                candidate = carry + "\n\n" + piece
+                if count_tokens(candidate) <= max_tokens:
+                    piece = candidate
+                else:
+                    merged.append(carry)
+                carry = ""
+            if count_tokens(piece) < min_tokens:
+                carry = piece
+                continue
+            merged.append(piece)
+        if carry:
+            # 最后一个过短片段并入前一个片段
+            if merged and count_tokens(merged[-1] + "\n\n" + carry) <= max_tokens:
+                merged[-1] = merged[-1] + "\n\n" + carry
+            else:
+                merged.append(carry)
+        return merged
+
+    @staticmethod
+    def _split_by_bytes(text: str, max_bytes: int) -> List[str]:
+        """按UTF-8字节数截断文本（不拆开多字节字符）"""
+        if len(text.encode("utf-8")) <= max_bytes:
+            return [text]
+        parts = []
+        current, current_bytes = [], 0
+        for char in text:
+            char_bytes = len(char.encode("utf-8"))
+            if current_bytes + char_bytes > max_bytes:
+                parts.append("".join(current))
+                current, current_bytes = [], 0
+            current.append(char)
+            current_bytes += char_bytes
+        if current:
+            parts.append("".join(current))
+        return parts
+    
+    def chunk_documents_parallel(self, documents: Iterable[DocumentContent], config: ChunkConfig,
+                                 max_workers: Optional[int] = None,
+                                 batch_chars: Optional[int] = None) -> Iterator[ChunkResult]:
+        """多进程批量分块，按完成顺序逐个产出分块结果
+
+        文档按长度从大到小调度（最长的先开始，避免最后剩一个大文档拖慢整体），
+        小文档打包成约 batch_chars 字符的任务以减少进程间传输次数。
+        调用方可以边迭代边存储，不必等待全部文档分块完成。
+        语义分块的瓶颈在embedding请求且嵌入模型无法传入子进程，因此在当前进程内逐个执行。
+
+        Args:
+            documents: 文档列表
+            config: 分块配置
+            max_workers: 进程数，默认从环境变量CHUNK_WORKERS获取，未设置时使用CPU核数
+            batch_chars: 小文档打包的字符数上限，默认从环境变量CHUNK_BATCH_CHARS获取
+
+        Yields:
+            ChunkResult: 分块结果（顺序与输入不一定相同，通过document_name对应）
+        """
+        documents = list(documents)
+        tasks, max_workers = self._plan_parallel_tasks(documents, config, max_workers, batch_chars)
+        if tasks is None:
+            for document in documents:
+                yield self.chunk_document(document, config)
+            return
+
+        executor = _get_chunk_pool(max_workers)
+        futures = [executor.submit(_chunk_document_batch, task, config) for task in tasks]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的任务，进程池继续复用
+            for future in futures:
+                future.cancel()
+
+    async def achunk_documents_parallel(self, documents: Iterable[DocumentContent], config: ChunkConfig,
+                                        max_workers: Optional[int] = None,
+                                        batch_chars: Optional[int] = None) -> AsyncIterator[ChunkResult]:
+        """chunk_documents_parallel 的异步版本，分块在进程池中执行，不阻塞事件循环"""
+        documents = list(documents)
+        tasks, max_workers = self._plan_parallel_tasks(documents, config, max_workers, batch_chars)
+        if tasks is None:
+            for document in documents:
+                yield await asyncio.to_thread(self.chunk_document, document, config)
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = _get_chunk_pool(max_workers)
+        futures = [loop.run_in_executor(executor, _chunk_document_batch, task, config) for task in tasks]
+        try:
+            for future in asyncio.as_completed(futures):
+                for chunk_result in await future:
+                    yield chunk_result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _plan_parallel_tasks(self, documents: List[DocumentContent], config: ChunkConfig,
+                             max_workers: Optional[int], batch_chars: Optional[int]):
+        """规划多进程分块任务
+
+        Returns:
+            Tuple[Optional[List[List[DocumentContent]]], int]: (任务列表, 进程池大小)，
+            不适合多进程时任务列表为None
+        """
+        max_workers = max_workers or int(os.getenv("CHUNK_WORKERS", "0")) or os.cpu_count() or 1
+        batch_chars = batch_chars or int(os.getenv("CHUNK_BATCH_CHARS", "200000"))
+        if config.strategy == ChunkStrategy.SEMANTIC or max_workers <= 1 or len(documents) <= 1:
+            return None, max_workers
+
+        sizes = [len(document.content or "") for document in documents]
+        # 保证任务数至少是进程数的4倍，让各进程负载均衡
+        batch_chars = max(1, min(batch_chars, sum(sizes) // (max_workers * 4)))
+
+        tasks: List[List[DocumentContent]] = []
+        current: List[DocumentContent] = []
+        current_chars = 0
+        for size, document in sorted(zip(sizes, documents), key=lambda item: item[0], reverse=True):
+            if current and current_chars + size > batch_chars:
+                tasks.append(current)
+                current, current_chars = [], 0
+            current.append(document)
+            current_chars += size
+        if current:
+            tasks.append(current)
+        return tasks, max_workers
+    
     def chunk_with_strategy(self, text: str, strategy: Union[str, ChunkStrategy], 
                            document_name: str = "", **kwargs) -> ChunkResult:
         """便捷的分块方法
@@ -203,6 +588,12 @@ class TextChunker:
         return self.chunk_document(document, config)
 
 
+def _chunk_document_batch(documents: List[DocumentContent], config: ChunkConfig) -> List[ChunkResult]:
+    """在子进程中对一批文档分块（需为模块级函数才能被进程池调用）"""
+    chunker = TextChunker()
+    return [chunker.chunk_document(document, config) for document in documents]
+
+
 # 使用示例
 if __name__ == "__main__":
 
@@ -2,14 +2,70 @@ import requests
 import os
 import time
 import json
+import mmap
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
 import PyPDF2
-from typing import Optional
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 import zipfile
 import uuid
 from urllib.parse import urlparse
 from .models import DocumentContent
+from .mineru_client import AsyncMinerUClient, read_full_md_from_zip
+
+
+def _open_pdf_mmap(file_path: str) -> Tuple[object, mmap.mmap]:
+    """以只读内存映射方式打开PDF，页面数据按需由操作系统换入，不整体读入内存"""
+    file = open(file_path, 'rb')
+    try:
+        return file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        file.close()
+        raise
+
+
+# PDF并行提取共用的进程池（懒加载，进程内只创建一个）
+_PDF_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_POOL_LOCK = threading.Lock()
+
+
+def _pdf_worker_count() -> int:
+    return int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """获取PDF提取进程池
+
+    服务进程中有事件循环和多个线程，fork出的子进程可能继承被其他线程持有的锁，
+    因此使用forkserver（不支持时用spawn）启动子进程。
+    """
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _PDF_POOL = ProcessPoolExecutor(max_workers=_pdf_worker_count(),
+                                            mp_context=multiprocessing.get_context(method))
+        return _PDF_POOL
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """提取PDF中 [start, end) 页的文本（在子进程中执行，需为模块级函数）
+
+    Returns:
+        List[Tuple[int, str]]: (页码, 页面文本) 列表
+    """
+    file, mapped = _open_pdf_mmap(file_path)
+    try:
+        reader = PyPDF2.PdfReader(mapped)
+        return [(page_num, reader.pages[page_num].extract_text() or "") for page_num in range(start, end)]
+    finally:
+        mapped.close()
+        file.close()
+
 
 class DocumentExtractor:
     def __init__(self):
@@ -33,15 +89,12 @@ class DocumentExtractor:
             if pdf_extract_method == "pypdf2":
                 # 使用PyPDF2读取PDF
                 try:
-                    with open(file_path, 'rb') as file:
-                        reader = PyPDF2.PdfReader(file)
-                        text = ""
-                        for page_num in range(len(reader.pages)):
-                            text += reader.pages[page_num].extract_text()
-                        return DocumentContent(
-                            content=text,
-                            document_name=self._extract_document_name(file_path)
-                        )
+                    # read_document 返回完整文本，需要等待所有页面提取完成；需要边提取边处理时直接使用 iter_pdf_pages
+                    text = "".join(page_text for _, page_text in self.iter_pdf_pages(file_path))
+                    return DocumentContent(
+                        content=text,
+                        document_name=self._extract_document_name(file_path)
+                    )
                 except Exception as e:
                     raise Exception(f"PDF处理错误(PyPDF2): {str(e)}")
             elif pdf_extract_method == "mineru":
@@ -75,8 +128,8 @@ class DocumentExtractor:
             except Exception as e:
                 raise Exception(f"Word文档处理错误: {str(e)}")
                 
-        elif file_extension == 'md':
-            # 读取Markdown文件
+        elif file_extension in ('md', 'txt'):
+            # 读取Markdown/纯文本文件
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     text = f.read()
@@ -90,6 +143,116 @@ class DocumentExtractor:
         else:
             raise ValueError(f"不支持的文件格式: {file_extension}")
     
+    def read_stream(self, stream: BinaryIO, document_name: str, file_extension: Optional[str] = None) -> DocumentContent:
+        """从文件对象读取文档内容，用于下载后不落盘直接解析
+
+        Args:
+            stream: 可读、可seek的二进制文件对象
+            document_name: 文档名称
+            file_extension: 文件格式，默认从文档名称推断
+        """
+        file_extension = (file_extension or document_name.split('.')[-1]).lower()
+        stream.seek(0)
+
+        if file_extension == 'pdf':
+            try:
+                reader = PyPDF2.PdfReader(stream)
+                text = "".join(page.extract_text() or "" for page in reader.pages)
+            except Exception as e:
+                raise Exception(f"PDF处理错误(PyPDF2): {str(e)}")
+        elif file_extension in ('doc', 'docx'):
+            try:
+                text = '\n'.join([paragraph.text for paragraph in Document(stream).paragraphs])
+            except Exception as e:
+                raise Exception(f"Word文档处理错误: {str(e)}")
+        elif file_extension in ('md', 'txt'):
+            try:
+                raw = stream.read()
+                try:
+                    text = raw.decode('utf-8')
+                except UnicodeDecodeError:
+                    # 兼容中文Windows下保存的文本文件
+                    text = raw.decode('gb18030')
+            except Exception as e:
+                raise Exception(f"Markdown文件处理错误: {str(e)}")
+        else:
+            raise ValueError(f"不支持的文件格式: {file_extension}")
+
+        return DocumentContent(content=text, document_name=document_name)
+
+    async def aread_document(self, file_path: str, pdf_extract_method: str = "pypdf2",
+                             mineru_client: Optional[AsyncMinerUClient] = None) -> DocumentContent:
+        """read_document 的异步版本，不阻塞事件循环
+
+        MinerU方式使用异步客户端（非阻塞轮询），其他方式在线程中执行 read_document。
+
+        Args:
+            file_path: 文件路径
+            pdf_extract_method: PDF提取方式，可选"pypdf2"或"mineru"
+            mineru_client: 共享的MinerU客户端（批量解析时复用连接和并发限制），默认临时创建
+        """
+        if file_path.split('.')[-1].lower() == 'pdf' and pdf_extract_method == "mineru":
+            if not file_path.startswith(('http://', 'https://')):
+                raise ValueError("MinerU API需要PDF文件的URL地址，请提供有效的HTTP/HTTPS URL")
+            try:
+                if mineru_client is not None:
+                    text = await mineru_client.extract(file_path)
+                else:
+                    async with AsyncMinerUClient() as client:
+                        text = await client.extract(file_path)
+            except Exception as e:
+                raise Exception(f"PDF处理错误(mineru): {str(e)}")
+            return DocumentContent(content=text, document_name=self._extract_document_name(file_path))
+        return await asyncio.to_thread(self.read_document, file_path, pdf_extract_method)
+
+    def iter_pdf_pages(self, file_path: str, max_workers: Optional[int] = None,
+                       pages_per_task: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """按页码顺序逐页产出PDF文本，调用方可以边提取边分块
+
+        页数较多时按页码区间分给进程内共享的进程池并行提取（PyPDF2的文本提取是纯Python的CPU计算，
+        线程无法并行），每个区间完成后即按顺序产出，不等待整个文件提取完成；
+        页数较少时在当前进程内逐页提取，避免进程池的启动开销。
+        文件以内存映射方式打开，各进程共享操作系统的页缓存。
+
+        Args:
+            file_path: 本地PDF文件路径
+            max_workers: 参与提取的进程数（决定区间划分，不超过共享进程池大小），
+                默认从环境变量PDF_EXTRACT_WORKERS获取，未设置时使用CPU核数
+            pages_per_task: 每个任务提取的页数，默认从环境变量PDF_PAGES_PER_TASK获取
+
+        Yields:
+            Tuple[int, str]: (页码（从0开始）, 页面文本)
+        """
+        max_workers = max_workers or _pdf_worker_count()
+        pages_per_task = max(1, pages_per_task or int(os.getenv("PDF_PAGES_PER_TASK", "16")))
+        min_parallel_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+        file, mapped = _open_pdf_mmap(file_path)
+        try:
+            reader = PyPDF2.PdfReader(mapped)
+            total_pages = len(reader.pages)
+            if max_workers <= 1 or total_pages < min_parallel_pages:
+                for page_num in range(total_pages):
+                    yield page_num, reader.pages[page_num].extract_text() or ""
+                return
+        finally:
+            mapped.close()
+            file.close()
+
+        # 每个进程需要重新解析PDF的交叉引用表，区间太小会放大这部分开销
+        pages_per_task = max(pages_per_task, -(-total_pages // (max_workers * 8)))
+        ranges = [(start, min(start + pages_per_task, total_pages))
+                  for start in range(0, total_pages, pages_per_task)]
+        executor = _get_pdf_pool()
+        futures = [executor.submit(_extract_pdf_page_range, file_path, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的任务（进程池共享，不关闭）
+            for future in futures:
+                future.cancel()
+
     def _extract_pdf_with_mineru(self, pdf_url: Optional[str] = None) -> str:
         """使用mineru API提取PDF文本
         
@@ -268,44 +431,12 @@ class DocumentExtractor:
              
             print(f"下载完成: {zip_file_path}")
              
-             # 解压zip文件，保留zip文件名作为文件夹名
+            # 解压zip文件，保留zip文件名作为文件夹名，并读取full.md
             zip_name_without_ext = os.path.splitext(zip_filename)[0]
             extract_target_dir = os.path.join(extract_output_dir, zip_name_without_ext)
-             
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                 zip_ref.extractall(extract_target_dir)
-             
-            print(f"解压完成到: {extract_target_dir}")
-             
-             # 更新解压目录为新的目标目录
-            extract_output_dir = extract_target_dir
-            
-            # 查找并读取full.md文件
-            # 首先尝试在解压目录中查找full.md文件
-            full_md_path = None
-            
-            # 遍历解压目录查找full.md文件
-            for root, dirs, files in os.walk(extract_output_dir):
-                for file in files:
-                    if file == 'full.md':
-                        full_md_path = os.path.join(root, file)
-                        break
-                if full_md_path:
-                    break
-            
-            if not full_md_path:
-                # 如果没找到full.md，列出所有文件供调试
-                all_files = []
-                for root, dirs, files in os.walk(extract_output_dir):
-                    for file in files:
-                        all_files.append(os.path.join(root, file))
-                raise Exception(f"未找到full.md文件。解压后的文件列表: {all_files}")
-            
-            # 读取full.md文件内容
-            with open(full_md_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = read_full_md_from_zip(zip_file_path, extract_target_dir)
             
-            print(f"成功读取full.md文件: {full_md_path}")
+            print(f"成功读取full.md文件: {extract_target_dir}")
             return content
         except requests.exceptions.RequestException as e:
             raise Exception(f"下载zip文件失败: {str(e)}")
@@ -0,0 +1,253 @@
+"""MinerU异步客户端
+
+基于httpx的非阻塞MinerU API客户端，用于在异步爬取流程中解析PDF：
+创建任务 -> 指数退避轮询任务状态 -> 流式下载结果压缩包 -> 在线程中解压并读取full.md。
+多个PDF可以并发提交，并发数由信号量限制。
+
+使用方式：
+    async with AsyncMinerUClient() as client:
+        text = await client.extract(pdf_url)
+        results = await client.extract_many(pdf_urls)   # 失败的项为异常对象
+
+    text = await get_shared_client().extract(pdf_url)   # 进程内共享，并发上限对所有任务生效
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+import weakref
+import zipfile
+from typing import List, Optional, Union
+from urllib.parse import urlparse
+
+import httpx
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+MINERU_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'outputs')
+
+# 仍在处理中的任务状态
+_RUNNING_STATES = ('pending', 'running', 'converting', 'waiting-file')
+
+# 进程内共享的客户端（按事件循环，httpx连接和信号量不能跨事件循环使用）
+_SHARED_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMinerUClient]" = weakref.WeakKeyDictionary()
+
+
+class MinerUError(Exception):
+    """MinerU任务创建、解析或结果下载失败"""
+
+
+def read_full_md_from_zip(zip_file_path: str, extract_target_dir: str) -> str:
+    """解压MinerU结果压缩包并读取其中的full.md（同步函数，CPU/磁盘操作）
+
+    Args:
+        zip_file_path: zip文件路径
+        extract_target_dir: 解压目录
+
+    Returns:
+        full.md文件的内容
+    """
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        zip_ref.extractall(extract_target_dir)
+
+    for root, _, files in os.walk(extract_target_dir):
+        if 'full.md' in files:
+            with open(os.path.join(root, 'full.md'), 'r', encoding='utf-8') as f:
+                return f.read()
+
+    all_files = [os.path.join(root, file) for root, _, files in os.walk(extract_target_dir) for file in files]
+    raise MinerUError(f"未找到full.md文件。解压后的文件列表: {all_files}")
+
+
+class AsyncMinerUClient:
+    """MinerU异步客户端"""
+
+    def __init__(self,
+                 api_url: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 max_concurrency: Optional[int] = None,
+                 poll_interval: float = 1.0,
+                 max_poll_interval: float = 30.0,
+                 max_wait_time: Optional[float] = None,
+                 output_dir: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            api_url: MinerU API地址，默认从环境变量MINERU_API_URL获取
+            api_key: MinerU API密钥，默认从环境变量MINERU_API_KEY获取
+            max_concurrency: 同时处理的PDF数，默认从环境变量MINERU_MAX_CONCURRENCY获取
+            poll_interval: 首次轮询间隔（秒），之后按指数递增
+            max_poll_interval: 轮询间隔上限（秒）
+            max_wait_time: 单个任务最长等待时间（秒），默认从环境变量MINERU_MAX_WAIT_TIME获取
+            output_dir: 结果压缩包下载和解压目录
+            transport: 自定义httpx传输层（测试时可直接挂载模拟服务）
+        """
+        load_dotenv()
+        self.api_url = (api_url or os.getenv('MINERU_API_URL') or '').rstrip('/')
+        self.api_key = api_key or os.getenv('MINERU_API_KEY')
+        if not self.api_url:
+            raise ValueError("请设置环境变量 MINERU_API_URL 或在初始化时提供API地址")
+        if not self.api_key:
+            raise ValueError("请设置环境变量 MINERU_API_KEY 或在初始化时提供API密钥")
+
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv('MINERU_MAX_CONCURRENCY', '4')))
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_wait_time = max_wait_time or float(os.getenv('MINERU_MAX_WAIT_TIME', '300'))
+        self.output_dir = output_dir or MINERU_OUTPUT_DIR
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._headers = {'Authorization': f'Bearer {self.api_key}'}
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, read=60.0),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncMinerUClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def extract(self, pdf_url: str) -> str:
+        """解析单个PDF，返回full.md内容
+
+        Args:
+            pdf_url: PDF文件的URL地址（MinerU只支持URL，不支持直接上传文件）
+        """
+        async with self._semaphore:
+            task_id = await self.create_task(pdf_url)
+            task_data = await self.wait_for_result(task_id)
+            full_zip_url = task_data.get('full_zip_url', '')
+            if not full_zip_url:
+                return "解析完成，但未获取到结果文件URL"
+            if not urlparse(full_zip_url).path.lower().endswith('.zip'):
+                return f"解析完成，结果文件: {full_zip_url}"
+            return await self.download_result(full_zip_url)
+
+    async def extract_many(self, pdf_urls: List[str]) -> List[Union[str, Exception]]:
+        """并发解析多个PDF（并发数受 max_concurrency 限制）
+
+        Returns:
+            List[Union[str, Exception]]: 与输入顺序一致，解析失败的项为异常对象
+        """
+        return await asyncio.gather(*(self.extract(url) for url in pdf_urls), return_exceptions=True)
+
+    async def create_task(self, pdf_url: str) -> str:
+        """创建解析任务，返回任务ID"""
+        data = {
+            'url': pdf_url,
+            'is_ocr': True,  # 启用OCR识别
+            'enable_formula': True  # 是否启用公式识别
+        }
+        try:
+            response = await self._client.post(f"{self.api_url}/extract/task", json=data, headers=self._headers)
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPError as e:
+            raise MinerUError(f"MinerU API请求失败: {str(e)}") from e
+        except ValueError as e:
+            raise MinerUError(f"MinerU API返回的不是有效的JSON格式: {str(e)}") from e
+
+        if result.get('code') != 0:
+            raise MinerUError(f"MinerU任务创建失败: {result.get('msg', '创建任务失败')}")
+        task_id = (result.get('data') or {}).get('task_id')
+        if not task_id:
+            raise MinerUError("未获得有效的任务ID")
+        logger.info(f"MinerU任务已创建: {task_id} - {pdf_url}")
+        return task_id
+
+    async def wait_for_result(self, task_id: str) -> dict:
+        """指数退避轮询任务状态，直到完成、失败或超时
+
+        轮询间隔从 poll_interval 开始翻倍，不超过 max_poll_interval，并加入少量随机抖动，
+        避免大量任务同时轮询。查询请求的网络错误会重试，直到超过最长等待时间。
+
+        Returns:
+            dict: 任务完成时的data字段（包含full_zip_url）
+        """
+        result_url = f"{self.api_url}/extract/task/{task_id}"
+        deadline = time.monotonic() + self.max_wait_time
+        interval = self.poll_interval
+
+        while True:
+            try:
+                response = await self._client.get(result_url, headers=self._headers)
+                response.raise_for_status()
+                result = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"查询MinerU任务状态失败，稍后重试 {task_id}: {e}")
+                result = None
+
+            if result is not None:
+                if result.get('code') != 0:
+                    raise MinerUError(f"查询任务结果失败: {result.get('msg', '查询结果失败')}")
+                task_data = result.get('data') or {}
+                state = task_data.get('state')
+                if state == 'done':
+                    return task_data
+                if state == 'failed':
+                    raise MinerUError(f"MinerU解析失败: {task_data.get('err_msg', '解析失败')}")
+                if state not in _RUNNING_STATES:
+                    raise MinerUError(f"未知的任务状态: {state}")
+                if state == 'running':
+                    progress = task_data.get('extract_progress') or {}
+                    logger.info(f"MinerU解析进度 {task_id}: "
+                                f"{progress.get('extracted_pages', 0)}/{progress.get('total_pages', 0)} 页")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise MinerUError(f"处理超时，超过{self.max_wait_time}秒未完成")
+            await asyncio.sleep(min(interval * random.uniform(0.8, 1.2), remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+    async def download_result(self, zip_url: str) -> str:
+        """流式下载结果压缩包，并在线程中解压读取full.md"""
+        zip_output_dir = os.path.join(self.output_dir, 'mineru_zip')
+        extract_output_dir = os.path.join(self.output_dir, 'mineru')
+        os.makedirs(zip_output_dir, exist_ok=True)
+        os.makedirs(extract_output_dir, exist_ok=True)
+
+        zip_filename = os.path.basename(urlparse(zip_url).path)
+        if not zip_filename.endswith('.zip'):
+            zip_filename = f"mineru_result_{uuid.uuid4().hex[:8]}.zip"
+        zip_file_path = os.path.join(zip_output_dir, zip_filename)
+
+        try:
+            # 结果文件在对象存储上，不携带MinerU的认证头
+            async with self._client.stream('GET', zip_url) as response:
+                response.raise_for_status()
+                with open(zip_file_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(chunk_size=64 * 1024):
+                        f.write(chunk)
+        except httpx.HTTPError as e:
+            raise MinerUError(f"下载zip文件失败: {str(e)}") from e
+        logger.info(f"MinerU结果下载完成: {zip_file_path}")
+
+        extract_target_dir = os.path.join(extract_output_dir, os.path.splitext(zip_filename)[0])
+        try:
+            return await asyncio.to_thread(read_full_md_from_zip, zip_file_path, extract_target_dir)
+        except zipfile.BadZipFile as e:
+            raise MinerUError(f"zip文件损坏或格式错误: {str(e)}") from e
+
+
+def get_shared_client() -> "AsyncMinerUClient":
+    """获取进程内共享的MinerU客户端
+
+    同一进程中并发执行的爬取任务共用一个客户端，MINERU_MAX_CONCURRENCY 限制整个进程
+    同时解析的PDF数，并复用HTTP连接。客户端随进程存在，不需要关闭。
+    """
+    loop = asyncio.get_running_loop()
+    client = _SHARED_CLIENTS.get(loop)
+    if client is None:
+        client = AsyncMinerUClient()
+        _SHARED_CLIENTS[loop] = client
+    return client
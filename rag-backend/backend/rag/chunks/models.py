@@ -12,6 +12,7 @@ class ChunkStrategy(Enum):
     SEMANTIC = "semantic"           # 语义分块
     RECURSIVE = "recursive"         # 递归分块
     MARKDOWN_HEADER = "markdown_header"  # Markdown标题分块
+    MARKDOWN_HYBRID = "markdown_hybrid"  # Markdown标题分块 + 超长章节按token数再切分
 
 
 @dataclass
@@ -36,6 +37,7 @@ class ChunkConfig:
     breakpoint_threshold_type: str = "percentile"
     breakpoint_threshold_amount: float = 95
     min_chunk_size: Optional[int] = None
+    max_chunk_size: Optional[int] = None  # 为None时使用chunk_size
     sentence_split_regex: str = r'[。！？.\n]'
     
     # 递归分块专用参数
@@ -43,13 +45,21 @@ class ChunkConfig:
     
     # Markdown分块专用参数
     headers_to_split_on: List[tuple] = None
+    
+    # Markdown混合分块专用参数（按token计数，分词器见 tokenizer.get_token_counter）
+    max_chunk_tokens: int = 512
+    chunk_overlap_tokens: int = 64
+    min_chunk_tokens: int = 64   # 短于此token数的片段（如单独切出的标题行）并入相邻片段
+    max_chunk_bytes: int = 8000  # Milvus text_content字段上限8192字节，留出余量
+    tokenizer: Optional[str] = None
 
     def __post_init__(self):
         """初始化默认值"""
         if self.separators is None and self.strategy == ChunkStrategy.RECURSIVE:
             self.separators = ["\n\n", "。", "，", " ", ""]
             
-        if self.headers_to_split_on is None and self.strategy == ChunkStrategy.MARKDOWN_HEADER:
+        if self.headers_to_split_on is None and self.strategy in (ChunkStrategy.MARKDOWN_HEADER,
+                                                                  ChunkStrategy.MARKDOWN_HYBRID):
             self.headers_to_split_on = [
                 ("#", "Header_1"),
                 ("##", "Header_2"), 
@@ -0,0 +1,61 @@
+"""分块用的token计数
+
+按 CHUNK_TOKENIZER 环境变量加载分词器，用于按token数控制分块大小：
+    tiktoken:<编码名>      如 tiktoken:cl100k_base（默认）
+    hf:<模型名或本地路径>   使用 tokenizers 加载HuggingFace分词器，如 hf:Qwen/Qwen2.5-7B-Instruct
+    estimate               不加载分词器，按字符粗略估算
+分词器依赖未安装或加载失败时退化为估算，并记录警告。
+"""
+
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符，约1个字符对应1个token
+_CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本token数：CJK字符按1个token，其余字符按4个字符1个token"""
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(tokenizer: Optional[str] = None) -> Callable[[str], int]:
+    """获取token计数函数（按分词器名称缓存，进程内只加载一次）
+
+    Args:
+        tokenizer: 分词器配置，默认从环境变量CHUNK_TOKENIZER获取
+
+    Returns:
+        Callable[[str], int]: 输入文本，返回token数
+    """
+    tokenizer = tokenizer or os.getenv("CHUNK_TOKENIZER", "tiktoken:cl100k_base")
+    kind, _, name = tokenizer.partition(":")
+
+    try:
+        if kind == "tiktoken":
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(name or "cl100k_base")
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        if kind == "hf":
+            from tokenizers import Tokenizer
+
+            if os.path.isdir(name):
+                hf_tokenizer = Tokenizer.from_file(os.path.join(name, "tokenizer.json"))
+            elif os.path.isfile(name):
+                hf_tokenizer = Tokenizer.from_file(name)
+            else:
+                hf_tokenizer = Tokenizer.from_pretrained(name)
+            return lambda text: len(hf_tokenizer.encode(text, add_special_tokens=False).ids)
+        if kind != "estimate":
+            logger.warning(f"未知的分词器配置 {tokenizer}，使用估算token数")
+    except Exception as e:
+        logger.warning(f"加载分词器 {tokenizer} 失败，使用估算token数: {e}")
+    return estimate_tokens
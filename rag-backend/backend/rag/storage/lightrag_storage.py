@@ -1,18 +1,28 @@
+import asyncio
 import os
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Sequence
 import numpy as np
 from dotenv import load_dotenv
 import logging
+from langchain_core.embeddings import Embeddings
 
 from lightrag import LightRAG, QueryParam
-from lightrag.llm.openai import openai_complete_if_cache, openai_embed
+from lightrag.llm.openai import openai_complete_if_cache
 from lightrag.kg.shared_storage import initialize_pipeline_status
-from lightrag.utils import setup_logger, EmbeddingFunc
+from lightrag.utils import setup_logger, EmbeddingFunc, compute_mdhash_id
 
 # 设置日志
 setup_logger("lightrag", level="INFO")
 logger = logging.getLogger(__name__)
 
+# 进程内共享的LightRAG存储（workspace -> _SharedStorage），按最近使用淘汰；
+# 全局锁只保护字典和引用计数，初始化在各workspace自己的锁内进行
+_SHARED_STORAGES: "OrderedDict[str, _SharedStorage]" = OrderedDict()
+_SHARED_STORAGES_LOCK = asyncio.Lock()
+
 
 class LightRAGStorage:
     """LightRAG存储和检索类
@@ -23,14 +33,31 @@ class LightRAGStorage:
     - 图存储: Neo4j
     - 向量存储: Milvus
 
-    使用workspace实现数据隔离
+    使用workspace实现数据隔离。
+
+    向量化与Milvus共用同一个嵌入模型（默认 backend.config.embedding.get_embedding_model 的共享实例），
+    两者向量维度一致；insert_texts 可直接接收Milvus阶段已计算好的分块向量，分块不会重复请求向量模型。
     """
 
-    def __init__(self, workspace: str = "default"):
+    def __init__(self,
+                 workspace: str = "default",
+                 llm_max_async: Optional[int] = None,
+                 embedding_max_async: Optional[int] = None,
+                 max_parallel_insert: Optional[int] = None,
+                 insert_batch_size: Optional[int] = None,
+                 embedding_function: Optional[Embeddings] = None,
+                 embedding_dim: Optional[int] = None):
         """初始化LightRAG存储
 
         Args:
             workspace: 工作空间名称，用于数据隔离
+            llm_max_async: 实体抽取时LLM最大并发请求数，默认从环境变量LIGHTRAG_LLM_MAX_ASYNC获取
+            embedding_max_async: embedding最大并发请求数，默认从环境变量LIGHTRAG_EMBEDDING_MAX_ASYNC获取
+            max_parallel_insert: 一次流水线运行中并行处理的文档数，默认从环境变量LIGHTRAG_MAX_PARALLEL_INSERT获取
+            insert_batch_size: insert_texts 每次提交给LightRAG的文档数，默认从环境变量LIGHTRAG_INSERT_BATCH_SIZE获取
+            embedding_function: 嵌入模型，传入MilvusStorage的embedding_function即可与Milvus共用，
+                默认使用 get_embedding_model(embedding_dim) 的共享实例
+            embedding_dim: 向量维度，默认从环境变量EMBEDDING_DIM获取，未设置时与VECTOR_EMBEDDING_DIMENSIONS一致
         """
         self.workspace = workspace
 
@@ -42,6 +69,21 @@ class LightRAGStorage:
 
         self.rag: Optional[LightRAG] = None
 
+        # 并发配置（对应LightRAG的异步限制参数）
+        self.llm_max_async = llm_max_async or int(os.getenv("LIGHTRAG_LLM_MAX_ASYNC", "4"))
+        self.embedding_max_async = embedding_max_async or int(os.getenv("LIGHTRAG_EMBEDDING_MAX_ASYNC", "8"))
+        self.max_parallel_insert = max_parallel_insert or int(os.getenv("LIGHTRAG_MAX_PARALLEL_INSERT", "4"))
+        self.insert_batch_size = insert_batch_size or int(os.getenv("LIGHTRAG_INSERT_BATCH_SIZE", "20"))
+
+        # 向量配置：维度需与已有workspace的向量存储一致
+        self.embedding_dim = embedding_dim or int(
+            os.getenv("EMBEDDING_DIM") or os.getenv("VECTOR_EMBEDDING_DIMENSIONS", "1536")
+        )
+        self._embedding_function = embedding_function
+        # insert_texts 传入的已计算向量（去除首尾空白后的文本 -> 向量），向量化时优先使用
+        self._precomputed: Dict[str, Sequence[float]] = {}
+        self._embedding_stats = {"precomputed": 0, "computed": 0}
+
         # 确保工作目录存在
         os.makedirs(self.working_dir, exist_ok=True)
 
@@ -65,17 +107,52 @@ class LightRAGStorage:
             )
         return llm_model_func
 
+    @property
+    def embedding_function(self) -> Embeddings:
+        """与Milvus共用的嵌入模型（延迟创建，只做删除等操作时不需要API Key）"""
+        if self._embedding_function is None:
+            from backend.config.embedding import get_embedding_model
+            self._embedding_function = get_embedding_model(dimensions=self.embedding_dim)
+        return self._embedding_function
+
     async def _get_embedding_func(self):
-        """嵌入模型函数"""
+        """嵌入模型函数
+
+        分块内容与 insert_texts 传入的已计算向量匹配时直接使用该向量，
+        其余文本（实体、关系、查询、被LightRAG再次切分的长文本）交给共享的嵌入模型。
+        """
+        embeddings = self.embedding_function
+
         async def embedding_func(texts: List[str]) -> np.ndarray:
-            return await openai_embed(
-                texts,
-                model=os.getenv("VECTOR_DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v4"),
-                api_key=os.getenv("VECTOR_DASHSCOPE_API_KEY"),
-                base_url=os.getenv("VECTOR_DASHSCOPE_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            )
+            vectors: List[Optional[Sequence[float]]] = [self._precomputed.get(text.strip()) for text in texts]
+            missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+            if missing:
+                computed = await embeddings.aembed_documents([texts[idx] for idx in missing])
+                for idx, vector in zip(missing, computed):
+                    vectors[idx] = vector
+            self._embedding_stats["precomputed"] += len(texts) - len(missing)
+            self._embedding_stats["computed"] += len(missing)
+            return np.asarray(vectors, dtype=np.float32)
         return embedding_func
 
+    def _add_precomputed(self, embeddings: Optional[Dict[str, Sequence[float]]]) -> List[str]:
+        """登记已计算的分块向量，返回登记的键（维度不一致的向量忽略，由模型重新计算）"""
+        keys = []
+        for text, vector in (embeddings or {}).items():
+            key = text.strip() if text else ""
+            if key and vector is not None and len(vector) == self.embedding_dim:
+                self._precomputed[key] = vector
+                keys.append(key)
+        if embeddings and len(keys) < len(embeddings):
+            logger.warning(
+                f"{len(embeddings) - len(keys)} 个已计算向量的维度与LightRAG的 {self.embedding_dim} 不一致，将重新向量化"
+            )
+        return keys
+
+    def embedding_stats(self) -> Dict[str, int]:
+        """返回累计的向量化统计：直接复用的已计算向量数和调用模型计算的文本数"""
+        return dict(self._embedding_stats)
+
 
     async def initialize(self) -> None:
         """初始化LightRAG实例"""
@@ -104,9 +181,12 @@ class LightRAGStorage:
             working_dir=self.working_dir,
             embedding_func=EmbeddingFunc(
                 func=embedding_func,
-                embedding_dim=int(os.getenv("EMBEDDING_DIM", 1024))
+                embedding_dim=self.embedding_dim
             ),
             llm_model_func=llm_model_func,
+            llm_model_max_async=self.llm_max_async,
+            embedding_func_max_async=self.embedding_max_async,
+            max_parallel_insert=self.max_parallel_insert,
             workspace=self.workspace,
             graph_storage=graph_storage,
             kv_storage=kv_storage,
@@ -129,71 +209,235 @@ class LightRAGStorage:
 
         await self.rag.ainsert(text)
 
-    async def insert_texts(self, texts: List[str]) -> None:
+    async def insert_texts(self,
+                           texts: List[str],
+                           batch_size: Optional[int] = None,
+                           max_retries: int = 3,
+                           retry_delay: float = 2,
+                           on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+                           embeddings: Optional[Dict[str, Sequence[float]]] = None) -> Dict[str, Any]:
         """批量插入文本
 
+        每批文本作为列表一次性提交给 rag.ainsert，在同一次流水线运行中并发完成
+        实体抽取和向量化（并发度由 llm_max_async / embedding_max_async / max_parallel_insert 控制）。
+        失败的文档保留在LightRAG的文档状态中，重试时只会重新处理失败/未完成的文档。
+
+        传入 embeddings 时（通常是写入Milvus时计算的分块向量），内容相同的LightRAG分块直接写入该向量，
+        不再请求向量模型；文本超过LightRAG分块大小被再次切分时，切分后的分块仍由模型计算。
+
         Args:
             texts: 文本列表
+            batch_size: 每次提交的文档数，默认使用 insert_batch_size
+            max_retries: 每批最大重试次数
+            retry_delay: 首次重试等待秒数，之后指数递增
+            on_progress: 进度回调，参数为 (已完成文档数, 文档总数)
+            embeddings: 已计算好的分块向量（文本 -> 向量），维度需与 embedding_dim 一致
+
+        Returns:
+            Dict: 插入统计，包含文档数、批次数、耗时、每分钟文档数和累计的向量复用统计
+
+        Raises:
+            Exception: 重试后仍有文档失败时抛出
         """
-        import asyncio
-        max_retries = 3
-        retry_delay = 2  # 秒
-        
-        for idx, text in enumerate(texts):
-            retry_count = 0
-            while retry_count < max_retries:
+        if self.rag is None:
+            await self.initialize()
+
+        # 与LightRAG一致：按去除首尾空白后的内容计算文档ID，同时去重
+        documents: Dict[str, str] = {}
+        for text in texts:
+            if text and text.strip():
+                documents.setdefault(compute_mdhash_id(text.strip(), prefix="doc-"), text)
+        doc_ids = list(documents)
+        total = len(doc_ids)
+        batch_size = max(1, batch_size or self.insert_batch_size)
+
+        start = time.monotonic()
+        failed_ids: List[str] = []
+        precomputed_keys = self._add_precomputed(embeddings)
+
+        try:
+            batches = await self._insert_batches(documents, doc_ids, batch_size, max_retries,
+                                                       retry_delay, on_progress, failed_ids, start)
+        finally:
+            for key in precomputed_keys:
+                self._precomputed.pop(key, None)
+
+        elapsed = time.monotonic() - start
+        failed_set = set(failed_ids)
+        processed_ids = [doc_id for doc_id in doc_ids if doc_id not in failed_set]
+        stats = {
+            "status": "success" if not failed_ids else "error",
+            "total": total,
+            "inserted": total - len(failed_ids),
+            "failed": len(failed_ids),
+            "failed_ids": failed_ids,
+            "batches": batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_minute": round(total / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "embedding": self.embedding_stats(),
+            # 本次插入涉及的实体，用于增量更新实体标签索引
+            "entities": await self.get_entity_names(processed_ids),
+        }
+
+        if failed_ids:
+            logger.error(f"LightRAG插入最终失败 {len(failed_ids)}/{total} 个文档 (已重试 {max_retries} 次)")
+            raise Exception(f"LightRAG插入失败: {len(failed_ids)}/{total} 个文档未能处理")
+        return stats
+
+    async def _insert_batches(self, documents: Dict[str, str], doc_ids: List[str], batch_size: int,
+                              max_retries: int, retry_delay: float,
+                              on_progress: Optional[Callable[[int, int], Awaitable[None]]],
+                              failed_ids: List[str], start: float):
+        """分批提交文档并重试未完成的文档，失败的文档ID追加到failed_ids，返回批次数"""
+        total = len(doc_ids)
+        done = 0
+        batches = 0
+        for batch_start in range(0, total, batch_size):
+            batch_ids = doc_ids[batch_start:batch_start + batch_size]
+            batch_texts = [documents[doc_id] for doc_id in batch_ids]
+            batches += 1
+
+            pending_ids = batch_ids
+            for attempt in range(max_retries + 1):
                 try:
-                    await self.insert_text(text)
-                    logger.debug(f"成功插入文本块 {idx + 1}/{len(texts)}")
-                    break  # 成功则跳出重试循环
+                    # 已处理的文档不会重复入队，失败/未完成的文档会在本次流水线中重新处理
+                    await self.rag.ainsert(batch_texts, ids=batch_ids)
                 except Exception as e:
-                    retry_count += 1
-                    error_type = type(e).__name__
-                    error_msg = str(e)
-                    
-                    # 检查是否是连接错误
-                    is_connection_error = any(keyword in error_msg.lower() for keyword in [
-                        'connection', '连接', '10054', 'reset', 'closed', 'timeout'
-                    ])
-                    
-                    # 检查是否是pgvector扩展缺失
-                    is_pgvector_error = any(keyword in error_msg.lower() for keyword in [
-                        'type "vector" does not exist', 'extension "vector" is not available',
-                        'pgvector', 'vector extension'
-                    ])
-                    
-                    if is_pgvector_error:
-                        logger.error(
-                            "检测到PostgreSQL pgvector扩展缺失！\n"
-                            "LightRAG需要pgvector扩展来存储向量数据。\n"
-                            "请按照以下步骤安装：\n"
-                            "1. 下载pgvector扩展（如果使用Windows，需要编译或使用预编译版本）\n"
-                            "2. 在PostgreSQL中执行：CREATE EXTENSION IF NOT EXISTS vector;\n"
-                            "3. 或者使用Docker镜像：pgvector/pgvector:pg16（已包含扩展）\n"
-                            "参考文档：https://github.com/pgvector/pgvector"
-                        )
-                    
-                    if retry_count < max_retries:
-                        logger.warning(
-                            f"插入文本块 {idx + 1}/{len(texts)} 失败 (尝试 {retry_count}/{max_retries}): "
-                            f"{error_type}: {error_msg}. {retry_delay}秒后重试..."
-                        )
-                        await asyncio.sleep(retry_delay)
-                    else:
-                        # 最后一次尝试也失败了
-                        logger.error(
-                            f"插入文本块 {idx + 1}/{len(texts)} 最终失败 (已重试 {max_retries} 次): "
-                            f"{error_type}: {error_msg}"
-                        )
-                        if is_connection_error:
-                            logger.error(
-                                "检测到连接错误，可能的原因：\n"
-                                "1. Neo4j服务连接被关闭 - 检查NEO4J_URI、NEO4J_USER、NEO4J_PASSWORD环境变量\n"
-                                "2. PostgreSQL服务连接被关闭 - 检查POSTGRES_HOST、POSTGRES_PORT等环境变量\n"
-                                "3. 网络连接超时或中断\n"
-                                "请检查相关数据库服务是否正常运行"
-                            )
-                        raise  # 重新抛出异常
+                    self._log_insert_error(e)
+                pending_ids = await self._get_unprocessed_ids(batch_ids)
+                if not pending_ids or attempt == max_retries:
+                    break
+
+                delay = retry_delay * (2 ** attempt)
+                logger.warning(
+                    f"批次 {batches} 中 {len(pending_ids)}/{len(batch_ids)} 个文档未成功 "
+                    f"(尝试 {attempt + 1}/{max_retries + 1})，{delay}秒后仅重试这些文档..."
+                )
+                await asyncio.sleep(delay)
+
+            failed_ids.extend(pending_ids)
+            done += len(batch_ids)
+            elapsed = time.monotonic() - start
+            logger.info(
+                f"LightRAG插入进度: {done}/{total}，失败 {len(failed_ids)}，"
+                f"{round(done / elapsed * 60, 2) if elapsed > 0 else 0} 文档/分钟"
+            )
+            if on_progress:
+                await on_progress(done, total)
+        return batches
+
+    async def delete_texts(self, texts: List[str]) -> Dict[str, Any]:
+        """删除通过 insert_texts 插入的文本及其抽取出的实体和关系
+
+        文档ID与 insert_texts 一致，按去除首尾空白后的内容计算。内容相同的分块在LightRAG中
+        是同一个文档，调用方只应传入已经没有分块使用的文本（MilvusStorage删除接口返回的 deleted_texts）。
+
+        Args:
+            texts: 需要删除的文本列表
+
+        Returns:
+            Dict: 删除统计
+        """
+        doc_ids = list(dict.fromkeys(
+            compute_mdhash_id(text.strip(), prefix="doc-") for text in texts if text and text.strip()
+        ))
+        if not doc_ids:
+            return {"status": "success", "deleted": 0, "not_found": 0, "failed": 0}
+
+        if self.rag is None:
+            await self.initialize()
+
+        # 删除前记录受影响的实体（删除后LightRAG的实体记录随文档一起清除）
+        entities = await self.get_entity_names(doc_ids)
+        deleted = not_found = failed = 0
+        # LightRAG删除时会重建受影响的实体和关系，需要逐个执行
+        for doc_id in doc_ids:
+            try:
+                result = await self.rag.adelete_by_doc_id(doc_id)
+            except Exception as e:
+                failed += 1
+                logger.error(f"删除LightRAG文档 {doc_id} 失败: {e}")
+                continue
+            status = getattr(result, "status", "success")
+            if status == "success":
+                deleted += 1
+            elif status == "not_found":
+                not_found += 1
+            else:
+                failed += 1
+                logger.error(f"删除LightRAG文档 {doc_id} 失败: {getattr(result, 'message', '')}")
+
+        logger.info(f"LightRAG删除完成: 删除 {deleted}，不存在 {not_found}，失败 {failed}")
+        return {
+            "status": "success" if not failed else "error",
+            "deleted": deleted,
+            "not_found": not_found,
+            "failed": failed,
+            "entities": entities,
+        }
+
+    async def get_entity_names(self, doc_ids: List[str]) -> List[str]:
+        """返回文档抽取出的实体名称（LightRAG按文档记录的 full_entities），读取失败时返回空列表"""
+        full_entities = getattr(self.rag, "full_entities", None)
+        if full_entities is None or not doc_ids:
+            return []
+        try:
+            rows = await full_entities.get_by_ids(doc_ids)
+        except Exception as e:
+            logger.warning(f"读取文档实体记录失败: {e}")
+            return []
+        names: Dict[str, None] = {}
+        for row in rows:
+            if isinstance(row, dict):
+                for name in row.get("entity_names") or []:
+                    names[name] = None
+        return list(names)
+
+    async def _get_unprocessed_ids(self, doc_ids: List[str]) -> List[str]:
+        """查询文档状态，返回尚未处理成功的文档ID"""
+        statuses = await self.rag.doc_status.get_by_ids(doc_ids)
+        unprocessed = []
+        for doc_id, status in zip(doc_ids, statuses):
+            value = status.get("status") if isinstance(status, dict) else getattr(status, "status", None)
+            if str(getattr(value, "value", value)) != "processed":
+                unprocessed.append(doc_id)
+        return unprocessed
+
+    def _log_insert_error(self, e: Exception) -> None:
+        """记录插入错误，并针对常见的环境问题给出排查提示"""
+        error_type = type(e).__name__
+        error_msg = str(e)
+        logger.warning(f"LightRAG插入出错: {error_type}: {error_msg}")
+
+        # 检查是否是连接错误
+        is_connection_error = any(keyword in error_msg.lower() for keyword in [
+            'connection', '连接', '10054', 'reset', 'closed', 'timeout'
+        ])
+
+        # 检查是否是pgvector扩展缺失
+        is_pgvector_error = any(keyword in error_msg.lower() for keyword in [
+            'type "vector" does not exist', 'extension "vector" is not available',
+            'pgvector', 'vector extension'
+        ])
+
+        if is_pgvector_error:
+            logger.error(
+                "检测到PostgreSQL pgvector扩展缺失！\n"
+                "LightRAG需要pgvector扩展来存储向量数据。\n"
+                "请按照以下步骤安装：\n"
+                "1. 下载pgvector扩展（如果使用Windows，需要编译或使用预编译版本）\n"
+                "2. 在PostgreSQL中执行：CREATE EXTENSION IF NOT EXISTS vector;\n"
+                "3. 或者使用Docker镜像：pgvector/pgvector:pg16（已包含扩展）\n"
+                "参考文档：https://github.com/pgvector/pgvector"
+            )
+        elif is_connection_error:
+            logger.error(
+                "检测到连接错误，可能的原因：\n"
+                "1. Neo4j服务连接被关闭 - 检查NEO4J_URI、NEO4J_USER、NEO4J_PASSWORD环境变量\n"
+                "2. PostgreSQL服务连接被关闭 - 检查POSTGRES_HOST、POSTGRES_PORT等环境变量\n"
+                "3. 网络连接超时或中断\n"
+                "请检查相关数据库服务是否正常运行"
+            )
 
     async def query(
         self,
@@ -279,3 +523,89 @@ class LightRAGStorage:
             logger.error(f"删除workspace '{self.workspace}' 时出错: {str(e)}")
 
 
+class _SharedStorage:
+    """共享的LightRAG存储及其引用计数
+
+    被淘汰（或workspace被删除）时如果仍有请求在使用，等最后一个引用释放后再finalize。
+    """
+
+    def __init__(self, workspace: str):
+        self.storage = LightRAGStorage(workspace=workspace)
+        self.refs = 0
+        self.evicted = False
+        self.initialized = False
+        self.init_lock = asyncio.Lock()
+
+
+async def _finalize_shared(entries: List[_SharedStorage]) -> None:
+    for entry in entries:
+        try:
+            await entry.storage.finalize()
+        except Exception as e:
+            logger.warning(f"释放LightRAG workspace {entry.storage.workspace} 失败: {e}")
+
+
+def _evict_locked(entry: _SharedStorage) -> List[_SharedStorage]:
+    """把条目移出共享字典（调用方持有全局锁），返回可以立即finalize的空闲条目"""
+    entry.evicted = True
+    return [entry] if entry.refs == 0 else []
+
+
+async def _release_shared(entry: _SharedStorage) -> None:
+    async with _SHARED_STORAGES_LOCK:
+        entry.refs -= 1
+        idle = entry.evicted and entry.refs == 0
+    if idle:
+        await _finalize_shared([entry])
+
+
+@asynccontextmanager
+async def shared_storage(workspace: str) -> AsyncIterator[LightRAGStorage]:
+    """借用进程内共享、已初始化的LightRAG存储
+
+    初始化LightRAG需要连接所有存储后端，只读的请求（图谱可视化、标签搜索等）共用同一个实例，
+    不再每次请求重新初始化。最多保留 LIGHTRAG_MAX_SHARED_WORKSPACES 个workspace，超出时淘汰最久未使用的；
+    使用期间持有引用，被淘汰的实例在最后一个请求结束后才释放。不同workspace的首次初始化互不阻塞。
+
+    使用方式：
+        async with shared_storage(collection_id) as storage:
+            await storage.rag.get_knowledge_graph(...)
+
+    Args:
+        workspace: 工作空间名称（知识库collection_id）
+
+    Yields:
+        LightRAGStorage: 已初始化的存储实例
+    """
+    async with _SHARED_STORAGES_LOCK:
+        entry = _SHARED_STORAGES.get(workspace)
+        if entry is None:
+            entry = _SharedStorage(workspace)
+            _SHARED_STORAGES[workspace] = entry
+        else:
+            _SHARED_STORAGES.move_to_end(workspace)
+        entry.refs += 1
+
+        idle = []
+        max_workspaces = max(1, int(os.getenv("LIGHTRAG_MAX_SHARED_WORKSPACES", "16")))
+        while len(_SHARED_STORAGES) > max_workspaces:
+            _, evicted = _SHARED_STORAGES.popitem(last=False)
+            idle.extend(_evict_locked(evicted))
+    await _finalize_shared(idle)
+
+    try:
+        async with entry.init_lock:
+            if not entry.initialized:
+                await entry.storage.initialize()
+                entry.initialized = True
+        yield entry.storage
+    finally:
+        await _release_shared(entry)
+
+
+async def release_shared_storage(workspace: str) -> None:
+    """释放共享的LightRAG存储（workspace被删除时调用），仍在使用时等使用结束后释放"""
+    async with _SHARED_STORAGES_LOCK:
+        entry = _SHARED_STORAGES.pop(workspace, None)
+        idle = _evict_locked(entry) if entry is not None else []
+    await _finalize_shared(idle)
@@ -0,0 +1,207 @@
+"""将每个知识库独立的collection迁移到共享collection
+
+共享collection以 collection_id 作为partition key，迁移时按原collection名称写入collection_id，
+直接复制已有向量（不重新调用embedding模型），BM25稀疏向量由共享collection的内置函数重新生成。
+主键按 make_chunk_id(原collection名称, 文档名, 内容) 重新计算，与共享模式下 MilvusStorage 的写入保持一致，
+重复执行迁移只会覆盖相同的分块。
+
+运行：
+cd rag-backend
+python -m backend.rag.storage.migrate_shared_collection --shared kb_chunks [--collections kb1_xxx kb2_xxx]
+    [--batch-size 1000] [--dry-run] [--drop-source]
+
+默认迁移数据库中所有名称形如 kb{知识库ID}_{时间戳} 的collection。迁移完成后在 .env 中设置
+MILVUS_SHARED_COLLECTION 为共享collection名称即可切换；确认无误后可使用 --drop-source 删除原collection。
+"""
+
+import argparse
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymilvus import MilvusClient
+
+from backend.rag.storage.milvus_schema import (PARTITION_KEY_FIELD, PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD,
+                                               IndexConfig, default_embedding_dim, ensure_collection)
+from backend.rag.storage.milvus_storage import make_chunk_id
+
+# 加载环境变量
+load_dotenv()
+
+# 知识库collection名称格式: kb{library_id}_{timestamp_ms}
+KB_COLLECTION_PATTERN = re.compile(r"^kb\d+_\d+$")
+
+# 需要复制的元数据字段及旧collection缺少该字段时的默认值（None表示使用document_name）
+_METADATA_DEFAULTS = {
+    "document_name": "",
+    "source_url": None,
+    "header_path": "",
+    "chunk_index": 0,
+    "chunk_size": None,
+}
+
+
+def _vector_dim(client: MilvusClient, collection_name: str) -> Optional[int]:
+    """获取collection稠密向量字段的维度"""
+    for field in client.describe_collection(collection_name).get("fields", []):
+        if field["name"] == VECTOR_FIELD:
+            return int(field.get("params", {}).get("dim", 0)) or None
+    return None
+
+
+def _count(client: MilvusClient, collection_name: str, filter_expr: str = "") -> int:
+    rows = client.query(collection_name=collection_name, filter=filter_expr, output_fields=["count(*)"])
+    return rows[0]["count(*)"] if rows else 0
+
+
+def _to_shared_row(row: Dict[str, Any], source_collection: str) -> Dict[str, Any]:
+    """将旧collection中的一行转换为共享collection的行"""
+    document_name = row.get("document_name") or _METADATA_DEFAULTS["document_name"]
+    text = row[TEXT_FIELD]
+    return {
+        PRIMARY_FIELD: make_chunk_id(source_collection, document_name, text),
+        TEXT_FIELD: text,
+        VECTOR_FIELD: row[VECTOR_FIELD],
+        "document_name": document_name,
+        "source_url": row.get("source_url") or document_name,
+        "header_path": row.get("header_path") or "",
+        "chunk_index": row.get("chunk_index") or 0,
+        "chunk_size": row.get("chunk_size") or len(text),
+        PARTITION_KEY_FIELD: source_collection,
+    }
+
+
+def migrate_collection(client: MilvusClient,
+                       source_collection: str,
+                       shared_collection: str,
+                       batch_size: int = 1000,
+                       dry_run: bool = False,
+                       drop_source: bool = False) -> Dict[str, Any]:
+    """迁移单个知识库collection
+
+    Args:
+        client: Milvus客户端
+        source_collection: 原知识库collection名称（迁移后作为collection_id）
+        shared_collection: 共享collection名称
+        batch_size: 每批读取/写入的行数
+        dry_run: 只统计不写入
+        drop_source: 迁移并校验行数一致后删除原collection
+
+    Returns:
+        Dict: 迁移结果
+    """
+    source_fields = {field["name"] for field in client.describe_collection(source_collection).get("fields", [])}
+    if TEXT_FIELD not in source_fields or VECTOR_FIELD not in source_fields:
+        return {"status": "skipped", "collection_name": source_collection, "message": "不是分块collection"}
+
+    client.load_collection(source_collection)
+    source_count = _count(client, source_collection)
+    if dry_run:
+        return {"status": "success", "collection_name": source_collection, "source_count": source_count,
+                "migrated_count": 0, "dry_run": True}
+
+    output_fields = [TEXT_FIELD, VECTOR_FIELD] + [name for name in _METADATA_DEFAULTS if name in source_fields]
+    iterator = client.query_iterator(collection_name=source_collection, batch_size=batch_size,
+                                     output_fields=output_fields)
+    # 内容重复的分块主键相同，只保留一个（与MilvusStorage写入时的去重一致）
+    migrated_ids = set()
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            batch = {}
+            for row in rows:
+                shared_row = _to_shared_row(row, source_collection)
+                batch[shared_row[PRIMARY_FIELD]] = shared_row
+            client.upsert(collection_name=shared_collection, data=list(batch.values()))
+            migrated_ids.update(batch)
+            print(f"  {source_collection}: 已迁移 {len(migrated_ids)}/{source_count}")
+    finally:
+        iterator.close()
+
+    migrated = len(migrated_ids)
+    client.flush(shared_collection)
+    shared_count = _count(client, shared_collection, f'{PARTITION_KEY_FIELD} == "{source_collection}"')
+    result = {
+        "status": "success",
+        "collection_name": source_collection,
+        "source_count": source_count,
+        "migrated_count": migrated,
+        "shared_count": shared_count,
+        "dropped": False,
+    }
+    # 去重后的行数可能少于原collection，但不应少于写入的唯一分块数
+    if drop_source:
+        if shared_count >= migrated:
+            client.drop_collection(source_collection)
+            result["dropped"] = True
+        else:
+            result["status"] = "warning"
+            result["message"] = f"共享collection中只有 {shared_count} 行，少于迁移的 {migrated} 行，未删除原collection"
+    return result
+
+
+def migrate(shared_collection: str,
+            collections: Optional[List[str]] = None,
+            batch_size: int = 1000,
+            dry_run: bool = False,
+            drop_source: bool = False,
+            embedding_dim: Optional[int] = None) -> List[Dict[str, Any]]:
+    """将多个知识库collection迁移到共享collection
+
+    Args:
+        shared_collection: 共享collection名称，不存在时按显式schema（带partition key）创建
+        collections: 需要迁移的collection，默认为所有 kb{id}_{timestamp} 格式的collection
+        batch_size: 每批读取/写入的行数
+        dry_run: 只统计不写入
+        drop_source: 迁移成功后删除原collection
+        embedding_dim: 共享collection的向量维度，默认与 MilvusStorage 新建collection时一致
+
+    Returns:
+        List[Dict]: 每个collection的迁移结果
+    """
+    client = MilvusClient(
+        uri=os.getenv('MILVUS_URI', 'http://localhost:19530'),
+        db_name=os.getenv('MILVUS_DB_NAME', 'rag'),
+        token=os.getenv('MILVUS_TOKEN') or ""
+    )
+    embedding_dim = embedding_dim or default_embedding_dim()
+
+    if collections is None:
+        collections = sorted(name for name in client.list_collections() if KB_COLLECTION_PATTERN.match(name))
+    collections = [name for name in collections if name != shared_collection]
+
+    if not dry_run and ensure_collection(client, shared_collection, embedding_dim, IndexConfig.from_env(),
+                                         partition_key=True):
+        print(f"已创建共享Collection '{shared_collection}'")
+
+    results = []
+    for name in collections:
+        source_dim = _vector_dim(client, name)
+        if source_dim and source_dim != embedding_dim:
+            results.append({"status": "skipped", "collection_name": name,
+                            "message": f"向量维度 {source_dim} 与共享collection的 {embedding_dim} 不一致"})
+        else:
+            try:
+                results.append(migrate_collection(client, name, shared_collection, batch_size, dry_run, drop_source))
+            except Exception as e:
+                results.append({"status": "error", "collection_name": name, "error": str(e)})
+        print(f"{name}: {results[-1]}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将知识库collection迁移到共享collection（collection_id partition key）")
+    parser.add_argument("--shared", default=os.getenv("MILVUS_SHARED_COLLECTION"),
+                        required=not os.getenv("MILVUS_SHARED_COLLECTION"), help="共享collection名称，默认取MILVUS_SHARED_COLLECTION")
+    parser.add_argument("--collections", nargs="*", help="需要迁移的collection，默认迁移所有kb{id}_{timestamp}")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="只统计行数，不写入")
+    parser.add_argument("--drop-source", action="store_true", help="迁移并校验后删除原collection")
+    args = parser.parse_args()
+
+    results = migrate(args.shared, args.collections, args.batch_size, args.dry_run, args.drop_source)
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    print(f"迁移完成: {succeeded}/{len(results)} 个collection成功")
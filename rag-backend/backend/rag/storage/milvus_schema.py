@@ -0,0 +1,323 @@
+"""Milvus collection schema与索引配置
+
+MilvusStorage 与 create_collection.py 共用同一份显式schema定义，不再依赖LangChain在首次写入时
+根据元数据推断字段类型（推断出的collection为 L2 + AUTOINDEX，且无标量索引）。
+
+字段名与 langchain_milvus 的默认字段保持一致（pk/text/vector/sparse），创建好的collection
+可以直接被 LangChain Milvus 接管。
+
+向量索引通过环境变量配置：
+    MILVUS_VECTOR_TYPE             FLOAT_VECTOR（默认）/ FLOAT16_VECTOR / BFLOAT16_VECTOR
+    MILVUS_INDEX_TYPE              HNSW（默认）/ IVF_FLAT / IVF_SQ8 / IVF_PQ / DISKANN / FLAT / AUTOINDEX
+    MILVUS_METRIC_TYPE             COSINE（默认）/ IP / L2
+    MILVUS_HNSW_M                  HNSW每个节点的最大连接数
+    MILVUS_HNSW_EF_CONSTRUCTION    HNSW构建时的搜索宽度
+    MILVUS_IVF_NLIST               IVF聚类中心数
+    MILVUS_IVF_PQ_M                IVF_PQ子向量个数（需整除向量维度），默认为 维度/8
+    MILVUS_IVF_PQ_NBITS            IVF_PQ每个子向量的编码位数
+    MILVUS_SEARCH_EF               HNSW检索时的候选集大小（单次请求可覆盖）
+    MILVUS_SEARCH_NPROBE           IVF检索时访问的聚类数（单次请求可覆盖）
+    MILVUS_DISKANN_SEARCH_LIST     DiskANN检索时的候选列表大小（单次请求可覆盖）
+
+共享collection模式（MILVUS_SHARED_COLLECTION）下，所有知识库写入同一个collection，
+以 collection_id 字段作为partition key区分，Milvus按其哈希自动路由到 MILVUS_NUM_PARTITIONS 个分区。
+"""
+
+import logging
+import os
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from pymilvus import DataType, Function, FunctionType, MilvusClient
+
+logger = logging.getLogger(__name__)
+
+# 字段名（与 langchain_milvus.utils.constant 一致）
+PRIMARY_FIELD = "pk"
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+SPARSE_VECTOR_FIELD = "sparse"
+
+# 共享collection模式下的知识库ID字段（partition key）
+PARTITION_KEY_FIELD = "collection_id"
+
+# 需要按值过滤的标量字段，建立INVERTED索引
+SCALAR_INDEX_FIELDS = ("document_name", "source_url", "header_path")
+
+# VARCHAR最大长度（只是上限，按实际长度存储）
+MAX_VARCHAR_LENGTH = 65535
+
+SUPPORTED_INDEX_TYPES = ("HNSW", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "DISKANN", "FLAT", "AUTOINDEX")
+
+# 稠密向量的存储类型；半精度向量占用一半内存，写入和检索时需要转换为对应dtype的numpy数组
+VECTOR_DATA_TYPES = {
+    "FLOAT_VECTOR": DataType.FLOAT_VECTOR,
+    "FLOAT16_VECTOR": DataType.FLOAT16_VECTOR,
+    "BFLOAT16_VECTOR": DataType.BFLOAT16_VECTOR,
+}
+
+# BM25稀疏向量的检索参数（与 BM25BuiltInFunction 配套）
+SPARSE_SEARCH_PARAMS = {"metric_type": "BM25", "params": {}}
+
+
+@dataclass
+class IndexConfig:
+    """稠密向量索引配置（构建参数 + 默认检索参数）"""
+    index_type: str = "HNSW"
+    metric_type: str = "COSINE"
+    vector_type: str = "FLOAT_VECTOR"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 200
+    ivf_nlist: int = 1024
+    pq_m: int = 0               # 0表示按维度自动选择（维度/8）
+    pq_nbits: int = 8
+    search_ef: int = 64
+    search_nprobe: int = 16
+    diskann_search_list: int = 100
+
+    def __post_init__(self):
+        self.index_type = self.index_type.upper()
+        self.metric_type = self.metric_type.upper()
+        self.vector_type = self.vector_type.upper()
+        if not self.vector_type.endswith("_VECTOR"):
+            self.vector_type += "_VECTOR"
+        if self.index_type not in SUPPORTED_INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型 {self.index_type}，可选: {', '.join(SUPPORTED_INDEX_TYPES)}")
+        if self.vector_type not in VECTOR_DATA_TYPES:
+            raise ValueError(f"不支持的向量类型 {self.vector_type}，可选: {', '.join(VECTOR_DATA_TYPES)}")
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        """从环境变量读取索引配置"""
+        return cls(
+            index_type=os.getenv("MILVUS_INDEX_TYPE", "HNSW"),
+            metric_type=os.getenv("MILVUS_METRIC_TYPE", "COSINE"),
+            vector_type=os.getenv("MILVUS_VECTOR_TYPE", "FLOAT_VECTOR"),
+            hnsw_m=int(os.getenv("MILVUS_HNSW_M", "16")),
+            hnsw_ef_construction=int(os.getenv("MILVUS_HNSW_EF_CONSTRUCTION", "200")),
+            ivf_nlist=int(os.getenv("MILVUS_IVF_NLIST", "1024")),
+            pq_m=int(os.getenv("MILVUS_IVF_PQ_M", "0")),
+            pq_nbits=int(os.getenv("MILVUS_IVF_PQ_NBITS", "8")),
+            search_ef=int(os.getenv("MILVUS_SEARCH_EF", "64")),
+            search_nprobe=int(os.getenv("MILVUS_SEARCH_NPROBE", "16")),
+            diskann_search_list=int(os.getenv("MILVUS_DISKANN_SEARCH_LIST", "100")),
+        )
+
+    def with_index(self, index_type: str, metric_type: str, vector_type: Optional[str] = None) -> "IndexConfig":
+        """返回索引类型/度量/向量类型替换后的配置（用于已存在collection的实际索引）
+
+        未知的索引类型按AUTOINDEX处理（检索参数留空，由Milvus决定）。
+        """
+        index_type = index_type.upper()
+        if index_type not in SUPPORTED_INDEX_TYPES:
+            index_type = "AUTOINDEX"
+        return replace(self, index_type=index_type, metric_type=metric_type,
+                       vector_type=vector_type or self.vector_type)
+
+    def build_params(self, embedding_dim: Optional[int] = None) -> Dict[str, Any]:
+        """向量索引的构建参数
+
+        Args:
+            embedding_dim: 向量维度，IVF_PQ需要据此确定子向量个数
+        """
+        if self.index_type == "HNSW":
+            return {"M": self.hnsw_m, "efConstruction": self.hnsw_ef_construction}
+        if self.index_type == "IVF_PQ":
+            pq_m = self.pq_m or (embedding_dim // 8 if embedding_dim else 0)
+            if not pq_m or (embedding_dim and embedding_dim % pq_m):
+                raise ValueError(f"IVF_PQ的子向量个数 {pq_m} 必须整除向量维度 {embedding_dim}")
+            return {"nlist": self.ivf_nlist, "m": pq_m, "nbits": self.pq_nbits}
+        if self.index_type.startswith("IVF_"):
+            return {"nlist": self.ivf_nlist}
+        return {}
+
+    def encode_vectors(self, vectors: Sequence[Sequence[float]]) -> List[Any]:
+        """把float向量转换为写入/检索所需的格式
+
+        FLOAT_VECTOR原样返回；FLOAT16_VECTOR/BFLOAT16_VECTOR转换为对应dtype的numpy数组
+        （pymilvus只接受这种格式的半精度向量）。BFLOAT16需要安装 ml_dtypes。
+        """
+        if self.vector_type == "FLOAT_VECTOR":
+            return list(vectors)
+        if self.vector_type == "FLOAT16_VECTOR":
+            dtype = np.float16
+        else:
+            try:
+                from ml_dtypes import bfloat16
+            except ImportError as e:
+                raise ImportError("BFLOAT16_VECTOR 需要安装 ml_dtypes: pip install ml_dtypes") from e
+            dtype = bfloat16
+        return list(np.asarray(vectors, dtype=np.float32).astype(dtype))
+
+    def search_params(self,
+                      k: Optional[int] = None,
+                      ef: Optional[int] = None,
+                      nprobe: Optional[int] = None,
+                      search_list: Optional[int] = None) -> Dict[str, Any]:
+        """稠密向量的检索参数
+
+        Args:
+            k: 本次检索返回的结果数，HNSW的ef、DiskANN的search_list不能小于k
+            ef: 覆盖默认的HNSW ef
+            nprobe: 覆盖默认的IVF nprobe
+            search_list: 覆盖默认的DiskANN search_list
+
+        Returns:
+            Dict: 形如 {"metric_type": "COSINE", "params": {"ef": 64}}
+        """
+        params: Dict[str, Any] = {}
+        if self.index_type == "HNSW":
+            params["ef"] = max(ef or self.search_ef, k or 0)
+        elif self.index_type.startswith("IVF_"):
+            params["nprobe"] = min(nprobe or self.search_nprobe, self.ivf_nlist)
+        elif self.index_type == "DISKANN":
+            params["search_list"] = max(search_list or self.diskann_search_list, k or 0)
+        return {"metric_type": self.metric_type, "params": params}
+
+
+def build_schema(embedding_dim: int,
+                 description: str = "文本块存储collection，支持向量检索和BM25全文检索",
+                 partition_key: bool = False,
+                 vector_type: str = "FLOAT_VECTOR"):
+    """构建分块collection的schema
+
+    Args:
+        embedding_dim: 稠密向量维度
+        description: collection描述
+        partition_key: 是否添加 collection_id partition key字段（共享collection模式）
+        vector_type: 稠密向量的存储类型（FLOAT_VECTOR / FLOAT16_VECTOR / BFLOAT16_VECTOR）
+
+    Returns:
+        CollectionSchema: 包含BM25函数（text -> sparse）的schema
+    """
+    schema = MilvusClient.create_schema(
+        auto_id=False,               # 使用确定性分块ID，写入时指定
+        enable_dynamic_field=False,  # 禁用动态字段，确保数据结构一致性和查询性能
+        description=description
+    )
+
+    # 主键：sha256(collection, 文档名, 内容哈希)
+    schema.add_field(PRIMARY_FIELD, DataType.VARCHAR, is_primary=True, max_length=64,
+                     description="确定性分块ID")
+    # 文本内容：启用分词，作为BM25函数的输入
+    schema.add_field(TEXT_FIELD, DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH,
+                     enable_analyzer=True, description="分块后的文本内容")
+    schema.add_field(VECTOR_FIELD, VECTOR_DATA_TYPES[vector_type], dim=embedding_dim, description="文本向量表示")
+    schema.add_field(SPARSE_VECTOR_FIELD, DataType.SPARSE_FLOAT_VECTOR, description="BM25稀疏向量")
+
+    # 元数据：与 MilvusStorage._convert_chunks_to_langchain_docs 生成的字段一一对应
+    schema.add_field("document_name", DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH,
+                     description="原文档名称（爬取的网页为页面URL）")
+    schema.add_field("source_url", DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH,
+                     description="来源URL")
+    schema.add_field("header_path", DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH,
+                     description="Markdown标题路径")
+    schema.add_field("chunk_index", DataType.INT64, description="块在文档中的序号")
+    schema.add_field("chunk_size", DataType.INT64, description="文本块字符数")
+    if partition_key:
+        schema.add_field(PARTITION_KEY_FIELD, DataType.VARCHAR, max_length=256, is_partition_key=True,
+                         description="所属知识库的collection ID")
+
+    schema.add_function(Function(
+        name="text_bm25_emb",
+        function_type=FunctionType.BM25,
+        input_field_names=[TEXT_FIELD],
+        output_field_names=[SPARSE_VECTOR_FIELD],
+    ))
+    return schema
+
+
+def build_index_params(index_config: IndexConfig, partition_key: bool = False,
+                       embedding_dim: Optional[int] = None):
+    """构建向量索引、BM25稀疏索引和标量过滤索引"""
+    index_params = MilvusClient.prepare_index_params()
+    index_params.add_index(
+        field_name=VECTOR_FIELD,
+        index_type=index_config.index_type,
+        metric_type=index_config.metric_type,
+        params=index_config.build_params(embedding_dim)
+    )
+    index_params.add_index(
+        field_name=SPARSE_VECTOR_FIELD,
+        index_type="SPARSE_INVERTED_INDEX",
+        metric_type="BM25",
+        params={"inverted_index_algo": "DAAT_MAXSCORE"}
+    )
+    for field_name in SCALAR_INDEX_FIELDS + ((PARTITION_KEY_FIELD,) if partition_key else ()):
+        index_params.add_index(field_name=field_name, index_type="INVERTED")
+    return index_params
+
+
+def ensure_collection(client: MilvusClient,
+                      collection_name: str,
+                      embedding_dim: int,
+                      index_config: Optional[IndexConfig] = None,
+                      consistency_level: str = "Bounded",
+                      partition_key: bool = False,
+                      num_partitions: Optional[int] = None) -> bool:
+    """collection不存在时按显式schema创建（同时建立全部索引）
+
+    Args:
+        client: Milvus客户端
+        collection_name: collection名称
+        embedding_dim: 稠密向量维度
+        index_config: 向量索引配置，默认从环境变量读取
+        consistency_level: 一致性级别
+        partition_key: 是否为共享collection（以collection_id作为partition key）
+        num_partitions: partition key模式下的分区数，默认从环境变量MILVUS_NUM_PARTITIONS获取
+
+    Returns:
+        bool: 是否新创建了collection
+    """
+    if client.has_collection(collection_name):
+        return False
+
+    index_config = index_config or IndexConfig.from_env()
+    kwargs = {}
+    if partition_key:
+        kwargs["num_partitions"] = num_partitions or int(os.getenv("MILVUS_NUM_PARTITIONS", "64"))
+    client.create_collection(
+        collection_name=collection_name,
+        schema=build_schema(embedding_dim, partition_key=partition_key, vector_type=index_config.vector_type),
+        index_params=build_index_params(index_config, partition_key=partition_key, embedding_dim=embedding_dim),
+        consistency_level=consistency_level,
+        **kwargs
+    )
+    logger.info(f"已创建collection {collection_name}: {index_config.vector_type}({embedding_dim}), "
+                f"index={index_config.index_type}/{index_config.metric_type} {index_config.build_params(embedding_dim)}"
+                + (f", partition_key={PARTITION_KEY_FIELD}" if partition_key else ""))
+    return True
+
+
+def describe_vector_index(client: MilvusClient, collection_name: str) -> Optional[Dict[str, Any]]:
+    """查询collection上稠密向量字段的实际索引（类型、度量和向量存储类型）
+
+    旧collection由LangChain自动创建，索引为 L2 + AUTOINDEX，检索参数必须与实际索引一致。
+
+    Returns:
+        Optional[Dict]: {"index_type": ..., "metric_type": ..., "vector_type": ...}，没有索引时返回None
+    """
+    index_names = client.list_indexes(collection_name, field_name=VECTOR_FIELD)
+    if not index_names:
+        return None
+    index = client.describe_index(collection_name, index_names[0])
+
+    vector_type = "FLOAT_VECTOR"
+    for field in client.describe_collection(collection_name).get("fields", []):
+        if field["name"] == VECTOR_FIELD:
+            vector_type = next((name for name, data_type in VECTOR_DATA_TYPES.items()
+                                if data_type == field["type"]), vector_type)
+    return {
+        "index_type": index.get("index_type", "AUTOINDEX"),
+        "metric_type": index.get("metric_type", "L2"),
+        "vector_type": vector_type,
+    }
+
+
+def default_embedding_dim() -> int:
+    """新建collection使用的向量维度
+
+    优先取 MILVUS_EMBEDDING_DIM，否则与向量模型输出维度 VECTOR_EMBEDDING_DIMENSIONS 保持一致。
+    """
+    return int(os.getenv("MILVUS_EMBEDDING_DIM") or os.getenv("VECTOR_EMBEDDING_DIMENSIONS") or "1536")
@@ -1,19 +1,78 @@
 """Milvus存储管理类"""
 
+import hashlib
 import os
+import threading
 import time
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Set, Tuple
 from langchain_milvus import Milvus,BM25BuiltInFunction
 from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
+from pymilvus import MilvusClient
 from dotenv import load_dotenv
 
 from ..chunks.models import ChunkResult
+from ..chunks.tokenizer import estimate_tokens
+from .milvus_schema import (PARTITION_KEY_FIELD, SPARSE_SEARCH_PARAMS, IndexConfig, default_embedding_dim,
+                            describe_vector_index, ensure_collection)
 
 # 加载环境变量
 load_dotenv()
 
 
+# 单次存在性查询的最大ID数，避免过滤表达式过长
+_EXISTENCE_QUERY_BATCH = 500
+# 按文本查询时单次过滤表达式中文本的最大总字符数
+_TEXT_QUERY_MAX_CHARS = 65536
+
+# 已确认存在的collection及其实际向量索引（按 uri/db/collection 缓存），避免每次实例化都查询Milvus
+_COLLECTION_INDEXES: Dict[Tuple[str, str, str], Optional[Dict[str, Any]]] = {}
+_COLLECTION_INDEXES_LOCK = threading.Lock()
+
+# 检索参数中由MilvusStorage处理、不能透传给Milvus的键
+_SEARCH_PARAM_KEYS = ("ef", "nprobe", "search_list")
+
+
+@lru_cache(maxsize=None)
+def _get_milvus_client(uri: str, db_name: str, token: Optional[str]) -> MilvusClient:
+    """按连接参数复用MilvusClient（用于collection管理）"""
+    return MilvusClient(uri=uri, db_name=db_name, token=token or "")
+
+
+def make_chunk_id(collection_name: str, document_name: str, content: str) -> str:
+    """根据 (collection, 文档名, 内容哈希) 生成确定性的分块ID
+
+    同一文档的同一段内容总是得到相同的ID，重复写入时可以识别并跳过。
+    """
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"{collection_name}\x1f{document_name}\x1f{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class _EncodedEmbeddings(Embeddings):
+    """把embedding结果转换为collection向量存储类型（FLOAT16/BFLOAT16）的包装器
+
+    交给LangChain Milvus使用，使 add_documents 写入和检索时的查询向量与字段类型一致。
+    """
+
+    def __init__(self, embeddings: Embeddings, index_config: IndexConfig):
+        self.embeddings = embeddings
+        self.index_config = index_config
+
+    def embed_documents(self, texts: List[str]) -> List[Any]:
+        return self.index_config.encode_vectors(self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> Any:
+        return self.index_config.encode_vectors([self.embeddings.embed_query(text)])[0]
+
+
+def _escape_filter_value(value: str) -> str:
+    """转义Milvus过滤表达式中的字符串值"""
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
 class MilvusStorage:
     """Milvus向量存储管理类
     
@@ -26,8 +85,21 @@ class MilvusStorage:
                  uri: Optional[str] = None, 
                  db_name: Optional[str] = None,
                  token: Optional[str] = None,
-                 collection_name: Optional[str] = None):
+                 collection_name: Optional[str] = None,
+                 embed_batch_size: Optional[int] = None,
+                 max_batch_tokens: Optional[int] = None,
+                 embed_concurrency: Optional[int] = None,
+                 insert_batch_size: Optional[int] = None,
+                 embedding_dim: Optional[int] = None,
+                 index_config: Optional[IndexConfig] = None,
+                 shared_collection: Optional[str] = None):
         """初始化Milvus存储客户端
+
+        collection不存在时按 milvus_schema 中的显式schema创建（向量索引、BM25索引和标量过滤索引），
+        已存在的collection沿用其实际索引类型和度量生成检索参数。
+
+        配置共享collection后，collection_name只作为知识库ID（写入collection_id字段），
+        分块实际存储在共享collection中，所有检索、查询和删除都自动限定在该知识库范围内。
         
         Args:
             embedding_function: LangChain embedding模型实例（必需）
@@ -35,6 +107,16 @@ class MilvusStorage:
             db_name: 数据库名称，默认从环境变量MILVUS_DB_NAME获取
             token: 认证令牌，默认从环境变量MILVUS_TOKEN获取（可选）
             collection_name: 集合名称，默认从环境变量MILVUS_COLLECTION_NAME获取
+            embed_batch_size: 单次embedding请求的最大文本数（受提供方限制，DashScope为10），
+                默认从环境变量MILVUS_EMBED_BATCH_SIZE获取
+            max_batch_tokens: 单次embedding请求的最大token数，默认从环境变量MILVUS_EMBED_MAX_BATCH_TOKENS获取
+            embed_concurrency: 并发embedding请求数，默认从环境变量MILVUS_EMBED_CONCURRENCY获取
+            insert_batch_size: 单次Milvus批量插入的最大行数，默认从环境变量MILVUS_INSERT_BATCH_SIZE获取
+            embedding_dim: 向量维度（仅新建collection时使用），默认从环境变量MILVUS_EMBEDDING_DIM获取，
+                未设置时与VECTOR_EMBEDDING_DIMENSIONS一致
+            index_config: 向量索引配置，默认从环境变量读取（见 IndexConfig.from_env）
+            shared_collection: 共享collection名称，默认从环境变量MILVUS_SHARED_COLLECTION获取，
+                为空时每个知识库使用独立的collection
         """
         
         # 从环境变量读取配置，如果参数没有提供的话
@@ -42,13 +124,35 @@ class MilvusStorage:
         self.db_name = db_name or os.getenv('MILVUS_DB_NAME', 'rag')
         self.token = token or os.getenv('MILVUS_TOKEN') or None
         self.collection_name = collection_name or os.getenv('MILVUS_COLLECTION_NAME', 'chunks')
+        self.shared_collection = shared_collection or os.getenv('MILVUS_SHARED_COLLECTION') or None
+        # 实际存储分块的Milvus collection
+        self.milvus_collection = self.shared_collection or self.collection_name
         
         # 设置embedding函数
         self.embedding_function = embedding_function
+
+        # 批量写入配置
+        self.embed_batch_size = embed_batch_size or int(os.getenv('MILVUS_EMBED_BATCH_SIZE', '8'))
+        self.max_batch_tokens = max_batch_tokens or int(os.getenv('MILVUS_EMBED_MAX_BATCH_TOKENS', '16384'))
+        self.embed_concurrency = embed_concurrency or int(os.getenv('MILVUS_EMBED_CONCURRENCY', '4'))
+        self.insert_batch_size = insert_batch_size or int(os.getenv('MILVUS_INSERT_BATCH_SIZE', '1000'))
+
+        # 本实例写入或确认存在过的分块ID，只在实例生命周期（一次摄取）内有效，减少写入前的存在性查询。
+        # 不做进程级缓存：其他进程（如API进程删除文档）的删除无法通知到这里，缓存会让重新摄取的内容被误跳过
+        self._known_chunk_ids: Set[str] = set()
+        self._known_chunk_ids_lock = threading.Lock()
+
+        # 按显式schema准备collection，检索参数与实际索引保持一致
+        self.embedding_dim = embedding_dim or default_embedding_dim()
+        self.index_config = self._prepare_collection(index_config or IndexConfig.from_env())
         
-        # 初始化LangChain Milvus向量存储
+        # 初始化LangChain Milvus向量存储（collection已存在，LangChain直接接管，不再推断schema）
+        # 半精度向量字段需要把embedding结果转换为对应dtype
+        vector_store_embeddings = self.embedding_function
+        if self.index_config.vector_type != "FLOAT_VECTOR":
+            vector_store_embeddings = _EncodedEmbeddings(self.embedding_function, self.index_config)
         self.vector_store = Milvus(
-            embedding_function=self.embedding_function,
+            embedding_function=vector_store_embeddings,
             connection_args={
                 "uri": self.uri,
                 "db_name": self.db_name,
@@ -57,17 +161,82 @@ class MilvusStorage:
                 "uri": self.uri,
                 "db_name": self.db_name
             },
-            collection_name=self.collection_name,
+            collection_name=self.milvus_collection,
             builtin_function=BM25BuiltInFunction(),
+            search_params=[self.index_config.search_params(), SPARSE_SEARCH_PARAMS],
             consistency_level="Bounded",
             drop_old=False
         )
+
+    def _prepare_collection(self, index_config: IndexConfig) -> IndexConfig:
+        """确保collection存在，返回与collection实际向量索引一致的索引配置"""
+        cache_key = (self.uri, self.db_name, self.milvus_collection)
+        with _COLLECTION_INDEXES_LOCK:
+            cached = cache_key in _COLLECTION_INDEXES
+            index_info = _COLLECTION_INDEXES.get(cache_key)
+        if not cached:
+            client = _get_milvus_client(self.uri, self.db_name, self.token)
+            ensure_collection(client, self.milvus_collection, self.embedding_dim, index_config,
+                              partition_key=self.shared_collection is not None)
+            index_info = describe_vector_index(client, self.milvus_collection)
+            with _COLLECTION_INDEXES_LOCK:
+                _COLLECTION_INDEXES[cache_key] = index_info
+
+        if index_info is None:
+            return index_config
+        return index_config.with_index(index_info["index_type"], index_info["metric_type"], index_info["vector_type"])
+
+    def scope_filter(self, filter_expr: Optional[str] = None,
+                     collection_name: Optional[str] = None) -> Optional[str]:
+        """将过滤表达式限定在知识库范围内（共享collection模式下追加collection_id条件）
+
+        Args:
+            filter_expr: 原过滤表达式
+            collection_name: 知识库collection名称，默认为当前实例的collection_name
+
+        Returns:
+            Optional[str]: 限定后的过滤表达式，独立collection模式下原样返回
+        """
+        if not self.shared_collection:
+            return filter_expr
+        scope = f'{PARTITION_KEY_FIELD} == "{_escape_filter_value(collection_name or self.collection_name)}"'
+        return f"{scope} and ({filter_expr})" if filter_expr else scope
+
+    def search_params(self, k: Optional[int] = None, ef: Optional[int] = None,
+                      nprobe: Optional[int] = None, search_list: Optional[int] = None) -> List[Dict[str, Any]]:
+        """混合检索的参数列表（稠密向量 + BM25稀疏向量）
+
+        Args:
+            k: 每路召回的结果数
+            ef: 本次检索的HNSW ef（越大召回越高、延迟越高）
+            nprobe: 本次检索的IVF nprobe
+            search_list: 本次检索的DiskANN search_list
+
+        Returns:
+            List[Dict]: 与向量字段一一对应的检索参数，可直接作为similarity_search的param
+        """
+        return [self.index_config.search_params(k, ef, nprobe, search_list), SPARSE_SEARCH_PARAMS]
+
+    def _prepare_search_kwargs(self, k: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """把 ef/nprobe/search_list 转换为Milvus检索参数，并把过滤表达式限定在知识库范围内
+
+        每路召回数fetch_k默认取k（LangChain默认固定为4，k较大时结果会不足）。
+        """
+        overrides = {key: kwargs.pop(key) for key in _SEARCH_PARAM_KEYS if key in kwargs}
+        kwargs.setdefault('fetch_k', k)
+        scoped_expr = self.scope_filter(kwargs.get('expr'))
+        if scoped_expr:
+            kwargs['expr'] = scoped_expr
+        if 'param' not in kwargs:
+            kwargs['param'] = self.search_params(k=kwargs['fetch_k'], **overrides)
+        return kwargs
         
-    def store_chunks(self, chunk_result: ChunkResult) -> Dict[str, Any]:
+    def store_chunks(self, chunk_result: ChunkResult, source_url: Optional[str] = None) -> Dict[str, Any]:
         """存储分块结果到Milvus
         
         Args:
             chunk_result: 分块结果对象
+            source_url: 来源URL，默认与document_name相同
             
         Returns:
             Dict: 插入结果，包含插入状态和记录数
@@ -88,18 +257,20 @@ class MilvusStorage:
         
         try:
             # 转换为LangChain Document格式
-            documents = self._convert_chunks_to_langchain_docs(chunk_result)
+            documents = self._convert_chunks_to_langchain_docs(chunk_result, source_url)
             
-            # 为每个文档生成UUID作为主键
-            from uuid import uuid4
-            uuids = [str(uuid4()) for _ in range(len(documents))]
-            
-            # 使用LangChain Milvus添加文档，指定IDs
-            ids = self.vector_store.add_documents(documents=documents, ids=uuids)
+            # 确定性ID，已存储的分块直接跳过（不再调用embedding）
+            documents, chunk_ids, skipped_count = self._filter_new_documents(documents)
+            ids = []
+            if documents:
+                # 使用LangChain Milvus添加文档，指定IDs
+                ids = self.vector_store.add_documents(documents=documents, ids=chunk_ids)
+                self._remember_chunk_ids(chunk_ids)
             
             return {
                 "status": "success",
                 "inserted_count": len(documents),
+                "skipped_count": skipped_count,
                 "document_ids": ids,
                 "document_name": chunk_result.document_name,
                 "strategy": chunk_result.strategy.value,
@@ -109,11 +280,13 @@ class MilvusStorage:
         except Exception as e:
             raise Exception(f"Milvus插入失败: {str(e)}")
     
-    def _convert_chunks_to_langchain_docs(self, chunk_result: ChunkResult) -> List[Document]:
+    def _convert_chunks_to_langchain_docs(self, chunk_result: ChunkResult,
+                                          source_url: Optional[str] = None) -> List[Document]:
         """为现有Documents添加存储所需的元数据
         
         Args:
             chunk_result: 分块结果，chunks已经是Document列表
+            source_url: 来源URL（爬取网站时为入口URL），默认与document_name相同
             
         Returns:
             List[Document]: 添加了元数据的Document列表
@@ -124,11 +297,15 @@ class MilvusStorage:
             # 创建符合Milvus集合schema的元数据
             # 注意：page_content会自动映射到text_content字段
             updated_metadata = {
+                "header_path": "",  # Markdown标题路径，仅混合分块策略产生，其他策略为空（保持字段一致）
                 **chunk.metadata,  # 保留原有元数据
                 "document_name": chunk_result.document_name,
+                "source_url": source_url or chunk_result.document_name,
                 "chunk_index": idx,
                 "chunk_size": len(chunk.page_content)
             }
+            if self.shared_collection:
+                updated_metadata[PARTITION_KEY_FIELD] = self.collection_name
             
             # 创建新Document以避免修改原始数据
             # LangChain会自动将page_content映射到Milvus的text_content字段
@@ -141,11 +318,13 @@ class MilvusStorage:
         
         return documents
     
-    def store_chunks_batch(self, chunk_results: List[ChunkResult]) -> Dict[str, Any]:
+    def store_chunks_batch(self, chunk_results: List[ChunkResult],
+                           return_embeddings: bool = False) -> Dict[str, Any]:
         """批量存储多个分块结果到Milvus
         
         Args:
             chunk_results: 分块结果列表
+            return_embeddings: 是否在结果的embeddings字段中返回新写入分块的 文本 -> 向量（供LightRAG复用）
             
         Returns:
             Dict: 批量插入结果
@@ -184,73 +363,503 @@ class MilvusStorage:
                     "document_count": len(chunk_results)
                 }
             
-            # 分批处理文档，每批最多8个（留一些余量）
-            batch_size = 8
+            start_time = time.perf_counter()
+
+            # 已存储的分块跳过embedding和写入
+            all_documents, all_chunk_ids, skipped_count = self._filter_new_documents(all_documents)
+            texts = [doc.page_content for doc in all_documents]
+            batches = self.plan_embedding_batches(texts)
             all_ids = []
-            
-            for i in range(0, len(all_documents), batch_size):
-                batch_documents = all_documents[i:i + batch_size]
-                
-                # 为当前批次生成UUID作为主键
-                from uuid import uuid4
-                batch_uuids = [str(uuid4()) for _ in range(len(batch_documents))]
-                
-                # 批量添加当前批次的文档
-                batch_ids = self.vector_store.add_documents(documents=batch_documents, ids=batch_uuids)
-                all_ids.extend(batch_ids)
+            insert_calls = 0
+
+            # embedding请求并发执行；插入在单独线程中按顺序执行，
+            # 因此第N批的插入与后续批次的embedding重叠。向量累积到insert_batch_size后一次性写入
+            with ThreadPoolExecutor(max_workers=max(1, self.embed_concurrency)) as embed_pool, \
+                    ThreadPoolExecutor(max_workers=1) as insert_pool:
+                embed_futures = [
+                    embed_pool.submit(self.embedding_function.embed_documents, texts[start:end])
+                    for start, end in batches
+                ]
+
+                insert_futures = []
+                buffer_documents: List[Document] = []
+                buffer_embeddings: List[List[float]] = []
+                buffer_ids: List[str] = []
+                for (start, end), embed_future in zip(batches, embed_futures):
+                    buffer_documents.extend(all_documents[start:end])
+                    buffer_ids.extend(all_chunk_ids[start:end])
+                    buffer_embeddings.extend(embed_future.result())
+                    if len(buffer_documents) >= self.insert_batch_size:
+                        insert_futures.append(insert_pool.submit(
+                            self._insert_embedded_documents, buffer_documents, buffer_embeddings, buffer_ids
+                        ))
+                        buffer_documents, buffer_embeddings, buffer_ids = [], [], []
+
+                if buffer_documents:
+                    insert_futures.append(insert_pool.submit(
+                        self._insert_embedded_documents, buffer_documents, buffer_embeddings, buffer_ids
+                    ))
+
+                for insert_future in insert_futures:
+                    all_ids.extend(insert_future.result())
+                insert_calls = len(insert_futures)
+
+            text_embeddings = {}
+            if return_embeddings:
+                for (start, end), embed_future in zip(batches, embed_futures):
+                    text_embeddings.update(zip(texts[start:end], embed_future.result()))
+
+            elapsed = time.perf_counter() - start_time
+            chunks_per_second = total_chunks / elapsed if elapsed > 0 else 0.0
             
             return {
                 "status": "success",
-                "message": f"成功存储 {len(chunk_results)} 个文档的 {total_chunks} 个分块",
+                "message": f"成功存储 {len(chunk_results)} 个文档的 {total_chunks} 个分块（已存在跳过 {skipped_count} 个）",
                 "total_chunks": total_chunks,
+                "inserted_count": len(all_documents),
+                "skipped_count": skipped_count,
                 "document_count": len(chunk_results),
                 "ids": all_ids,
-                "collection_name": self.collection_name
+                "collection_name": self.collection_name,
+                "embedding_batches": len(batches),
+                "insert_calls": insert_calls,
+                "elapsed_seconds": round(elapsed, 3),
+                "chunks_per_second": round(chunks_per_second, 2),
+                **({"embeddings": text_embeddings} if return_embeddings else {})
             }
             
         except Exception as e:
             raise Exception(f"Milvus批量插入失败: {str(e)}")
     
-    def delete_document(self, 
+    def plan_embedding_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """按文本数和token数规划embedding批次
+
+        每批不超过embed_batch_size个文本，且估算token数不超过max_batch_tokens；
+        单个文本超过token上限时单独成批。
+
+        Args:
+            texts: 待向量化的文本列表
+
+        Returns:
+            List[Tuple[int, int]]: 每个批次在texts中的[start, end)区间
+        """
+        batches = []
+        batch_start = 0
+        batch_tokens = 0
+        for idx, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            batch_count = idx - batch_start
+            if batch_count > 0 and (
+                batch_count >= self.embed_batch_size or batch_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append((batch_start, idx))
+                batch_start = idx
+                batch_tokens = 0
+            batch_tokens += tokens
+        if batch_start < len(texts):
+            batches.append((batch_start, len(texts)))
+        return batches
+
+    def _insert_embedded_documents(self, documents: List[Document], embeddings: List[List[float]],
+                                   ids: List[str]) -> List[str]:
+        """使用已计算好的向量一次性写入Milvus
+
+        Args:
+            documents: 带元数据的Document列表
+            embeddings: 与documents一一对应的向量
+            ids: 与documents一一对应的确定性分块ID
+
+        Returns:
+            List[str]: 插入的主键列表
+        """
+        # 直接写入向量，BM25稀疏向量仍由Milvus内置函数生成
+        inserted_ids = self.vector_store.add_embeddings(
+            texts=[doc.page_content for doc in documents],
+            embeddings=self.index_config.encode_vectors(embeddings),
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids,
+            batch_size=max(len(documents), 1)
+        )
+        self._remember_chunk_ids(ids)
+        return inserted_ids
+
+    # ==================== 确定性分块ID ====================
+
+    def chunk_ids(self, chunk_result: ChunkResult) -> List[str]:
+        """返回与 chunk_result.chunks 一一对应的确定性分块ID"""
+        return [
+            make_chunk_id(self.collection_name, chunk_result.document_name, chunk.page_content)
+            for chunk in chunk_result.chunks
+        ]
+
+    def find_existing_ids(self, ids: List[str]) -> Set[str]:
+        """查询已经存储在collection中的分块ID
+
+        先查本实例的缓存，未命中的ID再按主键查询Milvus，查到的结果写回缓存。
+
+        Args:
+            ids: 待检查的分块ID
+
+        Returns:
+            Set[str]: 已存在的分块ID
+        """
+        with self._known_chunk_ids_lock:
+            existing = {chunk_id for chunk_id in ids if chunk_id in self._known_chunk_ids}
+        unknown = [chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id not in existing]
+        if not unknown:
+            return existing
+
+        client = self.vector_store.client
+        if not client.has_collection(self.milvus_collection):
+            return existing
+
+        primary_field = self.vector_store._primary_field
+        found: Set[str] = set()
+        for start in range(0, len(unknown), _EXISTENCE_QUERY_BATCH):
+            part = unknown[start:start + _EXISTENCE_QUERY_BATCH]
+            id_list = ", ".join(f'"{chunk_id}"' for chunk_id in part)
+            rows = client.query(
+                collection_name=self.milvus_collection,
+                filter=self.scope_filter(f"{primary_field} in [{id_list}]"),
+                output_fields=[primary_field]
+            )
+            found.update(row[primary_field] for row in rows)
+
+        self._remember_chunk_ids(found)
+        return existing | found
+
+    def plan_new_chunks(self, chunk_result: ChunkResult) -> List[int]:
+        """返回需要向量化并写入的分块下标（未存储过且在本文档中首次出现）"""
+        ids = self.chunk_ids(chunk_result)
+        existing = self.find_existing_ids(ids)
+        seen: Set[str] = set()
+        indices = []
+        for idx, chunk_id in enumerate(ids):
+            if chunk_id in existing or chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            indices.append(idx)
+        return indices
+
+    def _filter_new_documents(self, documents: List[Document]) -> Tuple[List[Document], List[str], int]:
+        """过滤掉已存储和重复的Document
+
+        Returns:
+            Tuple: (待写入的Document, 对应的分块ID, 跳过数量)
+        """
+        ids = [
+            make_chunk_id(self.collection_name, doc.metadata["document_name"], doc.page_content)
+            for doc in documents
+        ]
+        existing = self.find_existing_ids(ids)
+        new_documents, new_ids = [], []
+        for doc, chunk_id in zip(documents, ids):
+            if chunk_id in existing:
+                continue
+            existing.add(chunk_id)
+            new_documents.append(doc)
+            new_ids.append(chunk_id)
+        return new_documents, new_ids, len(documents) - len(new_documents)
+
+    def _remember_chunk_ids(self, ids) -> None:
+        with self._known_chunk_ids_lock:
+            self._known_chunk_ids.update(ids)
+
+    def _forget_chunk_ids(self) -> None:
+        with self._known_chunk_ids_lock:
+            self._known_chunk_ids.clear()
+
+    def store_embedded_chunks(self, chunk_result: ChunkResult, embeddings: List[List[float]],
+                              indices: Optional[List[int]] = None,
+                              source_url: Optional[str] = None) -> Dict[str, Any]:
+        """存储已经计算好向量的分块结果到Milvus（不再调用embedding模型）
+
+        Args:
+            chunk_result: 分块结果对象
+            embeddings: 向量列表，默认与chunks一一对应
+            indices: 向量对应的分块下标（通常来自 plan_new_chunks），为None时表示全部分块
+            source_url: 来源URL，默认与document_name相同
+
+        Returns:
+            Dict: 插入结果，包含插入状态和记录数
+
+        Raises:
+            ValueError: 当向量存储未初始化或向量数量与分块数量不一致时
+            Exception: Milvus操作异常
+        """
+        if not self.vector_store:
+            raise ValueError("向量存储未初始化")
+
+        if not chunk_result.chunks:
+            return {
+                "status": "success",
+                "inserted_count": 0,
+                "message": "无数据需要插入"
+            }
+
+        if indices is None:
+            indices = list(range(len(chunk_result.chunks)))
+        if len(embeddings) != len(indices):
+            raise ValueError(f"向量数量({len(embeddings)})与分块数量({len(indices)})不一致")
+
+        try:
+            all_documents = self._convert_chunks_to_langchain_docs(chunk_result, source_url)
+            documents, chunk_ids, skipped_count = self._filter_new_documents([all_documents[i] for i in indices])
+            embedding_by_id = {
+                make_chunk_id(self.collection_name, chunk_result.document_name, all_documents[i].page_content): vector
+                for i, vector in zip(indices, embeddings)
+            }
+            skipped_count += len(all_documents) - len(indices)
+
+            ids = []
+            if documents:
+                ids = self._insert_embedded_documents(
+                    documents, [embedding_by_id[chunk_id] for chunk_id in chunk_ids], chunk_ids
+                )
+
+            return {
+                "status": "success",
+                "inserted_count": len(documents),
+                "skipped_count": skipped_count,
+                "document_ids": ids,
+                "document_name": chunk_result.document_name,
+                "strategy": chunk_result.strategy.value,
+                "collection_name": self.collection_name
+            }
+
+        except Exception as e:
+            raise Exception(f"Milvus插入失败: {str(e)}")
+
+    def delete_document(self,
                        document_name: str, 
-                       collection_name: Optional[str] = None) -> Dict[str, Any]:
+                       collection_name: Optional[str] = None,
+                       keep_ids: Optional[List[str]] = None,
+                       return_texts: bool = False) -> Dict[str, Any]:
         """删除指定文档的所有chunks
         
         Args:
-            document_name: 文档名称
+            document_name: 文档名称（爬取的网页为页面URL）
             collection_name: collection名称
+            keep_ids: 需要保留的分块ID（文档更新时内容未变的分块）
+            return_texts: 是否返回被删除分块的文本（用于同步删除LightRAG中的对应文档）
             
+        Returns:
+            Dict: 删除结果
+        """
+        filter_expr = f'document_name == "{_escape_filter_value(document_name)}"'
+        if keep_ids:
+            id_list = ", ".join(f'"{chunk_id}"' for chunk_id in keep_ids)
+            filter_expr += f" and {self.vector_store._primary_field} not in [{id_list}]"
+        result = self._delete_by_filter(filter_expr, collection_name, return_texts)
+        result["document_name"] = document_name
+        return result
+
+    def delete_by_source(self,
+                         source_url: str,
+                         collection_name: Optional[str] = None,
+                         return_texts: bool = False) -> Dict[str, Any]:
+        """删除指定来源URL的所有chunks（爬取网站时为该入口URL下的所有页面）
+
+        旧collection没有source_url字段时，退化为按document_name前缀匹配。
+
+        Args:
+            source_url: 来源URL
+            collection_name: collection名称
+            return_texts: 是否返回被删除分块的文本
+
+        Returns:
+            Dict: 删除结果
+        """
+        target_collection = collection_name or self.collection_name
+        escaped = _escape_filter_value(source_url)
+        try:
+            fields = self._get_field_names(self.shared_collection or target_collection)
+        except Exception as e:
+            return {"status": "error", "source_url": source_url, "error": str(e)}
+
+        if "source_url" in fields:
+            filter_expr = f'source_url == "{escaped}"'
+        else:
+            filter_expr = f'document_name == "{escaped}" or document_name like "{escaped}%"'
+        result = self._delete_by_filter(filter_expr, target_collection, return_texts)
+        result["source_url"] = source_url
+        return result
+
+    def replace_document(self,
+                         chunk_result: ChunkResult,
+                         embeddings: Optional[List[List[float]]] = None,
+                         indices: Optional[List[int]] = None,
+                         source_url: Optional[str] = None,
+                         return_texts: bool = False) -> Dict[str, Any]:
+        """用新的分块替换文档已有的分块
+
+        Milvus没有跨操作的事务，这里采用"先写后删"：先写入新增分块（内容未变的分块
+        因ID相同直接保留），再删除不在新分块集合中的旧分块。替换过程中检索结果
+        只会短暂同时包含新旧分块，不会出现文档没有任何分块的窗口。
+
+        Args:
+            chunk_result: 新的分块结果
+            embeddings: 已计算好的向量（与indices对应），为None时自动为新增分块计算向量
+            indices: embeddings对应的分块下标，为None时表示全部分块
+            source_url: 来源URL，默认与document_name相同
+            return_texts: 是否返回被删除分块的文本
+
+        Returns:
+            Dict: 替换结果，包含新增、跳过和删除的分块数
+        """
+        if not self.vector_store:
+            raise ValueError("向量存储未初始化")
+
+        if embeddings is None:
+            indices = self.plan_new_chunks(chunk_result)
+            texts = [chunk_result.chunks[idx].page_content for idx in indices]
+            embeddings = []
+            for start, end in self.plan_embedding_batches(texts):
+                embeddings.extend(self.embedding_function.embed_documents(texts[start:end]))
+
+        store_result = self.store_embedded_chunks(chunk_result, embeddings, indices, source_url)
+        delete_result = self.delete_document(
+            chunk_result.document_name,
+            keep_ids=self.chunk_ids(chunk_result),
+            return_texts=return_texts
+        )
+        if delete_result["status"] != "success":
+            raise Exception(f"删除旧分块失败: {delete_result.get('error')}")
+
+        return {
+            "status": "success",
+            "document_name": chunk_result.document_name,
+            "inserted_count": store_result["inserted_count"],
+            "skipped_count": store_result.get("skipped_count", 0),
+            "deleted_count": delete_result["deleted_count"],
+            "deleted_texts": delete_result.get("deleted_texts", []),
+            "collection_name": self.collection_name
+        }
+
+    def _get_field_names(self, collection_name: str) -> Set[str]:
+        """获取collection的字段名"""
+        description = self.vector_store.client.describe_collection(collection_name=collection_name)
+        return {field["name"] for field in description.get("fields", [])}
+
+    def _find_existing_texts(self, texts: List[str], collection_name: Optional[str] = None) -> Set[str]:
+        """查询知识库中仍有分块使用的文本
+
+        Args:
+            texts: 待检查的文本
+            collection_name: collection名称（共享collection模式下为知识库ID）
+
+        Returns:
+            Set[str]: 仍存在对应分块的文本
+        """
+        target_collection = collection_name or self.collection_name
+        client = self.vector_store.client
+        text_field = self.vector_store._text_field
+        found: Set[str] = set()
+        batch: List[str] = []
+        batch_chars = 0
+
+        def query(part: List[str]) -> None:
+            value_list = ", ".join(f'"{_escape_filter_value(text)}"' for text in part)
+            rows = client.query(
+                collection_name=self.shared_collection or target_collection,
+                filter=self.scope_filter(f"{text_field} in [{value_list}]", target_collection),
+                output_fields=[text_field],
+                # 紧接在删除之后查询，Bounded一致性可能仍能读到刚删除的分块
+                consistency_level="Strong"
+            )
+            found.update(row[text_field] for row in rows)
+
+        # 按条数和字符数分批，避免过滤表达式过长
+        for text in dict.fromkeys(texts):
+            if batch and (len(batch) >= _EXISTENCE_QUERY_BATCH or batch_chars + len(text) > _TEXT_QUERY_MAX_CHARS):
+                query(batch)
+                batch, batch_chars = [], 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            query(batch)
+        return found
+
+    def _delete_by_filter(self, filter_expr: str, collection_name: Optional[str] = None,
+                          return_texts: bool = False) -> Dict[str, Any]:
+        """按过滤表达式删除分块
+
+        Args:
+            filter_expr: Milvus过滤表达式
+            collection_name: collection名称（共享collection模式下为知识库ID）
+            return_texts: 删除前先查询匹配分块，返回其来源文档名以及删除后已无分块使用的文本
+
         Returns:
             Dict: 删除结果
         """
         target_collection = collection_name or self.collection_name
+        # 共享collection模式下删除范围限定在目标知识库内
+        physical_collection = self.shared_collection or target_collection
+        filter_expr = self.scope_filter(filter_expr, target_collection)
         
         try:
             if not self.vector_store:
                 raise ValueError("向量存储未初始化")
             
-            # 使用LangChain Milvus删除功能
-            # 注意：LangChain Milvus可能不支持按元数据过滤删除，这里提供基本实现
+            client = self.vector_store.client
+            if not client.has_collection(physical_collection):
+                return {
+                    "status": "success",
+                    "deleted_count": 0,
+                    "deleted_texts": [],
+                    "collection_name": target_collection
+                }
+
+            deleted_texts, deleted_documents = [], []
+            if return_texts:
+                text_field = self.vector_store._text_field
+                rows = client.query(
+                    collection_name=physical_collection,
+                    filter=filter_expr,
+                    output_fields=[text_field, "document_name"],
+                    consistency_level="Strong"
+                )
+                deleted_texts = list(dict.fromkeys(row[text_field] for row in rows))
+                deleted_documents = list(dict.fromkeys(row.get("document_name") for row in rows if row.get("document_name")))
+
+            result = client.delete(collection_name=physical_collection, filter=filter_expr)
+            deleted_count = result.get("delete_count", 0) if isinstance(result, dict) else 0
+            self._forget_chunk_ids()
+            if deleted_texts:
+                # LightRAG文档ID按内容计算，多个文档可能包含相同内容的分块，
+                # 只返回已经没有其他分块引用的文本，避免删除仍被其他文档使用的LightRAG数据
+                in_use = self._find_existing_texts(deleted_texts, target_collection)
+                deleted_texts = [text for text in deleted_texts if text not in in_use]
             return {
-                "status": "error",
-                "document_name": document_name,
-                "error": "LangChain Milvus不支持按文档名删除，请使用其他方式",
+                "status": "success",
+                "deleted_count": deleted_count,
+                "deleted_texts": deleted_texts,
+                "deleted_documents": deleted_documents,
                 "collection_name": target_collection
             }
             
         except Exception as e:
             return {
                 "status": "error", 
-                "document_name": document_name,
-                "error": str(e)
+                "error": str(e),
+                "collection_name": target_collection
             }
     
     def drop_collection(self) -> Dict[str, Any]:
         """删除当前实例的 collection
+
+        共享collection模式下只删除该知识库的全部分块，共享collection本身保留。
         
         Returns:
             Dict: 删除结果，包含状态、消息和collection名称
         """
+        if self.shared_collection:
+            result = self._delete_by_filter("")
+            if result["status"] == "success":
+                result["message"] = (f"成功删除知识库 '{self.collection_name}' 在共享Collection "
+                                     f"'{self.shared_collection}' 中的 {result['deleted_count']} 个分块")
+            return result
+
         try:
             if not self.vector_store:
                 raise ValueError("向量存储未初始化")
@@ -262,6 +871,9 @@ class MilvusStorage:
             if client.has_collection(self.collection_name):
                 # 删除 collection
                 client.drop_collection(self.collection_name)
+                self._forget_chunk_ids()
+                with _COLLECTION_INDEXES_LOCK:
+                    _COLLECTION_INDEXES.pop((self.uri, self.db_name, self.collection_name), None)
                 return {
                     "status": "success",
                     "message": f"成功删除 Collection '{self.collection_name}'",
@@ -289,6 +901,7 @@ class MilvusStorage:
             **kwargs: 传递给as_retriever方法的参数，支持的参数包括：
                 - k: 返回文档数量 (默认: 4)
                 - filter: 文档元数据过滤条件
+                - search_kwargs中的ef/nprobe/search_list: 覆盖默认的向量检索参数
             
         Returns:
             BaseRetriever: 混合检索器实例
@@ -300,6 +913,7 @@ class MilvusStorage:
             if 'search_kwargs' not in kwargs:
                 kwargs['search_kwargs'] = {}
             kwargs['search_kwargs']['ranker_type'] = 'rrf'
+            self._prepare_search_kwargs(kwargs['search_kwargs'].get('k', 4), kwargs['search_kwargs'])
             
             return self.vector_store.as_retriever(**kwargs)
         except Exception as e:
@@ -313,6 +927,7 @@ class MilvusStorage:
             k: 返回结果数量
             **kwargs: 其他搜索参数，支持：
                 - filter: 文档元数据过滤条件
+                - ef / nprobe / search_list: 本次检索的向量索引参数（覆盖默认值）
                 - 其他Milvus搜索参数
             
         Returns:
@@ -322,6 +937,7 @@ class MilvusStorage:
             # 固定使用RRF排序算法进行结果融合
             # 这确保了向量检索和BM25检索结果的最佳融合
             kwargs['ranker_type'] = 'rrf'
+            self._prepare_search_kwargs(k, kwargs)
             return self.vector_store.similarity_search(query, k=k, **kwargs)
         except Exception as e:
             raise Exception(f"混合检索失败: {str(e)}")
@@ -334,6 +950,7 @@ class MilvusStorage:
             k: 返回结果数量
             **kwargs: 其他搜索参数，支持：
                 - filter: 文档元数据过滤条件
+                - ef / nprobe / search_list: 本次检索的向量索引参数（覆盖默认值）
                 - 其他Milvus搜索参数
             
         Returns:
@@ -343,6 +960,7 @@ class MilvusStorage:
             # 固定使用RRF排序算法进行结果融合
             # 这确保了向量检索和BM25检索结果的最佳融合
             kwargs['ranker_type'] = 'rrf'
+            self._prepare_search_kwargs(k, kwargs)
             return self.vector_store.similarity_search_with_score(query, k=k, **kwargs)
         except Exception as e:
             raise Exception(f"带分数混合检索失败: {str(e)}")
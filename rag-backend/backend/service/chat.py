@@ -218,12 +218,30 @@ async def chat_stream(chat_request: ChatRequest) -> AsyncGenerator[Dict[str, Any
             extra_data={"node_name": "user_input"}
         )
         
-        # 调用 RAGGraph stream 方法
-        logger.info("调用 RAGGraph.stream 方法...")
+        # 调用 RAGGraph 可恢复的流式方法
+        logger.info("调用 RAGGraph.astream_resumable 方法...")
         
         try:
-            # 使用 stream_mode="mix" 进行流式处理，传入initial_state
-            async for mode,chunk in rag_graph.astream(initial_state, context, stream_mode="mix"):
+            # mix模式流式处理，传入initial_state；节点失败时从失败节点按指数退避重试
+            async for mode,chunk in rag_graph.astream_resumable(initial_state, context):
+                if mode == "retry":
+                    retry_content = (
+                        f"节点 {', '.join(chunk['next_nodes']) or 'unknown'} 执行失败，"
+                        f"{chunk['delay']:.1f}秒后从该节点恢复（第{chunk['attempt']}/{chunk['max_retries']}次重试）"
+                    )
+                    logger.warning(f"{retry_content}: {chunk['error']}")
+                    # 失败节点恢复时会重新输出token，客户端需丢弃这些节点已输出的token
+                    yield {
+                        "type": "retry",
+                        "session_id": session_id,
+                        "node_name": "retry",
+                        "discard_nodes": chunk['next_nodes'],
+                        "attempt": chunk['attempt'],
+                        "max_retries": chunk['max_retries'],
+                        "content": retry_content
+                    }
+                    continue
+
                 if mode == "updates":
                      # 显示节点名称
                     node_name = list(chunk.keys())[0]
@@ -341,10 +359,13 @@ async def chat_stream(chat_request: ChatRequest) -> AsyncGenerator[Dict[str, Any
                     
                 if mode =="messages":
                     chunkmessage,metadata=chunk
+                    # token携带所属节点，重试时客户端按节点丢弃失败尝试的输出
+                    token_node = metadata.get("langgraph_node", "")
                     if chunkmessage.response_metadata and chunkmessage.response_metadata["finish_reason"] == "stop":
                         yield {
                         "type": "token",
                         "session_id": session_id,
+                        "node_name": token_node,
                         "content": "\n"
                     }
                     if chunkmessage.content:
@@ -352,6 +373,7 @@ async def chat_stream(chat_request: ChatRequest) -> AsyncGenerator[Dict[str, Any
                         yield {
                             "type": "token",
                             "session_id": session_id,
+                            "node_name": token_node,
                             "content": chunkmessage.content
                         }
 
@@ -377,34 +399,18 @@ async def chat_stream(chat_request: ChatRequest) -> AsyncGenerator[Dict[str, Any
 
 
         except Exception as stream_error:
-            logger.warning(f"流式输出失败，回退到普通模式: {str(stream_error)}")
+            # 已按指数退避从失败节点重试，仍失败则返回错误
+            logger.error(f"流式输出失败，重试次数已用尽: {str(stream_error)}")
             logger.exception("详细错误信息:")
-            # 回退到普通调用
-            try:
-                result = rag_graph.invoke(input_data, context)
-                if isinstance(result, dict) and "final_answer" in result and result["final_answer"]:
-                    yield {
-                        "type": "answer",
-                        "session_id": session_id,
-                        "content": result["final_answer"],
-                        "sources": result.get("answer_sources", [])
-                    }
-                else:
-                    # 如果没有final_answer，尝试从result中提取内容
-                    content = str(result) if result else "处理完成，但未获得有效响应"
-                    yield {
-                        "type": "message",
-                        "session_id": session_id,
-                        "content": content
-                    }
-            except Exception as invoke_error:
-                logger.error(f"普通调用也失败: {str(invoke_error)}")
-                yield {
-                    "type": "error",
-                    "session_id": session_id,
-                    "error": str(invoke_error),
-                    "message": "处理失败"
-                }
+            yield {
+                "type": "error",
+                "session_id": session_id,
+                "error": str(stream_error),
+                "message": "处理失败"
+            }
+        finally:
+            # 释放失败恢复使用的异步连接池（RAGGraph按请求创建）
+            await rag_graph.aclose()
         
         # 发送完成信号
         yield {
@@ -1,5 +1,7 @@
 import asyncio
 import json
+import os
+import httpx
 from datetime import datetime
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, LLMConfig, DefaultMarkdownGenerator, BrowserConfig
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy, DFSDeepCrawlStrategy
@@ -10,16 +12,19 @@ from backend.param.crawl import CrawlRequest
 from backend.rag.storage.milvus_storage import MilvusStorage
 from backend.rag.storage.lightrag_storage import LightRAGStorage
 from backend.config.embedding import get_embedding_model
-from backend.rag.chunks.chunks import ChunkResult, TextChunker
-from backend.rag.chunks.models import ChunkConfig, ChunkStrategy, DocumentContent
 from backend.rag.chunks.document_extraction import DocumentExtractor
+from backend.rag.chunks.mineru_client import get_shared_client
 from backend.config.log import get_logger
 from backend.config.redis import get_redis_client
+from redis.exceptions import ResponseError
+from backend.service.ingestion_pipeline import IngestionPipeline, PipelineConfig
+from backend.service.ingestion_queue import IngestionQueue
+from backend.service.document_download import DocumentDownloader
+from backend.service.crawl_manifest import (
+    CrawlManifest, CrawlSummary, ManifestEntry, PAGE_CHANGED, PAGE_UNCHANGED, fingerprint_markdown
+)
 import asyncio
 import subprocess
-import requests
-import tempfile
-import os
 
 
 # 获取logger实例
@@ -30,24 +35,101 @@ CRAWL_STATUS_PROCESSING = "processing"
 CRAWL_STATUS_COMPLETED = "completed"
 CRAWL_STATUS_ERROR = "error"
 
+# 有爬虫状态的集合ID索引（Set），替代 KEYS crawl_status:* 扫描
+CRAWL_STATUS_INDEX_KEY = "crawl_status_index"
+# 每个集合保留的进度事件条数（Stream crawl_events:{collection_id}）
+CRAWL_EVENTS_MAXLEN = 1000
+
+# 任务队列中的爬取任务类型
+CRAWL_JOB_TYPE = "crawl"
+
 async def initialize_collection_and_store(request: CrawlRequest):
+    """在当前进程中直接执行爬取入库（不经过任务队列）"""
+    document_id = await _add_crawl_document(request)
+    await crawl_and_store(request)
+    await _mark_document_processed(document_id)
+
+
+async def enqueue_crawl_job(request: CrawlRequest) -> str:
+    """创建文档记录并把爬取入库任务提交到任务队列，由独立的worker进程执行
+
+    Args:
+        request: 爬取请求
+
+    Returns:
+        str: 任务ID
+    """
+    document_id = await _add_crawl_document(request)
+    # 任务详情以明文保存在Redis中，API密钥不进入队列，由worker从自身环境变量获取
+    job_id = await IngestionQueue().enqueue(CRAWL_JOB_TYPE, {
+        "request": request.model_dump(exclude={"api_key"}),
+        "document_id": document_id,
+    })
+    await update_crawl_status(request.collection_id, CRAWL_STATUS_PROCESSING, "任务已进入队列，等待执行")
+    return job_id
+
+
+async def run_crawl_job(payload: dict) -> dict:
+    """worker执行的爬取任务，成功后把文档标记为已处理
+
+    任务失败会被重试：爬虫清单和确定性分块ID保证重复执行不会产生重复数据。
+    """
+    request = CrawlRequest(**payload["request"])
+    request.api_key = _resolve_llm_api_key(request.provider)
+    summary = await crawl_and_store(request)
+    await _mark_document_processed(payload.get("document_id"))
+    return summary.to_dict()
+
+
+def _resolve_llm_api_key(provider) -> str:
+    """worker中LLM内容过滤使用的API密钥: 优先 CRAWL_LLM_API_KEY，其次 {PROVIDER}_API_KEY"""
+    api_key = os.getenv("CRAWL_LLM_API_KEY")
+    if not api_key and isinstance(provider, str) and provider:
+        api_key = os.getenv(f"{provider.upper()}_API_KEY")
+    return api_key or ""
+
+
+async def crawl_and_store(request: CrawlRequest) -> CrawlSummary:
+    """爬取并写入Milvus和LightRAG，同时维护爬虫状态"""
     milvus_storage = MilvusStorage(
         embedding_function=get_embedding_model(),
         collection_name=request.collection_id,
     )
 
+    # LightRAG按自身的 embedding_dim 取共享嵌入模型：维度与Milvus一致时是同一个实例，
+    # 直接复用Milvus阶段计算的分块向量；维度不同（EMBEDDING_DIM）时使用对应维度的模型重新向量化
     lightrag_storage = LightRAGStorage(workspace=request.collection_id)
     
-    
     # 初始化爬虫状态
     await init_crawl_status(request.collection_id)
     
-    # 为对应的知识库添加文档记录
+    try:
+        summary = await crawl_doc(request.url, request.prefix, request.if_llm, request.model_id, request.provider, request.base_url, request.api_key, milvus_storage, lightrag_storage, request.collection_id)
+        # await test_crawl_doc(request.url, request.prefix, request.if_llm, request.model_id, request.provider, request.base_url, request.api_key)
+        # 爬虫完成，更新状态为已完成
+        await update_crawl_status(request.collection_id, CRAWL_STATUS_COMPLETED, summary.message(),
+                                  extra=summary.to_dict(), final=True)
+        return summary
+    except Exception as e:
+        # 爬虫异常，更新状态为错误
+        await update_crawl_status(request.collection_id, CRAWL_STATUS_ERROR, str(e), final=True)
+        raise
+    finally:
+        await lightrag_storage.finalize()
+
+
+async def _add_crawl_document(request: CrawlRequest):
+    """为对应的知识库添加文档记录
+
+    Returns:
+        Optional[int]: 文档ID，知识库不存在或添加失败时返回None
+    """
     from backend.service.knowledge_library import add_document
     from backend.param.knowledge_library import AddDocumentRequest
     from backend.config.database import DatabaseFactory
     from backend.model.knowledge_library import KnowledgeLibrary
     
+    db = None
     try:
         # 根据collection_id查找知识库
         db = DatabaseFactory.create_session()
@@ -66,8 +148,9 @@ async def initialize_collection_and_store(request: CrawlRequest):
             )
             
             # 添加文档到知识库
-            await add_document(doc_request, library.user_id)
+            response = await add_document(doc_request, library.user_id)
             logger.info(f"成功为知识库 {library.title} 添加文档记录: {request.title or '爬虫文档'}")
+            return response.data.get("id") if isinstance(response.data, dict) else None
         else:
             logger.warning(f"未找到collection_id为 {request.collection_id} 的知识库")
             
@@ -76,79 +159,139 @@ async def initialize_collection_and_store(request: CrawlRequest):
     finally:
         if db:
             db.close()
-    
-    try:
-        await crawl_doc(request.url, request.prefix, request.if_llm, request.model_id, request.provider, request.base_url, request.api_key, milvus_storage, lightrag_storage, request.collection_id)
-        # await test_crawl_doc(request.url, request.prefix, request.if_llm, request.model_id, request.provider, request.base_url, request.api_key)
-        # 爬虫完成，更新状态为已完成
-        await update_crawl_status(request.collection_id, CRAWL_STATUS_COMPLETED)
-    except Exception as e:
-        # 爬虫异常，更新状态为错误
-        await update_crawl_status(request.collection_id, CRAWL_STATUS_ERROR, str(e))
-        raise
+    return None
+
+
+async def _mark_document_processed(document_id):
+    """把文档标记为已处理"""
+    if document_id is None:
+        return
+    from backend.service.knowledge_library import mark_document_processed
+    await asyncio.to_thread(mark_document_processed, document_id)
+
+
+def _status_key(collection_id: str) -> str:
+    return f"crawl_status:{collection_id}"
+
+
+def _events_key(collection_id: str) -> str:
+    return f"crawl_events:{collection_id}"
+
+
+def _add_event(pipe, collection_id: str, event: dict):
+    """在pipeline中追加一条进度事件（Redis Stream，保留最近 CRAWL_EVENTS_MAXLEN 条）"""
+    pipe.xadd(
+        _events_key(collection_id),
+        {key: str(value) for key, value in event.items() if value is not None},
+        maxlen=CRAWL_EVENTS_MAXLEN,
+        approximate=True
+    )
+
+
+def _decode_status(status_data: dict) -> dict:
+    """把Hash中的字符串值还原为原来的类型"""
+    if "count" in status_data:
+        status_data["count"] = int(status_data["count"])
+    if "final" in status_data:
+        status_data["final"] = status_data["final"] in (1, "1")
+    return status_data
+
+
+def is_final_crawl_status(status_data: dict) -> bool:
+    """状态或事件是否为爬取的最后一条状态（旧状态没有final字段时按completed判断）"""
+    if "final" in status_data:
+        return bool(status_data["final"])
+    return status_data.get("status") == CRAWL_STATUS_COMPLETED
 
 
 async def init_crawl_status(collection_id: str):
     """初始化爬虫状态"""
     try:
         redis_client = await get_redis_client()
+        now = datetime.now().isoformat()
         status_data = {
             "status": CRAWL_STATUS_PROCESSING,
             "count": 0,
             "message": "爬虫任务开始",
-            "start_time": datetime.now().isoformat(),
-            "last_update": datetime.now().isoformat()
+            "start_time": now,
+            "last_update": now,
+            "final": 0
         }
-        await redis_client.set(f"crawl_status:{collection_id}", json.dumps(status_data))
+        async with redis_client.pipeline(transaction=True) as pipe:
+            # 先删除旧状态（包括旧版本的JSON字符串格式）
+            pipe.delete(_status_key(collection_id))
+            pipe.hset(_status_key(collection_id), mapping=status_data)
+            pipe.sadd(CRAWL_STATUS_INDEX_KEY, collection_id)
+            _add_event(pipe, collection_id, {"type": "status", **status_data})
+            await pipe.execute()
         logger.info(f"初始化爬虫状态: {collection_id}")
     except Exception as e:
         logger.warning(f"Redis连接失败，跳过状态存储: {e}")
 
 
-async def update_crawl_status(collection_id: str, status: str, message: str = None, count: int = None):
-    """更新爬虫状态"""
+async def update_crawl_status(collection_id: str, status: str, message: str = None, count: int = None,
+                              extra: dict = None, final: bool = False):
+    """更新爬虫状态
+
+    单次pipeline完成 HSET 字段更新和进度事件发布，不再读取-修改-写回整个状态。
+
+    Args:
+        collection_id: 集合ID
+        status: 爬虫状态
+        message: 状态消息
+        count: 已处理页面数，为None时不修改
+        extra: 额外写入的字段（如爬取统计）
+        final: 是否为本次爬取的最后一条状态（完成或整体失败）。单个页面失败的状态同样是 error，
+            订阅方只能依据该标记判断爬取已结束
+    """
     try:
         redis_client = await get_redis_client()
-        
-        # 获取当前状态
-        current_status = await redis_client.get(f"crawl_status:{collection_id}")
-        if current_status:
-            status_data = json.loads(current_status)
-        else:
-            status_data = {
-                "status": status,
-                "count": 0,
-                "message": message or "",
-                "start_time": datetime.now().isoformat(),
-                "last_update": datetime.now().isoformat()
-            }
-        
-        # 更新状态数据
-        status_data["status"] = status
-        status_data["last_update"] = datetime.now().isoformat()
-        
+        now = datetime.now().isoformat()
+
+        fields = {"status": status, "last_update": now, "final": int(final)}
         if message:
-            status_data["message"] = message
-        
+            fields["message"] = message
         if count is not None:
-            status_data["count"] = count
-        
-        await redis_client.set(f"crawl_status:{collection_id}", json.dumps(status_data))
+            fields["count"] = count
+        if extra:
+            fields.update(extra)
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            # 状态不存在时补齐初始字段
+            pipe.hsetnx(_status_key(collection_id), "start_time", now)
+            pipe.hsetnx(_status_key(collection_id), "count", 0)
+            pipe.hset(_status_key(collection_id), mapping=fields)
+            pipe.sadd(CRAWL_STATUS_INDEX_KEY, collection_id)
+            _add_event(pipe, collection_id, {"type": "status", **fields})
+            await pipe.execute()
         logger.info(f"更新爬虫状态: {collection_id} - {status}")
     except Exception as e:
         logger.warning(f"Redis连接失败，跳过状态更新: {e}")
 
 
+# 原子地增加计数、更新时间并发布进度事件，返回新的计数；状态不存在时不做任何操作
+_INCREMENT_COUNT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local count = redis.call('HINCRBY', KEYS[1], 'count', 1)
+redis.call('HSET', KEYS[1], 'last_update', ARGV[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'type', 'progress', 'count', count, 'last_update', ARGV[1])
+return count
+"""
+
+
 async def increment_crawl_count(collection_id: str):
     """增加爬虫计数"""
     redis_client = await get_redis_client()
-    
-    current_status = await redis_client.get(f"crawl_status:{collection_id}")
-    if current_status:
-        status_data = json.loads(current_status)
-        status_data["count"] = status_data.get("count", 0) + 1
-        status_data["last_update"] = datetime.now().isoformat()
-        await redis_client.set(f"crawl_status:{collection_id}", json.dumps(status_data))
+    await redis_client.eval(
+        _INCREMENT_COUNT_SCRIPT,
+        2,
+        _status_key(collection_id),
+        _events_key(collection_id),
+        datetime.now().isoformat(),
+        CRAWL_EVENTS_MAXLEN
+    )
 
 
 async def get_crawl_status(collection_id: str) -> dict:
@@ -164,11 +307,13 @@ async def get_crawl_status(collection_id: str) -> dict:
     """
     redis_client = await get_redis_client()
     
-    status_data = await redis_client.get(f"crawl_status:{collection_id}")
-    if status_data:
-        return json.loads(status_data)
-    else:
-        return {}
+    try:
+        status_data = await redis_client.hgetall(_status_key(collection_id))
+    except ResponseError:
+        # 兼容旧版本的JSON字符串格式
+        legacy_data = await redis_client.get(_status_key(collection_id))
+        return json.loads(legacy_data) if legacy_data else {}
+    return _decode_status(status_data) if status_data else {}
 
 
 async def get_all_crawl_status() -> dict:
@@ -180,19 +325,65 @@ async def get_all_crawl_status() -> dict:
     """
     redis_client = await get_redis_client()
     
-    # 获取所有以crawl_status:开头的key
-    keys = await redis_client.keys("crawl_status:*")
+    # 通过集合索引获取集合ID，避免 KEYS 扫描整个库
+    collection_ids = sorted(await redis_client.smembers(CRAWL_STATUS_INDEX_KEY))
+    if not collection_ids:
+        return {}
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for collection_id in collection_ids:
+            pipe.hgetall(_status_key(collection_id))
+        results = await pipe.execute(raise_on_error=False)
     
     status_dict = {}
-    for key in keys:
-        # 提取集合ID
-        collection_id = key.replace("crawl_status:", "")
-        status_data = await redis_client.get(key)
-        if status_data:
-            status_dict[collection_id] = json.loads(status_data)
+    stale_ids = []
+    for collection_id, status_data in zip(collection_ids, results):
+        if isinstance(status_data, Exception):
+            status_dict[collection_id] = await get_crawl_status(collection_id)
+        elif status_data:
+            status_dict[collection_id] = _decode_status(status_data)
+        else:
+            stale_ids.append(collection_id)
+
+    # 清理状态已不存在的索引项
+    if stale_ids:
+        await redis_client.srem(CRAWL_STATUS_INDEX_KEY, *stale_ids)
     
     return status_dict
 
+
+async def subscribe_crawl_events(collection_id: str, last_event_id: str = "$", block_ms: int = 15000):
+    """订阅爬虫进度事件
+
+    从Redis Stream读取进度事件，没有新事件时每隔 block_ms 产出一次 None（用于发送心跳）。
+
+    Args:
+        collection_id: 集合ID
+        last_event_id: 从该事件ID之后开始读取，"$" 表示只读取新事件，"0" 表示从头读取
+        block_ms: 单次阻塞等待的毫秒数
+
+    Yields:
+        Optional[Tuple[str, dict]]: (事件ID, 事件内容)
+    """
+    redis_client = await get_redis_client()
+    stream_key = _events_key(collection_id)
+
+    if last_event_id == "$":
+        # 记录当前位置，避免两次XREAD之间的事件丢失
+        latest = await redis_client.xrevrange(stream_key, count=1)
+        last_event_id = latest[0][0] if latest else "0"
+
+    while True:
+        response = await redis_client.xread({stream_key: last_event_id}, count=100, block=block_ms)
+        if not response:
+            yield None
+            continue
+        for _, events in response:
+            for event_id, event in events:
+                last_event_id = event_id
+                yield event_id, _decode_status(event)
+
+
 async def test_crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provider: str, base_url: str, api_token: str):
     content_filter: RelevantContentFilter
     if if_llm:
@@ -263,11 +454,26 @@ async def test_crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, pr
             async for result in await crawler.arun(site, config=config):
                 print(f"URL: {result.url}")
                 # print(result.markdown.fit_markdown) 
-                # handle_md(result.markdown.fit_markdown, type="print", path=f"{result}.md")
     print("测试完成")
 
 
-async def crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provider: str, base_url: str, api_token: str, milvus_storage: MilvusStorage, lightrag_storage: LightRAGStorage, collection_id: str):
+async def crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provider: str, base_url: str, api_token: str, milvus_storage: MilvusStorage, lightrag_storage: LightRAGStorage, collection_id: str) -> CrawlSummary:
+    """爬取网站或文档并增量入库
+
+    通过爬虫清单跳过未变化的页面：文档文件先发送条件请求（ETag/Last-Modified），
+    返回304时不再下载和解析；网页比较规范化markdown指纹，
+    未变化则跳过，变化则替换该页面的旧分块，新页面正常入库。
+
+    网站深度爬取不做条件请求预检：crawl4ai无论如何都会抓取每个页面（跳过页面也就无法发现其中的链接），
+    预检只会让请求量翻倍。
+
+    Returns:
+        CrawlSummary: 抓取、跳过、新增、更新的页面统计
+    """
+    manifest = CrawlManifest(collection_id)
+    await manifest.load()
+    summary = CrawlSummary()
+
     # 检测URL是否是文档文件（PDF、DOCX等）
     url_lower = site.lower()
     is_document_file = any(url_lower.endswith(ext) for ext in ['.pdf', '.docx', '.doc', '.md', '.txt'])
@@ -276,47 +482,38 @@ async def crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provide
         # 处理文档文件：使用DocumentExtractor提取内容
         logger.info(f"检测到文档文件URL，使用DocumentExtractor处理: {site}")
         try:
+            if site in await manifest.check_not_modified([site]):
+                summary.not_modified += 1
+                summary.skipped += 1
+                logger.info(f"文档未修改（304），跳过处理: {site}")
+                return summary
+
             extractor = DocumentExtractor()
+            response_headers = None
             
             # 判断文件类型
             file_ext = url_lower.split('.')[-1]
             
             if file_ext == 'pdf':
-                # PDF使用mineru API（需要URL）
-                logger.info("使用MinerU API提取PDF内容...")
-                doc_content = extractor.read_document(site, pdf_extract_method="mineru")
-            elif file_ext in ['doc', 'docx']:
-                # DOCX需要先下载到本地
-                logger.info("下载DOCX文件到本地...")
-                response = requests.get(site, timeout=300)
-                response.raise_for_status()
-                
-                # 创建临时文件
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as tmp_file:
-                    tmp_file.write(response.content)
-                    tmp_path = tmp_file.name
-                
+                # PDF由MinerU直接按URL读取，单独取一次响应头用于下次条件请求
                 try:
-                    doc_content = extractor.read_document(tmp_path)
-                finally:
-                    # 清理临时文件
-                    if os.path.exists(tmp_path):
-                        os.remove(tmp_path)
+                    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+                        response_headers = dict((await client.head(site)).headers)
+                except Exception as e:
+                    logger.debug(f"获取PDF响应头失败: {e}")
+                # PDF使用mineru API（需要URL），异步客户端轮询不阻塞事件循环
+                logger.info("使用MinerU API提取PDF内容...")
+                doc_content = await extractor.aread_document(site, pdf_extract_method="mineru",
+                                                             mineru_client=get_shared_client())
             else:
-                # 其他格式（md, txt）直接下载
+                # 其他格式（docx, md, txt）流式下载到临时文件（小文件只在内存中），直接从文件对象解析
                 logger.info(f"下载{file_ext}文件...")
-                response = requests.get(site, timeout=300)
-                response.raise_for_status()
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}', mode='w', encoding='utf-8') as tmp_file:
-                    tmp_file.write(response.text)
-                    tmp_path = tmp_file.name
-                
-                try:
-                    doc_content = extractor.read_document(tmp_path)
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.remove(tmp_path)
+                async with DocumentDownloader() as downloader:
+                    with await downloader.download(site) as document:
+                        response_headers = document.headers
+                        doc_content = await asyncio.to_thread(
+                            extractor.read_stream, document.file, document.file_name, file_ext
+                        )
             
             # 将提取的内容转换为markdown格式（或直接使用文本）
             md_content = doc_content.content
@@ -325,17 +522,29 @@ async def crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provide
                 raise Exception("文档内容提取为空")
             
             logger.info(f"成功提取文档内容，长度: {len(md_content)} 字符")
+            summary.fetched += 1
+
+            fingerprint = fingerprint_markdown(md_content)
+            entry = ManifestEntry.from_response(fingerprint, response_headers)
+            page_state = manifest.classify(site, fingerprint)
+            if page_state == PAGE_UNCHANGED:
+                summary.skipped += 1
+                await manifest.save(site, entry)
+                logger.info(f"文档内容未变化，跳过处理: {site}")
+                return summary
             
-            # 使用handle_md处理提取的内容
-            await handle_md(
-                md_content=md_content,
-                storage_type="light_and_milvus",
-                param=[milvus_storage, lightrag_storage],
-                collection_id=collection_id
-            )
+            # 通过摄取流水线处理提取的内容
+            pipeline = _create_ingestion_pipeline(milvus_storage, lightrag_storage, collection_id, manifest, summary, source_url=site)
+            manifest.stage(site, entry)
+            if page_state == PAGE_CHANGED:
+                summary.updated += 1
+            else:
+                summary.added += 1
+            await pipeline.submit(md_content, document_name=site, replace=page_state == PAGE_CHANGED)
+            await pipeline.close()
             
-            logger.info(f"成功处理文档文件: {site}")
-            return
+            logger.info(f"成功处理文档文件: {site}，{summary.message()}")
+            return summary
             
         except Exception as e:
             error_msg = f"处理文档文件失败: {str(e)}"
@@ -400,164 +609,116 @@ async def crawl_doc(site: str, prefix: str, if_llm: bool, model_id: str, provide
         markdown_generator=md_generator,
     )
 
-    async with AsyncWebCrawler(config=browser_conf) as crawler:
-            try:
-                async for result in await crawler.arun(site, config=config):
-                    try:
-                        logger.info(f"URL: {result.url}")
+    # 爬虫只负责把页面放入流水线，分块/向量化/存储在后台各阶段并发进行
+    pipeline = _create_ingestion_pipeline(milvus_storage, lightrag_storage, collection_id, manifest, summary, source_url=site)
+    pipeline.start()
+
+    try:
+        async with AsyncWebCrawler(config=browser_conf) as crawler:
+                try:
+                    async for result in await crawler.arun(site, config=config):
+                        try:
+                            logger.info(f"URL: {result.url}")
+                            summary.fetched += 1
                         
-                        # 检查result.markdown是否存在且不为None
-                        if result.markdown is None:
-                            logger.warning(f"URL {result.url} 的markdown内容为空，跳过处理")
-                            continue
+                            # 检查result.markdown是否存在且不为None
+                            if result.markdown is None:
+                                logger.warning(f"URL {result.url} 的markdown内容为空，跳过处理")
+                                continue
                             
-                        # 检查fit_markdown是否存在且不为空
-                        if not hasattr(result.markdown, 'fit_markdown') or result.markdown.fit_markdown is None:
-                            logger.warning(f"URL {result.url} 的fit_markdown内容为空，跳过处理")
-                            continue
+                            # 检查fit_markdown是否存在且不为空
+                            if not hasattr(result.markdown, 'fit_markdown') or result.markdown.fit_markdown is None:
+                                logger.warning(f"URL {result.url} 的fit_markdown内容为空，跳过处理")
+                                continue
                             
-                        # 检查内容是否为空字符串
-                        if not result.markdown.fit_markdown.strip():
-                            logger.warning(f"URL {result.url} 的内容为空，跳过处理")
-                            continue
+                            # 检查内容是否为空字符串
+                            if not result.markdown.fit_markdown.strip():
+                                logger.warning(f"URL {result.url} 的内容为空，跳过处理")
+                                continue
                             
-                        await handle_md(md_content=result.markdown.fit_markdown, storage_type="light_and_milvus", param=[milvus_storage, lightrag_storage], collection_id=collection_id)
-                        # await handle_md(md_content=result.markdown.fit_markdown, storage_type="milvus", param=[milvus_storage], collection_id=collection_id)
-                        logger.info(f"成功处理: {result.url}")
+                            fingerprint = fingerprint_markdown(result.markdown.fit_markdown)
+                            entry = ManifestEntry.from_response(fingerprint, getattr(result, "response_headers", None))
+                            page_state = manifest.classify(result.url, fingerprint)
+                            if page_state == PAGE_UNCHANGED:
+                                summary.skipped += 1
+                                previous = manifest.entries[result.url]
+                                if (previous.etag, previous.last_modified) != (entry.etag, entry.last_modified):
+                                    await manifest.save(result.url, entry)
+                                logger.info(f"页面内容未变化，跳过处理: {result.url}")
+                                continue
+
+                            manifest.stage(result.url, entry)
+                            if page_state == PAGE_CHANGED:
+                                summary.updated += 1
+                            else:
+                                summary.added += 1
+
+                            # 队列满时在此等待（背压）；内容变化的页面替换旧分块
+                            await pipeline.submit(
+                                result.markdown.fit_markdown,
+                                document_name=result.url,
+                                replace=page_state == PAGE_CHANGED
+                            )
+                            logger.info(f"已提交到摄取流水线({page_state}): {result.url}")
                         
-                    except Exception as e:
-                        error_msg = f"处理URL {result.url} 时发生错误: {str(e)}"
-                        logger.error(error_msg)
-                        logger.info("跳过此URL，继续处理下一个...")
-                        # 更新状态为错误
-                        await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, error_msg)
-                        continue
+                        except Exception as e:
+                            error_msg = f"处理URL {result.url} 时发生错误: {str(e)}"
+                            logger.error(error_msg)
+                            logger.info("跳过此URL，继续处理下一个...")
+                            # 更新状态为错误
+                            await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, error_msg)
+                            continue
                         
-            except Exception as e:
-                error_msg = f"爬虫运行时发生错误: {str(e)}"
-                logger.error(error_msg)
-                logger.info("爬虫任务中断，但程序继续运行...")
-                # 更新状态为错误
-                await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, error_msg)
-            logger.info("爬虫运行完成")
+                except Exception as e:
+                    error_msg = f"爬虫运行时发生错误: {str(e)}"
+                    logger.error(error_msg)
+                    logger.info("爬虫任务中断，但程序继续运行...")
+                    # 更新状态为错误
+                    await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, error_msg)
+                logger.info("爬虫运行完成，等待摄取流水线处理剩余页面...")
+    finally:
+        await pipeline.close()
+        logger.info(f"摄取流水线处理完成，{summary.message()}")
 
+    return summary
 
-async def handle_md(md_content, storage_type="print", param=None, collection_id: str = None):
-    try:
-        if storage_type == "print":
-            logger.info(md_content)
-        elif storage_type == "stdio":
-            with open(param, 'w') as f:
-                f.write(md_content)
-        elif storage_type == "milvus":
-            if param is None:
-                logger.error("Milvus存储参数为空")
-                return
-                
-            chunker = TextChunker()
-            md_config = ChunkConfig(
-                strategy=ChunkStrategy.MARKDOWN_HEADER
-            )
-            document = DocumentContent(content=md_content, document_name="crawled_document")
-            md_result = chunker.chunk_document(document, md_config)
-            
-            # 检查分块结果
-            if md_result is None or not md_result.chunks:
-                logger.warning("文档分块结果为空，跳过存储")
-                return
-                
-            param[0].store_chunks_batch([md_result])
-            logger.info(f"成功存储文档分块，共 {len(md_result.chunks)} 个分块")
-            
-            # 更新爬虫计数
-            if collection_id:
-                await increment_crawl_count(collection_id)
-                
-        elif storage_type == "light_and_milvus":
-            if param is None:
-                logger.error("Milvus存储参数为空")
-                return
-                
-            chunker = TextChunker()
-            md_config = ChunkConfig(
-                strategy=ChunkStrategy.MARKDOWN_HEADER
-            )
-            document = DocumentContent(content=md_content, document_name="crawled_document")
-            md_result = chunker.chunk_document(document, md_config)
-            
-            # 检查分块结果
-            if md_result is None or not md_result.chunks:
-                logger.warning("文档分块结果为空，跳过存储")
-                return
-            
-            param[0].store_chunks_batch([md_result])
-            logger.info(f"成功存储文档分块到Milvus，共 {len(md_result.chunks)} 个分块")
-            # 将Document对象转换为字符串列表
-            text_chunks = [chunk.page_content for chunk in md_result.chunks]
-            try:
-                logger.info(f"开始存储 {len(text_chunks)} 个文本块到LightRAG...")
-                await param[1].insert_texts(text_chunks)
-                logger.info("成功存储文档到LightRAG")
-            except Exception as lightrag_error:
-                # 捕获LightRAG存储错误，记录详细信息但不中断整个流程
-                error_type = type(lightrag_error).__name__
-                error_msg = str(lightrag_error)
-                logger.error(f"LightRAG存储失败: {error_type}: {error_msg}")
-                
-                # 检查是否是连接错误
-                is_connection_error = any(keyword in error_msg.lower() for keyword in [
-                    'connection', '连接', '10054', 'reset', 'closed', 'timeout', '远程主机'
-                ])
-                
-                # 检查是否是pgvector扩展缺失
-                is_pgvector_error = any(keyword in error_msg.lower() for keyword in [
-                    'type "vector" does not exist', 'extension "vector" is not available',
-                    'pgvector', 'vector extension'
-                ])
-                
-                if is_pgvector_error:
-                    logger.error(
-                        "检测到PostgreSQL pgvector扩展缺失！\n"
-                        "LightRAG需要pgvector扩展来存储向量数据。\n"
-                        "请按照以下步骤安装：\n"
-                        "1. 下载pgvector扩展（如果使用Windows，需要编译或使用预编译版本）\n"
-                        "2. 在PostgreSQL中执行：CREATE EXTENSION IF NOT EXISTS vector;\n"
-                        "3. 或者使用Docker镜像：pgvector/pgvector:pg16（已包含扩展）\n"
-                        "参考文档：https://github.com/pgvector/pgvector\n"
-                        "注意: Milvus存储已成功，但LightRAG存储失败"
-                    )
-                elif is_connection_error:
-                    logger.error(
-                        "检测到数据库连接错误！可能的原因：\n"
-                        "1. Neo4j服务未运行或连接被关闭\n"
-                        "   - 检查Neo4j服务是否启动\n"
-                        "   - 检查环境变量: NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD\n"
-                        "2. PostgreSQL服务未运行或连接被关闭\n"
-                        "   - 检查PostgreSQL服务是否启动\n"
-                        "   - 检查环境变量: POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DATABASE等\n"
-                        "3. 网络连接问题或防火墙阻止\n"
-                        "注意: Milvus存储已成功，但LightRAG存储失败"
-                    )
-                
-                # 重新抛出异常，让外层catch处理
-                raise
-            
-            # 更新爬虫计数
-            if collection_id:
-                await increment_crawl_count(collection_id)
-        
-            
-    except Exception as e:
-        import traceback
-        error_type = type(e).__name__
-        error_msg = str(e)
-        error_traceback = traceback.format_exc()
-        
-        logger.error(f"处理markdown内容时发生错误: {error_type}: {error_msg}")
-        logger.debug(f"错误堆栈跟踪:\n{error_traceback}")
-        logger.info("跳过此内容的处理...")
-        
-        # 更新状态为错误，包含更详细的信息
-        detailed_error_msg = f"{error_type}: {error_msg}"
+
+def _create_ingestion_pipeline(milvus_storage: MilvusStorage, lightrag_storage: LightRAGStorage, collection_id: str,
+                               manifest: CrawlManifest = None, summary: CrawlSummary = None,
+                               source_url: str = None) -> IngestionPipeline:
+    """创建摄取流水线，页面完成时更新爬虫计数和爬虫清单，失败时更新爬虫状态，没有可存储内容时计为跳过"""
+    async def on_page_stored(document_name: str):
+        if summary is not None:
+            summary.stored += 1
+        if manifest is not None:
+            await manifest.commit(document_name)
+        if collection_id:
+            await increment_crawl_count(collection_id)
+
+    async def on_page_failed(document_name: str, error_msg: str):
+        if summary is not None:
+            summary.failed += 1
+        if manifest is not None:
+            # 下次爬取时重新处理该页面
+            await manifest.mark_failed(document_name)
         if collection_id:
-            await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, detailed_error_msg)
+            await update_crawl_status(collection_id, CRAWL_STATUS_ERROR, f"处理 {document_name} 失败: {error_msg}")
+
+    async def on_page_skipped(document_name: str, reason: str):
+        logger.info(f"页面没有可存储的内容，跳过: {document_name}（{reason}）")
+        if summary is not None:
+            summary.skipped += 1
+        if manifest is not None:
+            # 内容未变化时下次爬取直接跳过
+            await manifest.commit(document_name)
+
+    return IngestionPipeline(
+        milvus_storage=milvus_storage,
+        lightrag_storage=lightrag_storage,
+        collection_id=collection_id,
+        source_url=source_url,
+        config=PipelineConfig.from_env(),
+        on_page_stored=on_page_stored,
+        on_page_failed=on_page_failed,
+        on_page_skipped=on_page_skipped
+    )
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫清单（crawl manifest）
+按知识库记录每个URL上次抓取时的 ETag、Last-Modified 和规范化markdown指纹，
+重复爬取时用条件请求和指纹判断页面是否变化，未变化的页面不再重新向量化和入库。
+
+存储结构（Redis Hash）:
+    crawl_manifest:{collection_id}  ->  {url: json(ManifestEntry)}
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+import httpx
+
+from backend.config.log import get_logger
+from backend.config.redis import get_redis_client
+
+logger = get_logger("crawl_manifest")
+
+# 页面变化状态
+PAGE_NEW = "new"
+PAGE_CHANGED = "changed"
+PAGE_UNCHANGED = "unchanged"
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def fingerprint_markdown(md_content: str) -> str:
+    """计算规范化markdown的指纹
+
+    合并连续空白并去掉首尾空白，避免因换行/缩进差异误判为内容变化。
+    """
+    normalized = _WHITESPACE_PATTERN.sub(" ", md_content or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _get_header(headers: Optional[Dict[str, Any]], name: str) -> Optional[str]:
+    """大小写不敏感地读取响应头"""
+    if not headers:
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+@dataclass
+class ManifestEntry:
+    """单个URL的清单记录"""
+    fingerprint: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    crawled_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @classmethod
+    def from_response(cls, fingerprint: str, headers: Optional[Dict[str, Any]]) -> "ManifestEntry":
+        return cls(
+            fingerprint=fingerprint,
+            etag=_get_header(headers, "etag"),
+            last_modified=_get_header(headers, "last-modified"),
+        )
+
+
+@dataclass
+class CrawlSummary:
+    """一次爬取的页面统计"""
+    fetched: int = 0          # 爬虫返回的页面数
+    not_modified: int = 0     # 条件请求返回304的页面数
+    skipped: int = 0          # 跳过的页面数（未变化含304，以及没有可存储内容的页面）
+    added: int = 0            # 新页面数
+    updated: int = 0          # 内容变化、替换旧分块的页面数
+    stored: int = 0           # 成功入库的页面数
+    failed: int = 0           # 入库失败的页面数
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+    def message(self) -> str:
+        return (
+            f"抓取 {self.fetched} 页，跳过 {self.skipped} 页（304: {self.not_modified}），"
+            f"新增 {self.added} 页，更新 {self.updated} 页，入库成功 {self.stored} 页，失败 {self.failed} 页"
+        )
+
+
+class CrawlManifest:
+    """知识库的爬虫清单
+
+    使用方式：
+        manifest = CrawlManifest(collection_id)
+        await manifest.load()
+        not_modified = await manifest.check_not_modified([url])  # 文档文件下载前发送条件请求
+        state = manifest.classify(url, fingerprint)              # new / changed / unchanged
+        manifest.stage(url, entry)                               # 入库完成前暂存
+        await manifest.commit(url)                               # 入库成功后写入Redis
+    """
+
+    def __init__(self, collection_id: str):
+        self.collection_id = collection_id
+        self.key = f"crawl_manifest:{collection_id}"
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._pending: Dict[str, ManifestEntry] = {}
+
+    async def load(self) -> Dict[str, ManifestEntry]:
+        """从Redis加载清单，Redis不可用时视为首次爬取"""
+        try:
+            redis_client = await get_redis_client()
+            raw_entries = await redis_client.hgetall(self.key)
+            self.entries = {url: ManifestEntry(**json.loads(value)) for url, value in raw_entries.items()}
+            logger.info(f"加载爬虫清单: {self.collection_id}，已记录 {len(self.entries)} 个URL")
+        except Exception as e:
+            logger.warning(f"加载爬虫清单失败，按首次爬取处理: {e}")
+            self.entries = {}
+        return self.entries
+
+    def classify(self, url: str, fingerprint: str) -> str:
+        """根据指纹判断页面是新增、变化还是未变化"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return PAGE_NEW
+        if entry.fingerprint == fingerprint:
+            return PAGE_UNCHANGED
+        return PAGE_CHANGED
+
+    async def check_not_modified(self, urls: Optional[Iterable[str]] = None,
+                                 concurrency: Optional[int] = None,
+                                 timeout: float = 10.0) -> Set[str]:
+        """对已记录ETag/Last-Modified的URL发送条件请求
+
+        Args:
+            urls: 需要检查的URL，默认检查清单中所有URL
+            concurrency: 并发请求数，默认从环境变量CRAWL_CONDITIONAL_CONCURRENCY获取
+            timeout: 单个请求超时时间（秒）
+
+        Returns:
+            Set[str]: 服务端返回304（未修改）的URL集合
+        """
+        concurrency = concurrency or int(os.getenv("CRAWL_CONDITIONAL_CONCURRENCY", "8"))
+        candidates = []
+        for url in (urls if urls is not None else list(self.entries)):
+            entry = self.entries.get(url)
+            if entry and (entry.etag or entry.last_modified):
+                candidates.append((url, entry))
+        if not candidates:
+            return set()
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        not_modified: Set[str] = set()
+
+        async def check(client: httpx.AsyncClient, url: str, entry: ManifestEntry):
+            headers = {}
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            async with semaphore:
+                try:
+                    # 只需要状态码：以流式方式请求，返回200时不读取响应体直接关闭连接
+                    async with client.stream("GET", url, headers=headers) as response:
+                        status_code = response.status_code
+                except Exception as e:
+                    logger.debug(f"条件请求失败，按需重新处理: {url} - {e}")
+                    return
+            if status_code == 304:
+                not_modified.add(url)
+
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+            await asyncio.gather(*(check(client, url, entry) for url, entry in candidates))
+
+        logger.info(f"条件请求完成: {len(not_modified)}/{len(candidates)} 个URL未修改")
+        return not_modified
+
+    def stage(self, url: str, entry: ManifestEntry) -> None:
+        """暂存新的清单记录，等页面入库成功后再提交"""
+        self._pending[url] = entry
+
+    async def commit(self, url: str) -> None:
+        """提交暂存的清单记录"""
+        entry = self._pending.pop(url, None)
+        if entry is not None:
+            await self.save(url, entry)
+
+    async def save(self, url: str, entry: ManifestEntry) -> None:
+        """直接写入清单记录"""
+        self.entries[url] = entry
+        try:
+            redis_client = await get_redis_client()
+            await redis_client.hset(self.key, url, json.dumps(asdict(entry), ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"写入爬虫清单失败: {url} - {e}")
+
+    async def mark_failed(self, url: str) -> None:
+        """入库失败时调用：丢弃暂存记录并写入空指纹
+
+        页面可能已部分写入（如Milvus成功、LightRAG失败），空指纹保证下次爬取时
+        该页面被判定为"变化"并替换旧分块，而不是作为新页面重复写入。
+        """
+        self._pending.pop(url, None)
+        await self.save(url, ManifestEntry(fingerprint=""))
+
+    async def remove(self, urls: Iterable[str]) -> None:
+        """删除指定URL的清单记录（删除文档时调用，其他文档的记录保留）"""
+        urls = [url for url in dict.fromkeys(urls) if url]
+        if not urls:
+            return
+        for url in urls:
+            self.entries.pop(url, None)
+            self._pending.pop(url, None)
+        redis_client = await get_redis_client()
+        await redis_client.hdel(self.key, *urls)
+
+    async def clear(self) -> None:
+        """删除整个清单"""
+        self.entries = {}
+        self._pending = {}
+        redis_client = await get_redis_client()
+        await redis_client.delete(self.key)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档下载
+异步流式下载文档文件（docx/md/txt等），边下载边写入临时文件并限制最大体积，
+避免整个响应体常驻内存或超大文件拖垮进程。
+
+临时文件使用 SpooledTemporaryFile：小于 DOCUMENT_SPOOL_BYTES 的文件只保存在内存中，
+超过后自动转存到磁盘；文件对象可直接交给 DocumentExtractor.read_stream 解析，无需落盘路径。
+"""
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import unquote, urlparse
+
+import httpx
+
+from backend.config.log import get_logger
+
+logger = get_logger("document_download")
+
+
+class DocumentTooLargeError(Exception):
+    """文档超过允许的最大体积"""
+
+
+@dataclass
+class DownloadedDocument:
+    """已下载的文档"""
+    url: str
+    file: Any                          # 可读、可seek的文件对象，读取位置在开头
+    size: int
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(unquote(urlparse(self.url).path)) or self.url
+
+    @property
+    def file_extension(self) -> str:
+        return self.file_name.split('.')[-1].lower()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "DownloadedDocument":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class DocumentDownloader:
+    """异步文档下载器
+
+    使用方式：
+        async with DocumentDownloader() as downloader:
+            with await downloader.download(url) as document:
+                content = extractor.read_stream(document.file, document.file_name)
+            results = await downloader.download_many(urls)   # 失败的项为异常对象
+    """
+
+    def __init__(self,
+                 max_bytes: Optional[int] = None,
+                 max_concurrency: Optional[int] = None,
+                 spool_bytes: Optional[int] = None,
+                 timeout: float = 300.0,
+                 chunk_size: int = 64 * 1024,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            max_bytes: 单个文档最大字节数，默认从环境变量DOCUMENT_MAX_BYTES获取
+            max_concurrency: 同时下载的文档数，默认从环境变量DOCUMENT_DOWNLOAD_CONCURRENCY获取
+            spool_bytes: 小于该字节数的文档只保存在内存中，默认从环境变量DOCUMENT_SPOOL_BYTES获取
+            timeout: 单个请求的读超时（秒）
+            chunk_size: 每次读取的字节数
+            transport: 自定义httpx传输层（测试用）
+        """
+        self.max_bytes = max_bytes or int(os.getenv("DOCUMENT_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("DOCUMENT_DOWNLOAD_CONCURRENCY", "4")))
+        self.spool_bytes = spool_bytes or int(os.getenv("DOCUMENT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=timeout), follow_redirects=True,
+                                         transport=transport)
+
+    async def __aenter__(self) -> "DocumentDownloader":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def download(self, url: str) -> DownloadedDocument:
+        """流式下载单个文档
+
+        先根据 Content-Length 拒绝超限的文件，再在下载过程中累计字节数，
+        服务端未声明长度或声明不实时超过上限立即中断。
+
+        Raises:
+            DocumentTooLargeError: 文档超过最大体积
+            httpx.HTTPError: 请求失败
+        """
+        async with self._semaphore:
+            file = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+            try:
+                async with self._client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    declared = response.headers.get("content-length")
+                    if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                        raise DocumentTooLargeError(
+                            f"文档大小 {int(declared)} 字节超过上限 {self.max_bytes} 字节: {url}")
+
+                    size = 0
+                    async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise DocumentTooLargeError(f"文档超过上限 {self.max_bytes} 字节，已中断下载: {url}")
+                        file.write(chunk)
+                    headers = dict(response.headers)
+            except BaseException:
+                file.close()
+                raise
+
+        file.seek(0)
+        logger.info(f"文档下载完成: {url}，{size} 字节")
+        return DownloadedDocument(url=url, file=file, size=size, headers=headers)
+
+    async def download_many(self, urls: List[str]) -> List[Union[DownloadedDocument, Exception]]:
+        """并发下载多个文档（并发数受 max_concurrency 限制）
+
+        Returns:
+            List[Union[DownloadedDocument, Exception]]: 与输入顺序一致，失败的项为异常对象
+        """
+        return await asyncio.gather(*(self.download(url) for url in urls), return_exceptions=True)
@@ -0,0 +1,405 @@
+"""
+知识图谱摘要（服务端多级细节）
+
+大知识库的LightRAG图谱有数万个实体，直接下发子图既慢又无法渲染。这里对整个图谱做一次预计算:
+    1. 节点排序: 度数和PageRank（按边权重）
+    2. 社区划分: Louvain（模块度优化），最大的若干社区作为超级节点，其余小社区/孤立实体归入"其他"
+    3. 布局坐标: 超级节点之间做力导向布局，社区内部按排名螺旋排布（小社区再做力导向微调）
+
+结果按知识库和图谱版本号缓存（见 visual_graph），前端先获取超级节点概览，再按需展开某个社区。
+全部计算基于numpy向量化，不依赖图计算库。
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 社区内部节点间距（布局坐标单位），社区半径约为 NODE_SPACING * sqrt(社区节点数)
+NODE_SPACING = 10.0
+# 节点数不超过该值的社区在螺旋布局基础上做力导向微调
+_REFINE_MAX_NODES = 200
+_GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+@dataclass
+class GraphSummary:
+    """整个图谱的预计算结果（节点按下标引用）"""
+    node_ids: List[str]
+    entity_types: List[Optional[str]]
+    src: np.ndarray                  # 边的起点下标
+    tgt: np.ndarray                  # 边的终点下标
+    weight: np.ndarray               # 边权重
+    degree: np.ndarray
+    pagerank: np.ndarray
+    cluster: np.ndarray              # 每个节点所属社区，按社区大小从0编号
+    positions: np.ndarray            # (节点数, 2) 布局坐标
+    cluster_sizes: np.ndarray
+    cluster_centers: np.ndarray      # (社区数, 2)
+    cluster_radius: np.ndarray
+    misc_cluster: Optional[int] = None   # 合并小社区得到的"其他"社区编号
+    index: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.index:
+            self.index = {node_id: idx for idx, node_id in enumerate(self.node_ids)}
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    @property
+    def num_clusters(self) -> int:
+        return len(self.cluster_sizes)
+
+    def scores(self, rank_by: str = "pagerank") -> np.ndarray:
+        """节点排序分数: pagerank 或 degree"""
+        if rank_by == "degree":
+            return self.degree.astype(np.float64)
+        if rank_by == "pagerank":
+            return self.pagerank
+        raise ValueError(f"unknown rank_by: {rank_by}")
+
+    def ranked(self, indices: np.ndarray, rank_by: str = "pagerank") -> np.ndarray:
+        """按排序分数从高到低排列节点下标（分数相同按节点ID）"""
+        scores = self.scores(rank_by)[indices]
+        names = np.asarray(self.node_ids, dtype=object)[indices]
+        return indices[np.lexsort((names, -scores))] if len(indices) else indices
+
+    def members(self, cluster_id: int, rank_by: str = "pagerank") -> np.ndarray:
+        """社区内的节点下标，按排名排序"""
+        if cluster_id < 0 or cluster_id >= self.num_clusters:
+            raise ValueError(f"cluster {cluster_id} not found")
+        return self.ranked(np.flatnonzero(self.cluster == cluster_id), rank_by)
+
+    def induced_edges(self, indices: np.ndarray) -> np.ndarray:
+        """两端都在给定节点集合中的边的下标"""
+        selected = np.zeros(self.num_nodes, dtype=bool)
+        selected[indices] = True
+        return np.flatnonzero(selected[self.src] & selected[self.tgt])
+
+    def cluster_edges(self) -> List[Dict[str, Any]]:
+        """社区之间的聚合边（边数和权重和），按权重从高到低"""
+        c_src, c_tgt, counts, weights = aggregate_cluster_edges(
+            self.cluster, self.num_clusters, self.src, self.tgt, self.weight)
+        order = np.argsort(-weights, kind="stable")
+        return [
+            {"source": int(c_src[i]), "target": int(c_tgt[i]), "count": int(counts[i]),
+             "weight": round(float(weights[i]), 4)}
+            for i in order
+        ]
+
+
+def aggregate_cluster_edges(cluster: np.ndarray, num_clusters: int, src: np.ndarray, tgt: np.ndarray,
+                            weight: np.ndarray):
+    """把节点间的边聚合为社区间的边
+
+    Returns:
+        (社区起点, 社区终点, 边数, 权重和)，社区起点编号小于终点
+    """
+    a, b = cluster[src], cluster[tgt]
+    mask = a != b
+    lo, hi = np.minimum(a[mask], b[mask]), np.maximum(a[mask], b[mask])
+    keys = lo.astype(np.int64) * max(num_clusters, 1) + hi
+    uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    weights = np.bincount(inverse, weights=weight[mask], minlength=len(uniq))
+    return uniq // max(num_clusters, 1), uniq % max(num_clusters, 1), counts, weights
+
+
+def _edge_weight(edge: Dict[str, Any]) -> float:
+    try:
+        weight = float(edge.get("weight", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+    return weight if weight > 0 else 1.0
+
+
+def pagerank(num_nodes: int, src: np.ndarray, tgt: np.ndarray, weight: np.ndarray,
+             damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    """无向带权图的PageRank（幂迭代）"""
+    if num_nodes == 0:
+        return np.zeros(0)
+    a, b = np.concatenate([src, tgt]), np.concatenate([tgt, src])
+    w = np.concatenate([weight, weight])
+    out_weight = np.bincount(a, weights=w, minlength=num_nodes)
+    dangling = out_weight == 0
+    share = w / np.where(out_weight == 0, 1.0, out_weight)[a]
+
+    rank = np.full(num_nodes, 1.0 / num_nodes)
+    for _ in range(max_iter):
+        spread = np.bincount(b, weights=rank[a] * share, minlength=num_nodes)
+        new_rank = (1 - damping) / num_nodes + damping * (spread + rank[dangling].sum() / num_nodes)
+        converged = np.abs(new_rank - rank).sum() < tol * num_nodes
+        rank = new_rank
+        if converged:
+            break
+    return rank / rank.sum()
+
+
+def _local_moving(num_nodes: int, a: np.ndarray, b: np.ndarray, w: np.ndarray, k: np.ndarray, two_m: float,
+                  resolution: float, rng: np.random.Generator, max_iter: int) -> np.ndarray:
+    """Louvain局部移动阶段（半同步）：每轮所有节点计算移入各邻居社区的模块度增益，随机一半节点移动到增益最大的社区"""
+    community = np.arange(num_nodes)
+    not_self = a != b
+    a, b, w = a[not_self], b[not_self], w[not_self]
+    all_nodes = np.arange(num_nodes, dtype=np.int64)
+    for _ in range(max_iter):
+        sigma = np.bincount(community, weights=k, minlength=num_nodes)
+        # (节点, 邻居社区) 的连接权重；补充每个节点当前社区的记录，保证"不动"总是候选
+        keys = np.concatenate([a.astype(np.int64) * num_nodes + community[b], all_nodes * num_nodes + community])
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        k_in = np.bincount(inverse, weights=np.concatenate([w, np.zeros(num_nodes)]), minlength=len(uniq))
+        nodes, candidates = uniq // num_nodes, uniq % num_nodes
+        current = candidates == community[nodes]
+        gain = k_in - resolution * k[nodes] * (sigma[candidates] - np.where(current, k[nodes], 0)) / two_m
+
+        # 每个节点取增益最大的社区，相同时保留当前社区
+        order = np.lexsort((~current, -gain, nodes))
+        sorted_nodes = nodes[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_nodes[1:] != sorted_nodes[:-1]
+        best_nodes, best, best_gain = sorted_nodes[first], candidates[order][first], gain[order][first]
+        current_gain = np.zeros(num_nodes)
+        current_gain[nodes[current]] = gain[current]
+
+        move = (best != community[best_nodes]) & (best_gain > current_gain[best_nodes] + 1e-12)
+        if not move.any():
+            break
+        # 同时移动所有节点会互相交换社区来回振荡，每轮只移动随机一半
+        move &= rng.random(len(best_nodes)) < 0.5
+        community[best_nodes[move]] = best[move]
+    return community
+
+
+def louvain(num_nodes: int, src: np.ndarray, tgt: np.ndarray, weight: np.ndarray, resolution: float = 1.0,
+            max_levels: int = 10, max_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """Louvain社区划分（numpy向量化）
+
+    局部移动后把每个社区聚合为一个节点（社区内部的边成为自环）再继续，直到社区数不再减少。
+    局部移动为半同步更新，模块度略低于逐个节点顺序移动的实现，但数万节点的图谱只需几秒。
+
+    Returns:
+        每个节点的社区标签（未重新编号）
+    """
+    membership = np.arange(num_nodes)
+    # 每条无向边存两个方向，k 为节点的带权度数，two_m 为总权重的两倍
+    a, b = np.concatenate([src, tgt]), np.concatenate([tgt, src])
+    w = np.concatenate([weight, weight]).astype(np.float64)
+    two_m = float(w.sum())
+    if num_nodes == 0 or two_m == 0:
+        return membership
+    rng = np.random.default_rng(seed)
+    size = num_nodes
+    for _ in range(max_levels):
+        k = np.bincount(a, weights=w, minlength=size)
+        community = _local_moving(size, a, b, w, k, two_m, resolution, rng, max_iter)
+        labels, community = np.unique(community, return_inverse=True)
+        membership = community[membership]
+        if len(labels) == size:
+            break
+        keys = community[a].astype(np.int64) * len(labels) + community[b]
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        w = np.bincount(inverse, weights=w, minlength=len(uniq))
+        a, b = uniq // len(labels), uniq % len(labels)
+        size = len(labels)
+    return membership
+
+
+def limit_communities(labels: np.ndarray, src: np.ndarray, tgt: np.ndarray, weight: np.ndarray,
+                      max_clusters: int, min_cluster_size: int = 2, rounds: int = 3):
+    """把社区数限制在 max_clusters 以内
+
+    最大的 max_clusters 个社区保留，其余社区整体并入连接权重最大的保留社区；
+    与保留社区没有连接的小社区和孤立实体合并为"其他"社区（编号最大）。
+
+    Returns:
+        (按社区大小从0编号的社区数组, "其他"社区编号或None)
+    """
+    if len(labels) == 0:
+        return np.zeros(0, dtype=np.int64), None
+    _, community, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    num_communities = len(counts)
+    order = np.argsort(-counts, kind="stable")
+    kept = np.zeros(num_communities, dtype=bool)
+    kept[[c for c in order[:max(1, max_clusters)] if counts[c] >= min_cluster_size]] = True
+    target = np.where(kept, np.arange(num_communities), -1)
+
+    a, b = np.concatenate([src, tgt]), np.concatenate([tgt, src])
+    w = np.concatenate([weight, weight])
+    for _ in range(rounds):
+        ca, cb = target[community[a]], target[community[b]]
+        mask = (ca < 0) & (cb >= 0)
+        if not mask.any():
+            break
+        keys = community[a[mask]].astype(np.int64) * num_communities + cb[mask]
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=w[mask], minlength=len(uniq))
+        sources, targets = uniq // num_communities, uniq % num_communities
+        best = np.lexsort((targets, -totals, sources))
+        first = np.ones(len(best), dtype=bool)
+        first[1:] = sources[best][1:] != sources[best][:-1]
+        target[sources[best][first]] = targets[best][first]
+
+    # 按合并后的社区大小重新编号，"其他"排在最后
+    merged = target[community]
+    sizes = np.bincount(merged[merged >= 0], minlength=num_communities)
+    kept_ids = np.flatnonzero(kept)
+    kept_ids = kept_ids[np.argsort(-sizes[kept_ids], kind="stable")]
+    remap = np.full(num_communities, len(kept_ids), dtype=np.int64)
+    remap[kept_ids] = np.arange(len(kept_ids))
+    cluster = np.where(merged >= 0, remap[np.maximum(merged, 0)], len(kept_ids))
+    misc_cluster = len(kept_ids) if (cluster == len(kept_ids)).any() else None
+    return cluster, misc_cluster
+
+
+def spiral_layout(count: int, spacing: float = NODE_SPACING) -> np.ndarray:
+    """向日葵螺旋布局: 第k个点位于半径 spacing*sqrt(k) 处，排名靠前的节点在中心"""
+    k = np.arange(count, dtype=np.float64)
+    radius = spacing * np.sqrt(k + 0.5)
+    angle = k * _GOLDEN_ANGLE
+    return np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+
+
+def force_layout(positions: np.ndarray, src: np.ndarray, tgt: np.ndarray, weight: np.ndarray,
+                 ideal: float, iterations: int = 60) -> np.ndarray:
+    """Fruchterman-Reingold力导向布局（稠密计算，只用于几百个节点以内）"""
+    pos = positions.astype(np.float64).copy()
+    count = len(pos)
+    if count < 2:
+        return pos
+    w = weight / weight.max() if len(weight) else weight
+    temperature = ideal * np.sqrt(count)
+    for step in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.maximum(np.linalg.norm(delta, axis=2), 1e-3)
+        # 斥力 ideal^2/d
+        disp = (delta / dist[..., None] * (ideal ** 2 / dist)[..., None]).sum(axis=1)
+        if len(src):
+            # 引力 d^2/ideal，按边权重缩放
+            edge_delta = pos[src] - pos[tgt]
+            edge_dist = np.maximum(np.linalg.norm(edge_delta, axis=1), 1e-3)
+            pull = edge_delta / edge_dist[:, None] * (edge_dist ** 2 / ideal * w)[:, None]
+            np.add.at(disp, src, -pull)
+            np.add.at(disp, tgt, pull)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        pos += disp / length[:, None] * np.minimum(length, limit)[:, None]
+    return pos
+
+
+def _separate_circles(centers: np.ndarray, radius: np.ndarray, gap: float, iterations: int = 100) -> np.ndarray:
+    """把重叠的社区圆推开"""
+    centers = centers.copy()
+    count = len(centers)
+    for _ in range(iterations):
+        delta = centers[:, None, :] - centers[None, :, :]
+        dist = np.linalg.norm(delta, axis=2)
+        overlap = radius[:, None] + radius[None, :] + gap - dist
+        np.fill_diagonal(overlap, 0)
+        overlap = np.maximum(overlap, 0)
+        if not overlap.any():
+            break
+        direction = delta / np.maximum(dist, 1e-6)[..., None]
+        # 完全重合的两个社区沿相反方向推开
+        coincident = dist < 1e-6
+        np.fill_diagonal(coincident, False)
+        if coincident.any():
+            sign = np.sign(np.arange(count)[:, None] - np.arange(count)[None, :])
+            direction[coincident] = np.column_stack([sign[coincident], np.zeros(coincident.sum())])
+        centers += (direction * (overlap / 2)[..., None]).sum(axis=1) * 0.5
+    return centers
+
+
+def build_graph_summary(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+                        max_clusters: int = 50, min_cluster_size: int = 2) -> GraphSummary:
+    """从图存储的全部节点和边计算排名、社区和布局
+
+    Args:
+        nodes: get_all_nodes() 的结果（含 id、entity_type）
+        edges: get_all_edges() 的结果（含 source、target、weight）
+        max_clusters: 作为超级节点的最大社区数，其余社区合并为"其他"
+        min_cluster_size: 小于该节点数的社区合并为"其他"
+
+    Returns:
+        GraphSummary
+    """
+    node_ids = [str(node["id"]) for node in nodes if node.get("id") is not None]
+    node_ids = list(dict.fromkeys(node_ids))
+    index = {node_id: idx for idx, node_id in enumerate(node_ids)}
+    types = {str(node["id"]): node.get("entity_type") for node in nodes if node.get("id") is not None}
+    entity_types = [types.get(node_id) for node_id in node_ids]
+    num_nodes = len(node_ids)
+
+    # 无向边去重（保留权重较大的一条），忽略自环和端点不存在的边
+    edge_map: Dict[tuple, float] = {}
+    for edge in edges:
+        source, target = index.get(str(edge.get("source"))), index.get(str(edge.get("target")))
+        if source is None or target is None or source == target:
+            continue
+        key = (source, target) if source < target else (target, source)
+        edge_map[key] = max(edge_map.get(key, 0.0), _edge_weight(edge))
+    if edge_map:
+        pairs = np.array(list(edge_map.keys()), dtype=np.int64)
+        src, tgt = pairs[:, 0], pairs[:, 1]
+        weight = np.fromiter(edge_map.values(), dtype=np.float64, count=len(edge_map))
+    else:
+        src = tgt = np.zeros(0, dtype=np.int64)
+        weight = np.zeros(0)
+
+    degree = (np.bincount(src, minlength=num_nodes) + np.bincount(tgt, minlength=num_nodes)).astype(np.int64)
+    ranks = pagerank(num_nodes, src, tgt, weight)
+
+    cluster, misc_cluster = limit_communities(louvain(num_nodes, src, tgt, weight), src, tgt, weight,
+                                              max_clusters=max_clusters, min_cluster_size=min_cluster_size)
+    num_clusters = int(cluster.max()) + 1 if num_nodes else 0
+    cluster_sizes = np.bincount(cluster, minlength=num_clusters)
+
+    # 社区内部布局（相对社区中心）
+    positions = np.zeros((num_nodes, 2))
+    cluster_radius = np.zeros(num_clusters)
+    members_by_cluster = []
+    for cluster_id in range(num_clusters):
+        members = np.flatnonzero(cluster == cluster_id)
+        members = members[np.lexsort((members, -ranks[members]))]
+        members_by_cluster.append(members)
+        local = spiral_layout(len(members))
+        if 2 < len(members) <= _REFINE_MAX_NODES and cluster_id != misc_cluster:
+            local_index = np.full(num_nodes, -1)
+            local_index[members] = np.arange(len(members))
+            inner = (local_index[src] >= 0) & (local_index[tgt] >= 0)
+            local = force_layout(local, local_index[src[inner]], local_index[tgt[inner]], weight[inner],
+                                 ideal=NODE_SPACING * 2)
+            local -= local.mean(axis=0)
+        radius = float(np.linalg.norm(local, axis=1).max()) + NODE_SPACING if len(local) else NODE_SPACING
+        # 力导向微调可能把社区撑大，缩放回螺旋布局的尺寸
+        target = NODE_SPACING * (np.sqrt(len(members)) + 1)
+        if radius > target:
+            local *= target / radius
+            radius = target
+        positions[members] = local
+        cluster_radius[cluster_id] = radius
+
+    # 超级节点布局: 以社区间边数为权重做力导向，再推开重叠的社区
+    cluster_centers = np.zeros((num_clusters, 2))
+    if num_clusters:
+        c_src, c_tgt, counts, _ = aggregate_cluster_edges(cluster, num_clusters, src, tgt, weight)
+        c_weight = np.log1p(counts.astype(np.float64))
+        ideal = float(np.mean(cluster_radius)) * 2
+        cluster_centers = force_layout(spiral_layout(num_clusters, spacing=ideal), c_src, c_tgt, c_weight, ideal=ideal)
+        cluster_centers = _separate_circles(cluster_centers, cluster_radius, gap=NODE_SPACING * 2)
+        cluster_centers -= cluster_centers.mean(axis=0)
+        for cluster_id, members in enumerate(members_by_cluster):
+            positions[members] += cluster_centers[cluster_id]
+
+    logger.info(f"Graph summary built: {num_nodes} nodes, {len(src)} edges, {num_clusters} clusters")
+    return GraphSummary(
+        node_ids=node_ids, entity_types=entity_types, src=src, tgt=tgt, weight=weight, degree=degree,
+        pagerank=ranks, cluster=cluster, positions=positions, cluster_sizes=cluster_sizes,
+        cluster_centers=cluster_centers, cluster_radius=cluster_radius, misc_cluster=misc_cluster, index=index,
+    )
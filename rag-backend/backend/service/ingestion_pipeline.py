@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫摄取流水线
+将 分块 -> 向量化 -> Milvus存储 -> LightRAG插入 拆分为独立的阶段，
+阶段之间通过有界 asyncio 队列连接，爬虫只负责把页面放入第一个队列。
+队列满时 submit 会等待（背压），下游处理慢时爬虫自动放缓。
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.config.log import get_logger
+from backend.rag.chunks.chunks import ChunkResult, TextChunker
+from backend.rag.chunks.models import ChunkConfig, ChunkStrategy, DocumentContent
+from backend.rag.storage.milvus_storage import MilvusStorage
+from backend.rag.storage.lightrag_storage import LightRAGStorage
+from backend.service.visual_graph import notify_graph_changed
+
+logger = get_logger("ingestion_pipeline")
+
+# 队列结束标记
+_SENTINEL = object()
+
+
+@dataclass
+class PipelineConfig:
+    """流水线配置，每个阶段的并发数和队列容量都可以单独配置"""
+    chunk_concurrency: int = 2
+    embed_concurrency: int = 4
+    milvus_concurrency: int = 2
+    lightrag_concurrency: int = 1
+    queue_size: int = 16             # 每个阶段输入队列的容量（背压阈值）
+
+    @classmethod
+    def from_env(cls) -> "PipelineConfig":
+        """从环境变量读取配置"""
+        return cls(
+            chunk_concurrency=int(os.getenv("INGEST_CHUNK_CONCURRENCY", "2")),
+            embed_concurrency=int(os.getenv("INGEST_EMBED_CONCURRENCY", "4")),
+            milvus_concurrency=int(os.getenv("INGEST_MILVUS_CONCURRENCY", "2")),
+            lightrag_concurrency=int(os.getenv("INGEST_LIGHTRAG_CONCURRENCY", "1")),
+            queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "16")),
+        )
+
+
+@dataclass
+class StageMetrics:
+    """单个阶段的吞吐统计"""
+    name: str
+    processed: int = 0
+    failed: int = 0
+    items: int = 0                   # 阶段处理的子项数量（如分块数）
+    busy_seconds: float = 0.0        # 所有worker处理耗时之和
+    max_queue_depth: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "stage": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "items": self.items,
+            "elapsed_seconds": round(elapsed, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "pages_per_second": round(self.processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "items_per_second": round(self.items / elapsed, 3) if elapsed > 0 else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+@dataclass
+class PageItem:
+    """在各阶段之间传递的页面数据"""
+    document_name: str
+    md_content: str
+    chunk_result: Optional[ChunkResult] = None
+    embeddings: Optional[List[List[float]]] = None
+    embed_indices: Optional[List[int]] = None   # 需要向量化的分块下标（已存储的分块跳过）
+    replace: bool = False            # 是否替换该文档已有的分块（页面内容变化时）
+    stale_texts: List[str] = field(default_factory=list)   # 替换时被删除的旧分块文本
+
+    @property
+    def texts(self) -> List[str]:
+        return [chunk.page_content for chunk in self.chunk_result.chunks] if self.chunk_result else []
+
+    @property
+    def text_embeddings(self) -> Dict[str, List[float]]:
+        """向量化阶段计算出的 分块文本 -> 向量，交给LightRAG复用"""
+        if not self.embeddings or not self.embed_indices:
+            return {}
+        texts = self.texts
+        return {texts[idx]: vector for idx, vector in zip(self.embed_indices, self.embeddings)}
+
+
+class _Stage:
+    """流水线阶段：从输入队列取数据，处理后放入下一阶段的输入队列"""
+
+    def __init__(self, name: str, handler: Callable[[PageItem], Awaitable[Optional[PageItem]]],
+                 concurrency: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.metrics = StageMetrics(name=name)
+        self.next_stage: Optional["_Stage"] = None
+        self.workers: List[asyncio.Task] = []
+
+    def start(self, on_error: Callable[[str, PageItem, Exception], Awaitable[None]]):
+        self.metrics.started_at = time.monotonic()
+        self.workers = [
+            asyncio.create_task(self._worker(on_error), name=f"ingest-{self.name}-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def put(self, item: Any):
+        await self.queue.put(item)
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue.qsize())
+
+    async def _worker(self, on_error):
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is _SENTINEL:
+                    return
+                start = time.monotonic()
+                try:
+                    result = await self.handler(item)
+                except Exception as e:
+                    self.metrics.failed += 1
+                    await on_error(self.name, item, e)
+                    continue
+                finally:
+                    self.metrics.busy_seconds += time.monotonic() - start
+
+                self.metrics.processed += 1
+                self.metrics.items += len(item.chunk_result.chunks) if item.chunk_result else 0
+                if result is not None and self.next_stage is not None:
+                    await self.next_stage.put(result)
+            finally:
+                self.queue.task_done()
+
+    async def drain(self):
+        """等待本阶段所有worker退出（需先放入concurrency个结束标记）"""
+        for _ in self.workers:
+            await self.queue.put(_SENTINEL)
+        await asyncio.gather(*self.workers)
+        self.metrics.finished_at = time.monotonic()
+
+
+class IngestionPipeline:
+    """分阶段并发的摄取流水线
+
+    使用方式：
+        pipeline = IngestionPipeline(milvus_storage, lightrag_storage, collection_id)
+        pipeline.start()
+        await pipeline.submit(markdown, document_name=url)   # 队列满时等待
+        summary = await pipeline.close()                       # 等待所有页面处理完
+    """
+
+    def __init__(self,
+                 milvus_storage: MilvusStorage,
+                 lightrag_storage: Optional[LightRAGStorage] = None,
+                 collection_id: Optional[str] = None,
+                 source_url: Optional[str] = None,
+                 config: Optional[PipelineConfig] = None,
+                 chunk_config: Optional[ChunkConfig] = None,
+                 on_page_stored: Optional[Callable[[str], Awaitable[None]]] = None,
+                 on_page_failed: Optional[Callable[[str, str], Awaitable[None]]] = None,
+                 on_page_skipped: Optional[Callable[[str, str], Awaitable[None]]] = None):
+        """
+        Args:
+            milvus_storage: Milvus存储实例
+            lightrag_storage: LightRAG存储实例，为None时跳过图谱插入阶段
+            collection_id: 集合ID，仅用于日志
+            source_url: 来源URL（爬取网站时为入口URL），写入分块的source_url字段，用于按来源删除
+            config: 流水线配置，默认从环境变量读取
+            chunk_config: 分块配置，默认按Markdown标题分块，超长章节按token数再切分
+            on_page_stored: 页面所有阶段完成后的回调，参数为document_name
+            on_page_failed: 页面在某个阶段失败时的回调，参数为document_name和错误信息
+            on_page_skipped: 页面没有可存储内容（分块结果为空）时的回调，参数为document_name和原因
+        """
+        self.milvus_storage = milvus_storage
+        self.lightrag_storage = lightrag_storage
+        self.collection_id = collection_id
+        self.source_url = source_url
+        self.config = config or PipelineConfig.from_env()
+        self.chunk_config = chunk_config or ChunkConfig(strategy=ChunkStrategy.MARKDOWN_HYBRID)
+        self.on_page_stored = on_page_stored
+        self.on_page_failed = on_page_failed
+        self.on_page_skipped = on_page_skipped
+        self.chunker = TextChunker()
+        self.submitted = 0
+        self._started = False
+        # 所有embed worker共享的并发上限：每个页面的批次并发发出，不加限制时总请求数为 worker数 × 批次数
+        self._embed_semaphore = asyncio.Semaphore(max(1, self.milvus_storage.embed_concurrency))
+
+        self.stages: List[_Stage] = [
+            _Stage("chunk", self._chunk, self.config.chunk_concurrency, self.config.queue_size),
+            _Stage("embed", self._embed, self.config.embed_concurrency, self.config.queue_size),
+            _Stage("milvus", self._store_milvus, self.config.milvus_concurrency, self.config.queue_size),
+        ]
+        if self.lightrag_storage is not None:
+            self.stages.append(
+                _Stage("lightrag", self._insert_lightrag, self.config.lightrag_concurrency, self.config.queue_size)
+            )
+        for current, following in zip(self.stages, self.stages[1:]):
+            current.next_stage = following
+        self.stages[-1].handler = self._with_completion(self.stages[-1].handler)
+
+    def start(self) -> None:
+        """启动所有阶段的worker"""
+        if self._started:
+            return
+        for stage in self.stages:
+            stage.start(self._handle_error)
+        self._started = True
+        logger.info(f"摄取流水线已启动: collection={self.collection_id}, config={self.config}")
+
+    async def submit(self, md_content: str, document_name: str, replace: bool = False) -> None:
+        """提交一个页面，队列满时等待（背压）
+
+        Args:
+            md_content: 页面markdown内容
+            document_name: 文档名称（网页为URL）
+            replace: 为True时在写入前删除该文档已有的分块
+        """
+        if not self._started:
+            self.start()
+        self.submitted += 1
+        await self.stages[0].put(PageItem(document_name=document_name, md_content=md_content, replace=replace))
+
+    async def close(self) -> Dict[str, Any]:
+        """按阶段顺序排空队列并停止worker
+
+        Returns:
+            Dict: 每个阶段的吞吐统计
+        """
+        if self._started:
+            for stage in self.stages:
+                await stage.drain()
+            self._started = False
+
+        summary = {
+            "collection_id": self.collection_id,
+            "submitted": self.submitted,
+            "stages": [stage.metrics.to_dict() for stage in self.stages],
+        }
+        for stage_metrics in summary["stages"]:
+            logger.info(
+                f"[流水线统计] {stage_metrics['stage']}: 成功 {stage_metrics['processed']}，失败 {stage_metrics['failed']}，"
+                f"{stage_metrics['pages_per_second']} 页/秒，{stage_metrics['items_per_second']} 块/秒，"
+                f"最大队列深度 {stage_metrics['max_queue_depth']}"
+            )
+        return summary
+
+    # ==================== 阶段实现 ====================
+
+    async def _chunk(self, item: PageItem) -> Optional[PageItem]:
+        """分块阶段（CPU密集，放到线程中执行）"""
+        document = DocumentContent(content=item.md_content, document_name=item.document_name)
+        item.chunk_result = await asyncio.to_thread(self.chunker.chunk_document, document, self.chunk_config)
+        if item.chunk_result is None or not item.chunk_result.chunks:
+            logger.warning(f"文档分块结果为空，跳过存储: {item.document_name}")
+            await self._run_callback("跳过", self.on_page_skipped, item.document_name, "分块结果为空")
+            return None
+        return item
+
+    async def _embed(self, item: PageItem) -> PageItem:
+        """向量化阶段，只向量化尚未存储的分块，按MilvusStorage的批次规划（文本数和token数上限）并发请求
+
+        同时进行的向量化请求数受 milvus_storage.embed_concurrency 限制（所有embed worker共享）。
+        """
+        item.embed_indices = await asyncio.to_thread(self.milvus_storage.plan_new_chunks, item.chunk_result)
+        all_texts = item.texts
+        texts = [all_texts[idx] for idx in item.embed_indices]
+        embedding_function = self.milvus_storage.embedding_function
+        batches = self.milvus_storage.plan_embedding_batches(texts)
+
+        async def embed_batch(start: int, end: int) -> List[List[float]]:
+            async with self._embed_semaphore:
+                return await embedding_function.aembed_documents(texts[start:end])
+
+        results = await asyncio.gather(*(embed_batch(start, end) for start, end in batches))
+        item.embeddings = [vector for batch_vectors in results for vector in batch_vectors]
+        return item
+
+    async def _store_milvus(self, item: PageItem) -> PageItem:
+        """Milvus存储阶段（pymilvus为同步客户端，放到线程中执行）"""
+        if item.replace:
+            # 先写入新分块再删除不再存在的旧分块，替换期间文档始终可检索
+            result = await asyncio.to_thread(
+                self.milvus_storage.replace_document,
+                item.chunk_result, item.embeddings, item.embed_indices, self.source_url,
+                self.lightrag_storage is not None
+            )
+            item.stale_texts = result.get("deleted_texts", [])
+        else:
+            result = await asyncio.to_thread(
+                self.milvus_storage.store_embedded_chunks,
+                item.chunk_result, item.embeddings, item.embed_indices, self.source_url
+            )
+        logger.info(
+            f"成功存储文档分块到Milvus，新增 {result.get('inserted_count', 0)} 个，"
+            f"已存在跳过 {result.get('skipped_count', 0)} 个，"
+            f"删除旧分块 {result.get('deleted_count', 0)} 个: {item.document_name}"
+        )
+        return item
+
+    async def _insert_lightrag(self, item: PageItem) -> PageItem:
+        """LightRAG插入阶段，页面替换时同时删除旧分块对应的LightRAG文档
+
+        新分块直接复用向量化阶段为Milvus计算的向量，不再重复请求向量模型。
+        """
+        entities = []
+        if item.stale_texts:
+            delete_result = await self.lightrag_storage.delete_texts(item.stale_texts)
+            entities.extend(delete_result.get("entities", []))
+        insert_result = await self.lightrag_storage.insert_texts(item.texts, embeddings=item.text_embeddings)
+        entities.extend(insert_result.get("entities", []))
+        # 图谱已变化，可视化缓存失效，实体标签索引只更新受影响的实体
+        await notify_graph_changed(self.lightrag_storage.workspace, entities=entities)
+        logger.info(f"成功存储文档到LightRAG: {item.document_name}")
+        return item
+
+    def _with_completion(self, handler):
+        """最后一个阶段完成后触发页面完成回调"""
+        async def wrapped(item: PageItem):
+            result = await handler(item)
+            # 页面已经入库，回调出错（如Redis异常）不能再按阶段失败处理
+            await self._run_callback("完成", self.on_page_stored, item.document_name)
+            return result
+        return wrapped
+
+    async def _handle_error(self, stage_name: str, item: PageItem, error: Exception) -> None:
+        error_msg = f"{type(error).__name__}: {str(error)}"
+        logger.error(f"流水线阶段 {stage_name} 处理 {item.document_name} 失败: {error_msg}")
+        await self._run_callback("失败", self.on_page_failed, item.document_name, f"[{stage_name}] {error_msg}")
+
+    @staticmethod
+    async def _run_callback(name: str, callback: Optional[Callable[..., Awaitable[None]]], *args) -> None:
+        """执行页面回调，回调出错只记录日志"""
+        if callback is None:
+            return
+        try:
+            await callback(*args)
+        except Exception as callback_error:
+            logger.warning(f"{name}回调执行出错: {callback_error}")
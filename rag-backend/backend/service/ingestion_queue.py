@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+摄取任务队列
+基于Redis的持久化任务队列，API进程只负责入队，独立的worker进程（worker.py）消费任务。
+任务在Redis中持久保存，API或worker重启不会丢失；worker可以在多台机器上独立扩容。
+
+Redis数据结构:
+    ingest:queue              List   待执行的任务ID
+    ingest:processing         List   正在执行的任务ID（worker崩溃后由租约过期检查重新入队）
+    ingest:delayed            ZSet   等待重试的任务ID，score为可重试的时间戳
+    ingest:job:{job_id}       Hash   任务详情与状态
+
+任务状态流转:
+    queued -> running -> succeeded
+                      -> retrying -> queued -> running ...
+                      -> failed（超过最大尝试次数）
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from backend.config.log import get_logger
+from backend.config.redis import get_redis_client
+
+logger = get_logger("ingestion_queue")
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_RETRYING = "retrying"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+QUEUE_KEY = "ingest:queue"
+PROCESSING_KEY = "ingest:processing"
+DELAYED_KEY = "ingest:delayed"
+JOB_KEY_PREFIX = "ingest:job:"
+
+
+def _job_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+class IngestionQueue:
+    """Redis持久化任务队列
+
+    使用方式：
+        queue = IngestionQueue()
+        job_id = await queue.enqueue("crawl", payload)          # API进程
+        job = await queue.dequeue(worker_id)                    # worker进程
+        await queue.complete(job["job_id"]) / await queue.fail(job["job_id"], error)
+    """
+
+    def __init__(self,
+                 max_attempts: Optional[int] = None,
+                 lease_seconds: Optional[int] = None,
+                 retry_base_delay: Optional[float] = None,
+                 job_ttl_seconds: Optional[int] = None):
+        """
+        Args:
+            max_attempts: 单个任务最大尝试次数，默认从环境变量INGEST_JOB_MAX_ATTEMPTS获取
+            lease_seconds: 任务租约时长（秒），worker需在租约内发送心跳，
+                超时未续约的任务视为worker崩溃并重新入队，默认从环境变量INGEST_JOB_LEASE_SECONDS获取
+            retry_base_delay: 首次重试等待秒数，之后指数递增，默认从环境变量INGEST_JOB_RETRY_DELAY获取
+            job_ttl_seconds: 任务结束后详情的保留时长，默认从环境变量INGEST_JOB_TTL_SECONDS获取
+        """
+        self.max_attempts = max_attempts or int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+        self.lease_seconds = lease_seconds or int(os.getenv("INGEST_JOB_LEASE_SECONDS", "120"))
+        self.retry_base_delay = retry_base_delay or float(os.getenv("INGEST_JOB_RETRY_DELAY", "30"))
+        self.job_ttl_seconds = job_ttl_seconds or int(os.getenv("INGEST_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        """提交任务
+
+        Args:
+            job_type: 任务类型，worker按类型选择处理函数
+            payload: 任务参数（需可JSON序列化）
+            max_attempts: 最大尝试次数，默认使用队列配置
+
+        Returns:
+            str: 任务ID
+        """
+        redis_client = await get_redis_client()
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(_job_key(job_id), mapping={
+                "job_id": job_id,
+                "type": job_type,
+                "payload": json.dumps(payload, ensure_ascii=False),
+                "status": JOB_QUEUED,
+                "attempts": 0,
+                "max_attempts": max_attempts or self.max_attempts,
+                "error": "",
+                "created_at": now,
+                "updated_at": now,
+            })
+            pipe.lpush(QUEUE_KEY, job_id)
+            await pipe.execute()
+        logger.info(f"任务已入队: {job_type} {job_id}")
+        return job_id
+
+    async def dequeue(self, worker_id: str, timeout: int = 5) -> Optional[Dict[str, Any]]:
+        """阻塞获取一个任务，并标记为运行中
+
+        任务ID原子地从待执行队列移动到处理中队列，worker崩溃时任务不会丢失。
+
+        Args:
+            worker_id: worker标识
+            timeout: 阻塞等待秒数，超时返回None
+
+        Returns:
+            Optional[Dict]: 任务详情
+        """
+        redis_client = await get_redis_client()
+        job_id = await redis_client.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hincrby(_job_key(job_id), "attempts", 1)
+            pipe.hset(_job_key(job_id), mapping={
+                "status": JOB_RUNNING,
+                "worker": worker_id,
+                "started_at": datetime.now().isoformat(),
+                "updated_at": datetime.now().isoformat(),
+                "lease_until": time.time() + self.lease_seconds,
+            })
+            pipe.hgetall(_job_key(job_id))
+            _, _, job = await pipe.execute()
+
+        if not job.get("type"):
+            # 任务详情已过期或被删除
+            await redis_client.lrem(PROCESSING_KEY, 1, job_id)
+            logger.warning(f"任务详情不存在，丢弃: {job_id}")
+            return None
+        return self._decode(job)
+
+    async def heartbeat(self, job_id: str) -> None:
+        """续约，表示worker仍在处理该任务"""
+        redis_client = await get_redis_client()
+        await redis_client.hset(_job_key(job_id), "lease_until", time.time() + self.lease_seconds)
+
+    async def complete(self, job_id: str, result: Optional[Dict[str, Any]] = None) -> None:
+        """标记任务成功"""
+        redis_client = await get_redis_client()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(_job_key(job_id), mapping={
+                "status": JOB_SUCCEEDED,
+                "result": json.dumps(result or {}, ensure_ascii=False),
+                "error": "",
+                "finished_at": datetime.now().isoformat(),
+                "updated_at": datetime.now().isoformat(),
+            })
+            pipe.expire(_job_key(job_id), self.job_ttl_seconds)
+            pipe.lrem(PROCESSING_KEY, 1, job_id)
+            await pipe.execute()
+        logger.info(f"任务执行成功: {job_id}")
+
+    async def fail(self, job_id: str, error: str) -> str:
+        """标记任务失败：未超过最大尝试次数时延迟重试，否则标记为最终失败
+
+        Returns:
+            str: 任务的新状态（retrying / failed）
+        """
+        redis_client = await get_redis_client()
+        attempts, max_attempts = await redis_client.hmget(_job_key(job_id), ["attempts", "max_attempts"])
+        attempts = int(attempts or 0)
+        max_attempts = int(max_attempts or self.max_attempts)
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if attempts < max_attempts:
+                delay = self.retry_base_delay * (2 ** (attempts - 1))
+                status = JOB_RETRYING
+                pipe.hset(_job_key(job_id), mapping={
+                    "status": status,
+                    "error": error,
+                    "next_attempt_at": datetime.fromtimestamp(time.time() + delay).isoformat(),
+                    "updated_at": datetime.now().isoformat(),
+                })
+                pipe.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+            else:
+                status = JOB_FAILED
+                pipe.hset(_job_key(job_id), mapping={
+                    "status": status,
+                    "error": error,
+                    "finished_at": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat(),
+                })
+                pipe.expire(_job_key(job_id), self.job_ttl_seconds)
+            # 清除本次租约，否则重试出队后、写入新租约前，过期检查会按旧租约误判
+            pipe.hdel(_job_key(job_id), "lease_until")
+            pipe.lrem(PROCESSING_KEY, 1, job_id)
+            await pipe.execute()
+
+        logger.warning(f"任务执行失败 ({attempts}/{max_attempts})，状态: {status}，{job_id}: {error}")
+        return status
+
+    async def promote_delayed(self) -> int:
+        """把到达重试时间的任务移回待执行队列
+
+        Returns:
+            int: 重新入队的任务数
+        """
+        redis_client = await get_redis_client()
+        due_ids = await redis_client.zrangebyscore(DELAYED_KEY, 0, time.time())
+        promoted = 0
+        for job_id in due_ids:
+            # ZREM成功的worker负责重新入队，避免多个worker重复入队
+            if await redis_client.zrem(DELAYED_KEY, job_id):
+                async with redis_client.pipeline(transaction=True) as pipe:
+                    pipe.hset(_job_key(job_id), mapping={
+                        "status": JOB_QUEUED,
+                        "updated_at": datetime.now().isoformat(),
+                    })
+                    pipe.lpush(QUEUE_KEY, job_id)
+                    await pipe.execute()
+                promoted += 1
+        return promoted
+
+    async def requeue_expired(self) -> int:
+        """检查处理中队列，租约过期（worker崩溃或失联）的任务按失败处理并重试
+
+        Returns:
+            int: 处理的过期任务数
+        """
+        redis_client = await get_redis_client()
+        expired = 0
+        for job_id in await redis_client.lrange(PROCESSING_KEY, 0, -1):
+            lease_until = await redis_client.hget(_job_key(job_id), "lease_until")
+            # 刚出队的任务可能还未写入租约（重试任务的旧租约在失败时已清除），跳过
+            if lease_until is None or float(lease_until) > time.time():
+                continue
+            # LREM成功的worker负责处理，避免多个worker重复调度
+            if await redis_client.lrem(PROCESSING_KEY, 1, job_id):
+                await self.fail(job_id, "worker租约过期，任务被重新调度")
+                expired += 1
+        return expired
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务详情"""
+        redis_client = await get_redis_client()
+        job = await redis_client.hgetall(_job_key(job_id))
+        return self._decode(job) if job else None
+
+    async def stats(self) -> Dict[str, int]:
+        """队列长度统计"""
+        redis_client = await get_redis_client()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.llen(QUEUE_KEY)
+            pipe.llen(PROCESSING_KEY)
+            pipe.zcard(DELAYED_KEY)
+            queued, processing, delayed = await pipe.execute()
+        return {"queued": queued, "processing": processing, "delayed": delayed}
+
+    @staticmethod
+    def _decode(job: Dict[str, Any]) -> Dict[str, Any]:
+        """解析任务详情中的JSON和数值字段"""
+        decoded = dict(job)
+        for field_name in ("payload", "result"):
+            if decoded.get(field_name):
+                decoded[field_name] = json.loads(decoded[field_name])
+        for field_name in ("attempts", "max_attempts"):
+            if field_name in decoded:
+                decoded[field_name] = int(decoded[field_name])
+        decoded.pop("lease_until", None)
+        return decoded
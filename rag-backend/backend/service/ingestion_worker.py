@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+摄取任务worker
+从 IngestionQueue 消费任务，按任务类型调用对应的处理函数。
+每个worker进程运行 concurrency 个消费协程，另有一个维护协程负责
+把到期的重试任务移回队列、回收租约过期（worker崩溃）的任务。
+"""
+import asyncio
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.config.log import get_logger
+from backend.service.ingestion_queue import IngestionQueue
+
+logger = get_logger("ingestion_worker")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class IngestionWorker:
+    """任务消费者
+
+    使用方式：
+        worker = IngestionWorker(handlers={"crawl": run_crawl_job}, concurrency=2)
+        await worker.run()          # 直到 stop() 被调用
+    """
+
+    def __init__(self,
+                 handlers: Dict[str, JobHandler],
+                 concurrency: Optional[int] = None,
+                 queue: Optional[IngestionQueue] = None,
+                 maintenance_interval: float = 5.0):
+        """
+        Args:
+            handlers: 任务类型到处理函数的映射，处理函数接收payload，返回可选的结果字典
+            concurrency: 同时执行的任务数，默认从环境变量INGEST_WORKER_CONCURRENCY获取
+            queue: 任务队列，默认新建
+            maintenance_interval: 维护协程的执行间隔（秒）
+        """
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency or int(os.getenv("INGEST_WORKER_CONCURRENCY", "2")))
+        self.queue = queue or IngestionQueue()
+        self.maintenance_interval = maintenance_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """停止获取新任务，正在执行的任务完成后退出"""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """运行worker直到 stop() 被调用"""
+        logger.info(f"摄取worker启动: {self.worker_id}，并发数 {self.concurrency}，任务类型 {list(self.handlers)}")
+        tasks = [asyncio.create_task(self._consume(i), name=f"ingest-worker-{i}") for i in range(self.concurrency)]
+        tasks.append(asyncio.create_task(self._maintain(), name="ingest-worker-maintenance"))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            logger.info(f"摄取worker已退出: {self.worker_id}")
+
+    async def _consume(self, index: int) -> None:
+        """消费协程：获取任务 -> 执行 -> 标记成功/失败"""
+        consumer_id = f"{self.worker_id}#{index}"
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.dequeue(consumer_id, timeout=5)
+            except Exception as e:
+                logger.error(f"获取任务失败: {e}")
+                await asyncio.sleep(5)
+                continue
+            if job is None:
+                continue
+            await self._execute(job, consumer_id)
+
+    async def _execute(self, job: Dict[str, Any], consumer_id: str) -> None:
+        job_id = job["job_id"]
+        handler = self.handlers.get(job["type"])
+        if handler is None:
+            await self._finish(job_id, error=f"未知的任务类型: {job['type']}")
+            return
+
+        logger.info(f"[{consumer_id}] 开始执行任务 {job['type']} {job_id}（第 {job['attempts']}/{job['max_attempts']} 次）")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        result, error = None, None
+        try:
+            result = await handler(job.get("payload") or {})
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        finally:
+            # 先停止续约再更新状态，避免心跳在任务结束后重新写入租约
+            heartbeat.cancel()
+        await self._finish(job_id, result, error)
+
+    async def _finish(self, job_id: str, result: Optional[Dict[str, Any]] = None,
+                      error: Optional[str] = None) -> None:
+        """标记任务成功/失败
+
+        Redis异常时只记录日志，不影响消费协程；任务留在处理中队列，租约过期后由维护协程重新调度。
+        """
+        try:
+            if error is None:
+                await self.queue.complete(job_id, result)
+            else:
+                await self.queue.fail(job_id, error)
+        except Exception as e:
+            logger.error(f"更新任务状态失败 {job_id}: {e}")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """定期续约，防止长任务被判定为worker崩溃"""
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.heartbeat(job_id)
+            except Exception as e:
+                logger.warning(f"任务续约失败 {job_id}: {e}")
+
+    async def _maintain(self) -> None:
+        """维护协程：重试到期任务入队、回收过期任务"""
+        while not self._stopping.is_set():
+            try:
+                promoted = await self.queue.promote_delayed()
+                expired = await self.queue.requeue_expired()
+                if promoted or expired:
+                    logger.info(f"队列维护: 重试入队 {promoted} 个，回收过期任务 {expired} 个")
+            except Exception as e:
+                logger.warning(f"队列维护失败: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.maintenance_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -4,6 +4,7 @@
 知识库服务层
 提供知识库相关的业务逻辑处理
 """
+import asyncio
 import uuid
 import time
 from typing import List, Optional, Dict, Any
@@ -191,6 +192,13 @@ async def delete_library(library_id: int, user_id: str) -> Response:
             session.commit()
             
             logger.info(f"成功删除知识库: {library.title}")
+
+            # 释放可视化接口共享的LightRAG实例
+            from backend.rag.storage.lightrag_storage import release_shared_storage
+            try:
+                await release_shared_storage(library.collection_id)
+            except Exception as e:
+                logger.warning(f"释放知识库 {library.collection_id} 的LightRAG实例失败: {str(e)}")
             return Response.success({"message": "知识库删除成功"})
         finally:
             session.close()
@@ -300,6 +308,11 @@ async def delete_document(document_id: int, user_id: str) -> Response:
             if not document:
                 return Response.error("文档不存在或无权限访问")
             
+            # 先删除向量和图谱数据，失败时保留文档记录以便重试
+            delete_result = await _delete_document_data(document.library.collection_id, document)
+            if delete_result["status"] != "success":
+                return Response.error(f"删除文档数据失败: {delete_result.get('error')}")
+            
             # 物理删除文档
             session.delete(document)
             session.commit()
@@ -311,4 +324,79 @@ async def delete_document(document_id: int, user_id: str) -> Response:
             
     except Exception as e:
         logger.error(f"删除文档失败: {str(e)}")
-        return Response.error(f"删除文档失败: {str(e)}")
\ No newline at end of file
+        return Response.error(f"删除文档失败: {str(e)}")
+
+
+def mark_document_processed(document_id: int) -> bool:
+    """把文档标记为已处理（摄取任务完成时调用）
+
+    Returns:
+        bool: 文档是否存在并已更新
+    """
+    session = DatabaseFactory.create_session()
+    try:
+        document = session.query(KnowledgeDocument).filter(KnowledgeDocument.id == document_id).first()
+        if not document:
+            logger.warning(f"标记文档已处理失败，文档不存在: {document_id}")
+            return False
+        document.is_processed = True
+        session.commit()
+        logger.info(f"文档已处理完成: {document.name}")
+        return True
+    finally:
+        session.close()
+
+
+async def _delete_document_data(collection_id: str, document: KnowledgeDocument) -> Dict[str, Any]:
+    """删除文档在Milvus中的分块以及LightRAG中对应的文档、实体和关系
+
+    有url的文档（爬取的网站、在线文档）按来源URL删除，其余按文档名删除。
+
+    Args:
+        collection_id: 知识库collection ID
+        document: 文档记录
+
+    Returns:
+        Dict: 删除结果
+    """
+    from backend.config.embedding import get_embedding_model
+    from backend.rag.storage.lightrag_storage import LightRAGStorage
+    from backend.rag.storage.milvus_storage import MilvusStorage
+    from backend.service.crawl_manifest import CrawlManifest
+    from backend.service.visual_graph import notify_graph_changed
+
+    milvus_storage = MilvusStorage(
+        embedding_function=get_embedding_model(),
+        collection_name=collection_id,
+    )
+    if document.url:
+        milvus_result = await asyncio.to_thread(milvus_storage.delete_by_source, document.url, return_texts=True)
+    else:
+        milvus_result = await asyncio.to_thread(milvus_storage.delete_document, document.name, return_texts=True)
+    if milvus_result["status"] != "success":
+        logger.error(f"删除文档向量失败: {document.name} - {milvus_result.get('error')}")
+        return milvus_result
+    logger.info(f"已删除文档 {document.name} 的 {milvus_result['deleted_count']} 个向量分块")
+
+    # LightRAG删除失败不阻塞文档删除，只记录错误
+    lightrag_storage = LightRAGStorage(workspace=collection_id)
+    try:
+        lightrag_result = await lightrag_storage.delete_texts(milvus_result.get("deleted_texts", []))
+        milvus_result["lightrag"] = lightrag_result
+        await notify_graph_changed(collection_id, entities=lightrag_result.get("entities"))
+    except Exception as e:
+        logger.error(f"删除文档 {document.name} 的LightRAG数据失败: {str(e)}")
+    finally:
+        await lightrag_storage.finalize()
+
+    # 删除该文档页面的爬虫清单记录，避免再次爬取时把已删除的页面判定为未变化而跳过
+    try:
+        await CrawlManifest(collection_id).remove(
+            milvus_result.get("deleted_documents", []) + ([document.url] if document.url else [])
+        )
+    except Exception as e:
+        logger.warning(f"删除爬虫清单记录失败: {str(e)}")
+
+    milvus_result.pop("deleted_texts", None)
+    milvus_result.pop("deleted_documents", None)
+    return milvus_result
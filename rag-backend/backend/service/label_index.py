@@ -0,0 +1,168 @@
+"""
+实体标签搜索索引
+
+可视化接口需要精确的实体名称作为起点，用户只能反复试错，每次都触发一次图数据库遍历。
+LabelIndex 在内存中为一个知识库的全部实体名称建立索引，支持:
+    - 精确匹配和前缀匹配: 规范化后的名称有序列表 + 二分查找
+    - 子串和模糊匹配: 字符bigram倒排索引，按bigram集合的Dice系数判断相似度（对中文实体名同样有效）
+结果按 匹配类型（精确 > 前缀 > 子串 > 模糊）和实体度数排序。
+
+索引支持按实体增删，摄取/删除文档后只更新受影响的实体（见 visual_graph.VisualGraphService.search_labels）。
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+# 匹配类型，数值越小排序越靠前
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_SUBSTRING = "substring"
+MATCH_FUZZY = "fuzzy"
+_MATCH_ORDER = {MATCH_EXACT: 0, MATCH_PREFIX: 1, MATCH_SUBSTRING: 2, MATCH_FUZZY: 3}
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_label(text: str) -> str:
+    """规范化实体名称: 全角转半角、忽略大小写、合并空白"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def _bigrams(key: str) -> Set[str]:
+    if len(key) < 2:
+        return {key} if key else set()
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+class LabelIndex:
+    """单个知识库的实体标签索引
+
+    参数:
+        fuzzy_threshold: 模糊匹配的最小Dice系数（查询与名称bigram集合的重合程度）
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.5):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._degrees: Dict[str, int] = {}
+        self._keys: Dict[str, str] = {}                      # 实体名称 -> 规范化名称
+        self._gram_counts: Dict[str, int] = {}               # 实体名称 -> bigram数
+        self._sorted: List[Tuple[str, str]] = []             # (规范化名称, 实体名称)，有序
+        self._postings: Dict[str, Set[str]] = defaultdict(set)   # bigram -> 实体名称
+
+    def __len__(self) -> int:
+        return len(self._degrees)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self._degrees
+
+    def degree(self, label: str) -> int:
+        return self._degrees.get(label, 0)
+
+    def add(self, label: str, degree: int = 0) -> None:
+        """添加实体，已存在时只更新度数"""
+        self._add(label, degree, keep_sorted=True)
+
+    def _add(self, label: str, degree: int, keep_sorted: bool) -> None:
+        if not label:
+            return
+        if label in self._degrees:
+            self._degrees[label] = int(degree)
+            return
+        key = normalize_label(label)
+        grams = _bigrams(key)
+        self._degrees[label] = int(degree)
+        self._keys[label] = key
+        self._gram_counts[label] = len(grams)
+        if keep_sorted:
+            bisect.insort(self._sorted, (key, label))
+        else:
+            self._sorted.append((key, label))
+        for gram in grams:
+            self._postings[gram].add(label)
+
+    def remove(self, label: str) -> None:
+        if label not in self._degrees:
+            return
+        key = self._keys.pop(label)
+        del self._degrees[label]
+        del self._gram_counts[label]
+        position = bisect.bisect_left(self._sorted, (key, label))
+        if position < len(self._sorted) and self._sorted[position] == (key, label):
+            del self._sorted[position]
+        for gram in _bigrams(key):
+            labels = self._postings.get(gram)
+            if labels is not None:
+                labels.discard(label)
+                if not labels:
+                    del self._postings[gram]
+
+    def update(self, degrees: Dict[str, int], removed: Iterable[str] = ()) -> None:
+        """批量增加/更新实体度数并删除实体"""
+        for label in removed:
+            self.remove(label)
+        # 大批量添加（如首次构建）时最后统一排序，少量添加时逐个二分插入
+        bulk = len(degrees) > 64 and len(degrees) > len(self._sorted) // 8
+        for label, degree in degrees.items():
+            self._add(label, degree, keep_sorted=not bulk)
+        if bulk:
+            self._sorted.sort()
+
+    def top(self, limit: int) -> List[Tuple[str, int, str]]:
+        """度数最高的实体（空查询时返回）"""
+        best = heapq.nsmallest(limit, self._degrees.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [(label, degree, MATCH_PREFIX) for label, degree in best]
+
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[Tuple[str, int, str]]:
+        """
+        搜索实体名称
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的实体数
+            fuzzy: 是否返回模糊匹配（子串匹配总是返回）
+
+        Returns:
+            [(实体名称, 度数, 匹配类型)]，按匹配类型和度数排序
+        """
+        key = normalize_label(query)
+        if not key:
+            return self.top(limit)
+
+        matches: Dict[str, str] = {}
+        # 前缀匹配（包含精确匹配）
+        position = bisect.bisect_left(self._sorted, (key, ""))
+        while position < len(self._sorted) and self._sorted[position][0].startswith(key):
+            candidate_key, label = self._sorted[position]
+            matches[label] = MATCH_EXACT if candidate_key == key else MATCH_PREFIX
+            position += 1
+
+        # 子串和模糊匹配：统计与查询共有的bigram数（单字查询只做前缀匹配）
+        # 前缀匹配已经足够时不需要：排序时前缀匹配总在子串/模糊匹配之前
+        query_grams = _bigrams(key)
+        if len(key) >= 2 and len(matches) < limit:
+            shared: Counter = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            size = len(query_grams)
+            # Dice >= t 要求共有bigram数 >= t * (查询bigram数 + 1) / 2
+            min_shared = self.fuzzy_threshold * (size + 1) / 2 if fuzzy else size
+            for label, count in shared.items():
+                if count < min_shared or label in matches:
+                    continue
+                if count == size and key in self._keys[label]:
+                    matches[label] = MATCH_SUBSTRING
+                elif fuzzy and 2 * count / (size + self._gram_counts[label]) >= self.fuzzy_threshold:
+                    matches[label] = MATCH_FUZZY
+
+        best = heapq.nsmallest(
+            limit, matches.items(),
+            key=lambda item: (_MATCH_ORDER[item[1]], -self._degrees[item[0]], len(item[0]), item[0]),
+        )
+        return [(label, self._degrees[label], match) for label, match in best]
+
+    def stats(self) -> Dict[str, int]:
+        return {"labels": len(self._degrees), "bigrams": len(self._postings)}
@@ -1,40 +1,221 @@
-from typing import Optional
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
 import logging
-from backend.param.visual_graph import KnowledgeGraph
-from backend.rag.storage.lightrag_storage import LightRAGStorage
+import os
+import time
+
+from backend.config.redis import get_redis_client
+import numpy as np
+
+from backend.param.visual_graph import (ClusterGraph, CompactKnowledgeGraph, GraphCluster, GraphClusterEdge,
+                                        GraphOverview, GraphPage, KnowledgeGraph, KnowledgeGraphEdge,
+                                        KnowledgeGraphNode, LabelMatch, LabelSearchResult, NodeNeighbors)
+from backend.rag.storage.lightrag_storage import shared_storage
+from backend.service.graph_summary import GraphSummary, build_graph_summary
+from backend.service.label_index import LabelIndex
 
 logger = logging.getLogger(__name__)
 
+# 图谱版本号（Redis String）: visual_graph_version:{collection_id}
+# 摄取/删除写入LightRAG后递增，可视化缓存按版本号失效（摄取在独立worker进程中执行，需要跨进程通知）
+GRAPH_VERSION_KEY = "visual_graph_version:{collection_id}"
+
+# 图谱变更日志（Redis List）: visual_graph_changes:{collection_id} -> json({"version": 版本号, "entities": [...]})
+# 记录每个版本受影响的实体，实体标签索引据此增量更新；日志缺失或不连续时全量重建
+GRAPH_CHANGES_KEY = "visual_graph_changes:{collection_id}"
+GRAPH_CHANGES_KEEP = 1000
+
+# 本进程内的版本号（Redis不可用或在API进程内摄取时使用）
+_LOCAL_VERSIONS: Dict[str, int] = {}
+
+# 子图缓存: 缓存键 -> (图谱版本, 写入时间, 结果)
+_GRAPH_CACHE: "OrderedDict[Tuple, Tuple[str, float, Any]]" = OrderedDict()
+
+# 图谱摘要缓存: ("summary", 知识库) -> (图谱版本, 写入时间, GraphSummary)
+# 计算代价高，与子图缓存分开，避免被大量子图查询挤出
+_SUMMARY_CACHE: "OrderedDict[Tuple, Tuple[str, float, Any]]" = OrderedDict()
+
+# 概览/社区展开支持的节点排序方式
+RANK_METHODS = ("pagerank", "degree")
+
+# 每个知识库同时只计算一次图谱摘要
+_SUMMARY_LOCKS: Dict[str, asyncio.Lock] = {}
+
+# 实体标签索引: 知识库 -> (同步到的图谱版本, LabelIndex)
+_LABEL_INDEXES: "OrderedDict[str, Tuple[str, LabelIndex]]" = OrderedDict()
+_LABEL_INDEX_LOCKS: Dict[str, asyncio.Lock] = {}
+# node_degrees_batch 每次查询的实体数
+_DEGREE_BATCH_SIZE = 1000
+
+
+async def get_graph_version(collection_id: str) -> str:
+    """获取知识库图谱的当前版本号"""
+    local_version = _LOCAL_VERSIONS.get(collection_id, 0)
+    try:
+        redis_client = await get_redis_client()
+        remote_version = await redis_client.get(GRAPH_VERSION_KEY.format(collection_id=collection_id)) or "0"
+    except Exception as e:
+        # Redis不可用时只依赖本地版本号和缓存过期时间
+        logger.debug(f"读取图谱版本号失败: {e}")
+        remote_version = "-"
+    return f"{remote_version}.{local_version}"
+
+
+async def notify_graph_changed(collection_id: str, entities: Optional[Iterable[str]] = None) -> None:
+    """LightRAG数据变化（插入/删除文档）后调用，使该知识库的可视化缓存失效
+
+    Args:
+        collection_id: 知识库collection ID
+        entities: 受影响的实体名称（insert_texts/delete_texts 返回的 entities），
+            提供时实体标签索引只更新这些实体，否则下次搜索时全量重建
+    """
+    if not collection_id:
+        return
+    _LOCAL_VERSIONS[collection_id] = _LOCAL_VERSIONS.get(collection_id, 0) + 1
+    try:
+        redis_client = await get_redis_client()
+        version = await redis_client.incr(GRAPH_VERSION_KEY.format(collection_id=collection_id))
+        if entities is not None:
+            changes_key = GRAPH_CHANGES_KEY.format(collection_id=collection_id)
+            await redis_client.rpush(changes_key, json.dumps(
+                {"version": int(version), "entities": list(dict.fromkeys(entities))}, ensure_ascii=False))
+            await redis_client.ltrim(changes_key, -GRAPH_CHANGES_KEEP, -1)
+    except Exception as e:
+        logger.warning(f"更新图谱版本号失败，其他进程的可视化缓存将在过期后刷新: {e}")
+
+
+async def _get_changed_entities(collection_id: str, old_version: str, new_version: str) -> Optional[List[str]]:
+    """从变更日志中取出两个版本之间受影响的实体
+
+    Returns:
+        实体名称列表；无法增量更新（Redis不可用、日志不连续、存在未记录实体的变更）时返回None
+    """
+    old_remote, _, old_local = old_version.partition(".")
+    new_remote, _, new_local = new_version.partition(".")
+    if not (old_remote.isdigit() and new_remote.isdigit()):
+        return None
+    old_remote, new_remote = int(old_remote), int(new_remote)
+    # 本进程的变更都会同时递增远端版本号，本地版本增加得更多说明有变更未写入Redis
+    if new_remote < old_remote or int(new_local) - int(old_local) > new_remote - old_remote:
+        return None
+    if new_remote == old_remote:
+        return []
+    try:
+        redis_client = await get_redis_client()
+        entries = await redis_client.lrange(GRAPH_CHANGES_KEY.format(collection_id=collection_id), 0, -1)
+    except Exception as e:
+        logger.debug(f"读取图谱变更日志失败: {e}")
+        return None
+
+    changes: Dict[int, List[str]] = {}
+    for entry in entries:
+        try:
+            change = json.loads(entry)
+            changes[int(change["version"])] = change["entities"]
+        except (TypeError, ValueError, KeyError):
+            continue
+    entities: Dict[str, None] = {}
+    for version in range(old_remote + 1, new_remote + 1):
+        if version not in changes:
+            return None
+        entities.update(dict.fromkeys(changes[version]))
+    return list(entities)
+
+
+def _cache_get(key: Tuple, version: str, ttl: Optional[int] = None, cache: Optional[OrderedDict] = None) -> Optional[Any]:
+    cache = _GRAPH_CACHE if cache is None else cache
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    cached_version, created_at, value = entry
+    if ttl is None:
+        ttl = int(os.getenv("VISUAL_GRAPH_CACHE_TTL", "600"))
+    if cached_version != version or time.monotonic() - created_at > ttl:
+        cache.pop(key, None)
+        return None
+    cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key: Tuple, version: str, value: Any, cache: Optional[OrderedDict] = None,
+               max_entries: Optional[int] = None) -> None:
+    cache = _GRAPH_CACHE if cache is None else cache
+    cache[key] = (version, time.monotonic(), value)
+    cache.move_to_end(key)
+    if max_entries is None:
+        max_entries = int(os.getenv("VISUAL_GRAPH_CACHE_SIZE", "128"))
+    while len(cache) > max(1, max_entries):
+        cache.popitem(last=False)
+
+
+def to_compact(graph: Any) -> CompactKnowledgeGraph:
+    """把知识图谱转换为紧凑编码"""
+    index = {node.id: idx for idx, node in enumerate(graph.nodes)}
+    type_index: Dict[str, int] = {}
+    node_types = []
+    for node in graph.nodes:
+        entity_type = (node.properties or {}).get("entity_type")
+        if entity_type is None:
+            node_types.append(-1)
+        else:
+            node_types.append(type_index.setdefault(str(entity_type), len(type_index)))
+
+    edges: List[int] = []
+    edge_weights: List[float] = []
+    for edge in graph.edges:
+        if edge.source in index and edge.target in index:
+            edges.extend((index[edge.source], index[edge.target]))
+            weight = (edge.properties or {}).get("weight", 1.0)
+            try:
+                edge_weights.append(round(float(weight), 4))
+            except (TypeError, ValueError):
+                edge_weights.append(1.0)
+
+    positions: List[float] = []
+    if graph.nodes and all("x" in (node.properties or {}) and "y" in (node.properties or {}) for node in graph.nodes):
+        for node in graph.nodes:
+            positions.extend((node.properties["x"], node.properties["y"]))
+
+    return CompactKnowledgeGraph(
+        node_ids=[node.id for node in graph.nodes],
+        entity_types=list(type_index),
+        node_types=node_types,
+        edges=edges,
+        edge_weights=edge_weights,
+        positions=positions,
+        is_truncated=getattr(graph, "is_truncated", False),
+    )
+
 
 class VisualGraphService:
-    """可视化图服务类，用于处理知识图谱的可视化相关功能"""
-    
+    """可视化图服务类，用于处理知识图谱的可视化相关功能
+
+    LightRAG实例在进程内共享（shared_storage），子图和邻居查询结果按
+    (知识库, 查询参数) 缓存，知识库图谱版本号变化（notify_graph_changed）或过期后重新查询。
+    超大图谱通过 get_overview / get_cluster 分级获取：整个图谱的排名、社区划分和布局坐标只在版本变化后重新计算。
+    search_labels 基于进程内的实体标签索引做自动补全，图谱变化后只更新受影响的实体。
+    """
+
     def __init__(self, collection_id: str, max_graph_nodes: int = 1000):
         """
         初始化可视化图服务
-        
+
         Args:
             collection_id: 知识库集合ID，用作workspace
             max_graph_nodes: 最大图节点数量，默认1000
         """
         self.collection_id = collection_id
         self.max_graph_nodes = max_graph_nodes
-        
-        # 初始化 LightRAGStorage
-        self.lightrag_storage = LightRAGStorage(workspace=collection_id)
-        self.lightrag = None  # 将在 _ensure_lightrag_initialized 中初始化
-        
-        logger.info(f"VisualGraphService initialized with collection_id={collection_id}, max_graph_nodes={max_graph_nodes}")
-    
-    async def _ensure_lightrag_initialized(self):
-        """确保 LightRAG 实例已初始化"""
-        if self.lightrag is None:
-            logger.info(f"Initializing LightRAG instance for collection_id={self.collection_id}")
-            # 异步初始化 lightrag_storage
-            await self.lightrag_storage.initialize()
-            # 从 lightrag_storage 获取 rag 实例
-            self.lightrag = self.lightrag_storage.rag
-    
+
+    @asynccontextmanager
+    async def _lightrag(self):
+        """借用进程内共享的 LightRAG 实例，使用期间持有引用，不会被淘汰释放"""
+        async with shared_storage(self.collection_id) as storage:
+            yield storage.rag
+
     async def get_knowledge_graph(
         self,
         node_label: str,
@@ -43,15 +224,15 @@ class VisualGraphService:
     ) -> KnowledgeGraph:
         """
         获取知识图谱数据
-        
+
         Args:
             node_label: 节点标签，用于筛选起始节点
             max_depth: 最大深度，默认为3
             max_nodes: 最大节点数量，如果为None则使用实例的max_graph_nodes
-            
+
         Returns:
             KnowledgeGraph: 包含节点、边和截断标志的知识图谱对象
-            
+
         Raises:
             ValueError: 当参数无效时抛出
             Exception: 当获取图数据失败时抛出
@@ -60,31 +241,361 @@ class VisualGraphService:
             # 参数验证
             if max_depth < 1:
                 raise ValueError("max_depth must be at least 1")
-            
+
             if max_nodes is None:
                 max_nodes = self.max_graph_nodes
             elif max_nodes < 1:
                 raise ValueError("max_nodes must be at least 1")
-            
+
+            version = await get_graph_version(self.collection_id)
+            cache_key = ("subgraph", self.collection_id, node_label, max_depth, max_nodes)
+            cached = _cache_get(cache_key, version)
+            if cached is not None:
+                logger.info(f"Knowledge graph cache hit: node_label={node_label}, max_depth={max_depth}, max_nodes={max_nodes}")
+                return cached
+
+            # 实体标签索引已加载时，不存在的实体直接返回空图，不再遍历图数据库
+            if node_label != "*" and self.collection_id in _LABEL_INDEXES:
+                try:
+                    index, _ = await self._get_label_index()
+                except Exception as e:
+                    logger.warning(f"Label index unavailable, fall back to graph traversal: {e}")
+                    index = None
+                if index is not None and node_label not in index:
+                    logger.info(f"Label {node_label} not found in label index, skip graph traversal")
+                    return KnowledgeGraph()
+
             logger.info(f"Getting knowledge graph: node_label={node_label}, max_depth={max_depth}, max_nodes={max_nodes}")
-            
-            # 确保 LightRAG 实例已初始化
-            await self._ensure_lightrag_initialized()
-            
+
             # 直接使用 LightRAG 的 get_knowledge_graph 方法
-            knowledge_graph = await self.lightrag.get_knowledge_graph(
-                node_label=node_label,
-                max_depth=max_depth,
-                max_nodes=max_nodes
-            )
-            
+            async with self._lightrag() as lightrag:
+                knowledge_graph = await lightrag.get_knowledge_graph(
+                    node_label=node_label,
+                    max_depth=max_depth,
+                    max_nodes=max_nodes
+                )
+
             logger.info(f"Knowledge graph retrieved: {len(knowledge_graph.nodes)} nodes, {len(knowledge_graph.edges)} edges, truncated={knowledge_graph.is_truncated}")
-            
+
+            _cache_put(cache_key, version, knowledge_graph)
             return knowledge_graph
-            
+
         except ValueError as e:
             logger.error(f"Parameter validation error: {e}")
             raise
         except Exception as e:
             logger.error(f"Failed to get knowledge graph: {e}")
-            raise Exception(f"Failed to retrieve knowledge graph: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to retrieve knowledge graph: {str(e)}")
+
+    async def get_neighbors(self, node_id: str, offset: int = 0, limit: int = 50) -> NodeNeighbors:
+        """
+        获取单个节点的邻居（增量展开），不需要重新获取整个子图
+
+        邻居按度数从高到低排序后分页，返回的图包含该节点本身、当前页的邻居及它们之间的边。
+
+        Args:
+            node_id: 节点ID（实体名称）
+            offset: 分页偏移
+            limit: 每页邻居数
+
+        Returns:
+            NodeNeighbors: 邻居子图和分页信息
+
+        Raises:
+            ValueError: 当参数无效或节点不存在时抛出
+            Exception: 当获取图数据失败时抛出
+        """
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit must be at least 1")
+
+        version = await get_graph_version(self.collection_id)
+        cache_key = ("neighbors", self.collection_id, node_id, offset, limit)
+        cached = _cache_get(cache_key, version)
+        if cached is not None:
+            return cached
+
+        try:
+            async with self._lightrag() as lightrag:
+                graph = lightrag.chunk_entity_relation_graph
+
+                center = await graph.get_node(node_id)
+                if center is None:
+                    raise ValueError(f"node {node_id} not found")
+
+                edges = await graph.get_node_edges(node_id) or []
+                neighbor_ids = list(dict.fromkeys(
+                    target if source == node_id else source for source, target in edges
+                ))
+                degrees = await graph.node_degrees_batch(neighbor_ids) if neighbor_ids else {}
+                neighbor_ids.sort(key=lambda neighbor: (-degrees.get(neighbor, 0), neighbor))
+                page_ids = neighbor_ids[offset:offset + limit]
+
+                nodes = await graph.get_nodes_batch([node_id] + page_ids)
+                page_set = set(page_ids)
+                page_edges = [(source, target) for source, target in edges
+                              if (target if source == node_id else source) in page_set]
+                edge_properties = await graph.get_edges_batch(
+                    [{"src": source, "tgt": target} for source, target in page_edges]
+                ) if page_edges else {}
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get neighbors of {node_id}: {e}")
+            raise Exception(f"Failed to retrieve node neighbors: {str(e)}")
+
+        knowledge_graph = KnowledgeGraph(
+            nodes=[
+                KnowledgeGraphNode(id=nid, labels=[nid], properties=dict(nodes.get(nid) or {}))
+                for nid in [node_id] + page_ids
+            ],
+            edges=[
+                KnowledgeGraphEdge(id=f"{source}-{target}", type="DIRECTED", source=source, target=target,
+                                   properties=dict(edge_properties.get((source, target)) or {}))
+                for source, target in page_edges
+            ],
+            is_truncated=offset + limit < len(neighbor_ids),
+        )
+        result = NodeNeighbors(
+            node_id=node_id,
+            page=GraphPage(total=len(neighbor_ids), offset=offset, limit=limit,
+                           has_more=offset + limit < len(neighbor_ids)),
+            graph=knowledge_graph,
+        )
+        logger.info(f"Neighbors of {node_id}: {len(page_ids)}/{len(neighbor_ids)} (offset={offset})")
+        _cache_put(cache_key, version, result)
+        return result
+
+    # ==================== 多级细节（社区概览 / 展开社区） ====================
+
+    async def _get_summary(self) -> Tuple[GraphSummary, str]:
+        """获取整个图谱的摘要（排名、社区、布局坐标），按图谱版本号缓存"""
+        version = await get_graph_version(self.collection_id)
+        cache_key = ("summary", self.collection_id)
+        ttl = int(os.getenv("VISUAL_GRAPH_SUMMARY_TTL", "3600"))
+        summary = _cache_get(cache_key, version, ttl, cache=_SUMMARY_CACHE)
+        if summary is not None:
+            return summary, version
+
+        lock = _SUMMARY_LOCKS.setdefault(self.collection_id, asyncio.Lock())
+        async with lock:
+            # 等待锁期间其他请求可能已经计算完成
+            summary = _cache_get(cache_key, version, ttl, cache=_SUMMARY_CACHE)
+            if summary is not None:
+                return summary, version
+            try:
+                started = time.perf_counter()
+                async with self._lightrag() as lightrag:
+                    graph = lightrag.chunk_entity_relation_graph
+                    nodes = await graph.get_all_nodes()
+                    edges = await graph.get_all_edges()
+                summary = await asyncio.to_thread(
+                    build_graph_summary, nodes, edges,
+                    max_clusters=int(os.getenv("VISUAL_GRAPH_MAX_CLUSTERS", "50")),
+                )
+            except Exception as e:
+                logger.error(f"Failed to build graph summary for {self.collection_id}: {e}")
+                raise Exception(f"Failed to build graph summary: {str(e)}")
+            logger.info(f"Graph summary for {self.collection_id}: {summary.num_nodes} nodes, "
+                        f"{summary.num_clusters} clusters in {time.perf_counter() - started:.2f}s")
+            _cache_put(cache_key, version, summary, cache=_SUMMARY_CACHE,
+                       max_entries=int(os.getenv("VISUAL_GRAPH_SUMMARY_CACHE_SIZE", "8")))
+            return summary, version
+
+    @staticmethod
+    def _cluster_info(summary: GraphSummary, cluster_id: int, rank_by: str, top_k: int = 5) -> GraphCluster:
+        members = summary.members(cluster_id, rank_by)
+        top_entities = [summary.node_ids[idx] for idx in members[:top_k]]
+        types = Counter(summary.entity_types[idx] for idx in members if summary.entity_types[idx])
+        return GraphCluster(
+            id=cluster_id,
+            label=top_entities[0] if top_entities else str(cluster_id),
+            size=int(summary.cluster_sizes[cluster_id]),
+            top_entities=top_entities,
+            entity_type=types.most_common(1)[0][0] if types else None,
+            x=round(float(summary.cluster_centers[cluster_id, 0]), 2),
+            y=round(float(summary.cluster_centers[cluster_id, 1]), 2),
+            radius=round(float(summary.cluster_radius[cluster_id]), 2),
+            is_misc=cluster_id == summary.misc_cluster,
+        )
+
+    @staticmethod
+    def _summary_graph(summary: GraphSummary, indices: np.ndarray,
+                       properties: Optional[Dict[str, dict]] = None, is_truncated: bool = False) -> KnowledgeGraph:
+        """把摘要中的一组节点转换为带布局坐标的知识图谱"""
+        nodes = []
+        for idx in indices:
+            node_id = summary.node_ids[idx]
+            node_properties = dict((properties or {}).get(node_id) or {"entity_type": summary.entity_types[idx]})
+            node_properties.update({
+                "x": round(float(summary.positions[idx, 0]), 2),
+                "y": round(float(summary.positions[idx, 1]), 2),
+                "degree": int(summary.degree[idx]),
+                "pagerank": float(summary.pagerank[idx]),
+                "cluster": int(summary.cluster[idx]),
+            })
+            nodes.append(KnowledgeGraphNode(id=node_id, labels=[node_id], properties=node_properties))
+        edges = []
+        for edge_idx in summary.induced_edges(indices):
+            source = summary.node_ids[summary.src[edge_idx]]
+            target = summary.node_ids[summary.tgt[edge_idx]]
+            edges.append(KnowledgeGraphEdge(id=f"{source}-{target}", type="DIRECTED", source=source, target=target,
+                                            properties={"weight": float(summary.weight[edge_idx])}))
+        return KnowledgeGraph(nodes=nodes, edges=edges, is_truncated=is_truncated)
+
+    async def get_overview(self, rank_by: str = "pagerank", top_nodes: int = 0) -> GraphOverview:
+        """
+        获取整个图谱的粗粒度概览
+
+        社区作为超级节点返回（带布局坐标和半径），社区之间的边按边数聚合，前端先渲染概览再按需展开社区。
+
+        Args:
+            rank_by: 节点排序方式，pagerank 或 degree
+            top_nodes: 同时返回全局排名前N的实体及它们之间的边（0表示不返回）
+
+        Returns:
+            GraphOverview: 图谱概览
+
+        Raises:
+            ValueError: 当参数无效时抛出
+        """
+        if rank_by not in RANK_METHODS:
+            raise ValueError(f"rank_by must be one of {RANK_METHODS}")
+        if top_nodes < 0:
+            raise ValueError("top_nodes must be >= 0")
+        summary, version = await self._get_summary()
+
+        graph = None
+        if top_nodes:
+            top = summary.ranked(np.arange(summary.num_nodes), rank_by)[:top_nodes]
+            graph = self._summary_graph(summary, top, is_truncated=top_nodes < summary.num_nodes)
+
+        return GraphOverview(
+            collection_id=self.collection_id,
+            version=version,
+            total_nodes=summary.num_nodes,
+            total_edges=summary.num_edges,
+            rank_by=rank_by,
+            clusters=[self._cluster_info(summary, cluster_id, rank_by) for cluster_id in range(summary.num_clusters)],
+            cluster_edges=[GraphClusterEdge(**edge) for edge in summary.cluster_edges()],
+            graph=graph,
+        )
+
+    async def get_cluster(self, cluster_id: int, offset: int = 0, limit: int = 200,
+                          rank_by: str = "pagerank") -> ClusterGraph:
+        """
+        展开单个社区：返回社区内按排名分页的实体（带完整属性和布局坐标）及它们之间的边
+
+        Args:
+            cluster_id: 概览中的社区编号
+            offset: 分页偏移
+            limit: 每页实体数
+            rank_by: 节点排序方式，pagerank 或 degree
+
+        Returns:
+            ClusterGraph: 社区子图和分页信息
+
+        Raises:
+            ValueError: 当参数无效或社区不存在时抛出
+        """
+        if rank_by not in RANK_METHODS:
+            raise ValueError(f"rank_by must be one of {RANK_METHODS}")
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit must be at least 1")
+        summary, _ = await self._get_summary()
+        members = summary.members(cluster_id, rank_by)
+        page = members[offset:offset + limit]
+
+        try:
+            page_ids = [summary.node_ids[idx] for idx in page]
+            async with self._lightrag() as lightrag:
+                graph = lightrag.chunk_entity_relation_graph
+                properties = await graph.get_nodes_batch(page_ids) if page_ids else {}
+        except Exception as e:
+            logger.error(f"Failed to get nodes of cluster {cluster_id}: {e}")
+            raise Exception(f"Failed to retrieve cluster nodes: {str(e)}")
+
+        has_more = offset + limit < len(members)
+        return ClusterGraph(
+            cluster=self._cluster_info(summary, cluster_id, rank_by),
+            page=GraphPage(total=len(members), offset=offset, limit=limit, has_more=has_more),
+            graph=self._summary_graph(summary, page, properties=properties, is_truncated=has_more),
+        )
+
+    # ==================== 实体标签搜索 ====================
+
+    @staticmethod
+    async def _batched(fetch, labels: List[str]) -> Dict[str, Any]:
+        """分批调用图存储的批量查询（node_degrees_batch / get_nodes_batch）"""
+        result: Dict[str, Any] = {}
+        for start in range(0, len(labels), _DEGREE_BATCH_SIZE):
+            result.update(await fetch(labels[start:start + _DEGREE_BATCH_SIZE]))
+        return result
+
+    async def _get_label_index(self) -> Tuple[LabelIndex, str]:
+        """获取与当前图谱版本一致的实体标签索引
+
+        首次使用时从 get_all_labels + node_degrees_batch 全量构建；之后图谱版本变化时按变更日志
+        只更新受影响的实体（新增、删除或度数变化），变更日志不可用时全量重建。
+        """
+        version = await get_graph_version(self.collection_id)
+        entry = _LABEL_INDEXES.get(self.collection_id)
+        if entry is not None and entry[0] == version:
+            _LABEL_INDEXES.move_to_end(self.collection_id)
+            return entry[1], version
+
+        lock = _LABEL_INDEX_LOCKS.setdefault(self.collection_id, asyncio.Lock())
+        async with lock:
+            entry = _LABEL_INDEXES.get(self.collection_id)
+            if entry is not None and entry[0] == version:
+                return entry[1], version
+
+            started = time.perf_counter()
+            changed = await _get_changed_entities(self.collection_id, entry[0], version) if entry else None
+            try:
+                async with self._lightrag() as lightrag:
+                    graph = lightrag.chunk_entity_relation_graph
+                    if changed is not None:
+                        index = entry[1]
+                        existing = await self._batched(graph.get_nodes_batch, changed)
+                        degrees = await self._batched(graph.node_degrees_batch, [label for label in changed if label in existing])
+                        index.update(degrees, removed=[label for label in changed if label not in existing])
+                        mode = f"incremental ({len(changed)} entities)"
+                    else:
+                        labels = await graph.get_all_labels()
+                        index = LabelIndex()
+                        index.update(await self._batched(graph.node_degrees_batch, labels))
+                        mode = "full"
+            except Exception as e:
+                logger.error(f"Failed to build label index for {self.collection_id}: {e}")
+                raise Exception(f"Failed to build label index: {str(e)}")
+
+            _LABEL_INDEXES[self.collection_id] = (version, index)
+            _LABEL_INDEXES.move_to_end(self.collection_id)
+            while len(_LABEL_INDEXES) > max(1, int(os.getenv("VISUAL_GRAPH_LABEL_INDEX_SIZE", "16"))):
+                _LABEL_INDEXES.popitem(last=False)
+            logger.info(f"Label index for {self.collection_id} updated ({mode}): {len(index)} labels "
+                        f"in {time.perf_counter() - started:.3f}s")
+            return index, version
+
+    async def search_labels(self, query: str, limit: int = 10, fuzzy: bool = True) -> LabelSearchResult:
+        """
+        实体标签自动补全
+
+        Args:
+            query: 输入的文本，为空时返回度数最高的实体
+            limit: 最多返回的实体数
+            fuzzy: 是否包含模糊匹配
+
+        Returns:
+            LabelSearchResult: 按匹配类型（精确 > 前缀 > 子串 > 模糊）和度数排序的实体
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        index, version = await self._get_label_index()
+        matches = index.search(query, limit=limit, fuzzy=fuzzy)
+        return LabelSearchResult(
+            query=query,
+            version=version,
+            total_labels=len(index),
+            labels=[LabelMatch(label=label, degree=degree, match=match) for label, degree, match in matches],
+        )
@@ -0,0 +1,63 @@
+"""
+批量分块吞吐对比
+
+对比单线程逐个 chunk_document 与多进程 chunk_documents_parallel 的吞吐（文档/秒、MB/秒），
+并记录多进程模式下第一个分块结果的产出时间。不依赖外部服务。
+
+运行：
+cd rag-backend
+python -m backend.tests.bench_chunk_parallel [文档数] [进程数]
+"""
+
+import sys
+import time
+
+from backend.rag.chunks.chunks import TextChunker
+from backend.rag.chunks.models import ChunkConfig, ChunkStrategy, DocumentContent
+
+
+def build_documents(count: int):
+    """生成长度差异较大的Markdown文档，模拟产品目录（少量长手册 + 大量短页面）"""
+    paragraph = "本产品支持客户管理、商机跟踪和合同审批，可与企业微信和钉钉集成。"
+    documents = []
+    for i in range(count):
+        sections = 40 if i % 50 == 0 else (i % 6) + 1
+        content = "\n\n".join(
+            f"# 产品{i}\n\n## 章节{s}\n\n" + paragraph * ((i + s) % 30 + 5) for s in range(sections)
+        )
+        documents.append(DocumentContent(content=content, document_name=f"catalog/{i}.md"))
+    return documents
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    documents = build_documents(count)
+    total_mb = sum(len(document.content.encode("utf-8")) for document in documents) / 1024 / 1024
+    config = ChunkConfig(strategy=ChunkStrategy.MARKDOWN_HYBRID)
+    chunker = TextChunker()
+
+    start = time.monotonic()
+    sequential_chunks = sum(chunker.chunk_document(document, config).total_chunks for document in documents)
+    sequential = time.monotonic() - start
+    print(f"单线程: {sequential:.2f}s，{count / sequential:.1f} 文档/秒，{total_mb / sequential:.2f} MB/秒，"
+          f"{sequential_chunks} 块")
+
+    start = time.monotonic()
+    first_result = None
+    parallel_chunks = 0
+    for chunk_result in chunker.chunk_documents_parallel(documents, config, max_workers=max_workers):
+        if first_result is None:
+            first_result = time.monotonic() - start
+        parallel_chunks += chunk_result.total_chunks
+    parallel = time.monotonic() - start
+    print(f"多进程: {parallel:.2f}s，{count / parallel:.1f} 文档/秒，{total_mb / parallel:.2f} MB/秒，"
+          f"{parallel_chunks} 块，首个结果 {first_result:.2f}s")
+
+    if sequential_chunks != parallel_chunks:
+        print("警告: 两种方式的分块数不一致")
+    print(f"加速比: {sequential / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+知识图谱概览（多级细节）开销测试
+
+对知识库的LightRAG图谱（或按社区结构随机生成的图谱）计算摘要，测量：
+    - 摘要计算耗时（读取全部节点/边 + 排名 + 社区划分 + 布局）
+    - 概览、展开单个社区、原先1000节点子图的响应大小（JSON / gzip）
+
+运行：
+cd rag-backend
+python -m backend.tests.bench_graph_summary <collection_id> [--top-nodes 200] [--cluster-limit 200]
+python -m backend.tests.bench_graph_summary --synthetic 50000 [--communities 100]
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+
+from backend.rag.storage.lightrag_storage import release_shared_storage
+from backend.service.graph_summary import build_graph_summary
+from backend.service.visual_graph import VisualGraphService, to_compact
+
+load_dotenv()
+
+
+def payload_size(data) -> str:
+    body = json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return f"{len(body) / 1024:.1f}KB (gzip {len(gzip.compress(body, compresslevel=5)) / 1024:.1f}KB)"
+
+
+def synthetic_graph(num_nodes: int, communities: int, seed: int = 0):
+    """社区内稠密、社区间稀疏的随机图（每个节点平均度数约10）"""
+    rng = np.random.default_rng(seed)
+    community = rng.integers(0, communities, num_nodes)
+    members = [np.flatnonzero(community == c) for c in range(communities)]
+    nodes = [{"id": f"entity_{i}", "entity_type": f"type_{i % 8}"} for i in range(num_nodes)]
+    edges = []
+    for i in range(num_nodes):
+        group = members[community[i]]
+        for j in rng.choice(group, size=min(4, len(group)), replace=False):
+            edges.append({"source": f"entity_{i}", "target": f"entity_{j}", "weight": float(rng.integers(1, 5))})
+        if rng.random() < 0.1:
+            edges.append({"source": f"entity_{i}", "target": f"entity_{rng.integers(num_nodes)}", "weight": 1.0})
+    return nodes, edges
+
+
+def bench_synthetic(num_nodes: int, communities: int, top_nodes: int):
+    nodes, edges = synthetic_graph(num_nodes, communities)
+    print(f"synthetic graph: {len(nodes)} nodes, {len(edges)} edges")
+    started = time.perf_counter()
+    summary = build_graph_summary(nodes, edges)
+    print(f"summary: {time.perf_counter() - started:.2f}s, {summary.num_clusters} clusters, "
+          f"largest {int(summary.cluster_sizes.max())}, misc {summary.misc_cluster}")
+
+    clusters = [VisualGraphService._cluster_info(summary, c, "pagerank") for c in range(summary.num_clusters)]
+    overview = {"clusters": clusters, "cluster_edges": summary.cluster_edges()}
+    print(f"overview (clusters only): {payload_size(overview)}")
+    top = summary.ranked(np.arange(summary.num_nodes))
+    print(f"overview + top {top_nodes} entities (compact): "
+          f"{payload_size({**overview, 'graph': to_compact(VisualGraphService._summary_graph(summary, top[:top_nodes]))})}")
+    print(f"1000-node graph (full): {payload_size(VisualGraphService._summary_graph(summary, top[:1000]))}")
+
+
+async def bench_collection(collection_id: str, top_nodes: int, cluster_limit: int):
+    service = VisualGraphService(collection_id)
+    for attempt in ("cold", "cached"):
+        started = time.perf_counter()
+        overview = await service.get_overview(top_nodes=top_nodes)
+        print(f"overview ({attempt}): {(time.perf_counter() - started) * 1000:.1f}ms, "
+              f"{overview.total_nodes} nodes, {len(overview.clusters)} clusters")
+    print(f"overview payload: {payload_size(overview)}")
+    if overview.clusters:
+        started = time.perf_counter()
+        cluster = await service.get_cluster(0, limit=cluster_limit)
+        print(f"cluster 0 ({cluster.page.total} entities): {(time.perf_counter() - started) * 1000:.1f}ms, "
+              f"{payload_size(cluster)}")
+        started = time.perf_counter()
+        graph = await service.get_knowledge_graph(node_label=overview.clusters[0].label, max_nodes=1000)
+        print(f"subgraph of '{overview.clusters[0].label}' ({len(graph.nodes)} nodes): "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms, {payload_size(graph)}")
+    await release_shared_storage(collection_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱概览开销测试")
+    parser.add_argument("collection_id", nargs="?")
+    parser.add_argument("--synthetic", type=int, default=0, help="随机生成的节点数（不连接LightRAG）")
+    parser.add_argument("--communities", type=int, default=100)
+    parser.add_argument("--top-nodes", type=int, default=200)
+    parser.add_argument("--cluster-limit", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        bench_synthetic(args.synthetic, args.communities, args.top_nodes)
+    elif args.collection_id:
+        asyncio.run(bench_collection(args.collection_id, args.top_nodes, args.cluster_limit))
+    else:
+        parser.error("collection_id or --synthetic is required")
+
+
+if __name__ == "__main__":
+    main()
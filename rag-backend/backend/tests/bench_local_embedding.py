@@ -0,0 +1,131 @@
+"""
+本地CPU向量模型与远程API的吞吐/延迟对比
+
+对每个提供方分别测量：
+    摄取吞吐   按 --batch-size 分批、--concurrency 个批次并发（与MilvusStorage批量写入一致），文本/秒
+    查询延迟   逐条 embed_query 的 p50/p99
+    并发查询   --concurrency 个查询同时进行时的 p50/p99 和 查询/秒
+直接调用底层模型，绕过向量缓存，避免重复文本命中缓存。
+
+提供方格式为 名称[@维度]，例如 dashscope@1536、local@384（本地模型按 LOCAL_EMBEDDING_* 配置加载）。
+
+运行：
+cd rag-backend
+python -m backend.tests.bench_local_embedding [--providers dashscope@1536 local@384] [--texts docs.md]
+    [--count 200] [--queries 50] [--batch-size 8] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from backend.agent.models import CachedEmbeddings
+from backend.config.embedding import get_embedding_model
+
+load_dotenv()
+
+_WORDS = ("产品 价格 销售 客户 订单 合同 发货 退款 库存 渠道 折扣 会员 积分 售后 保修 "
+          "product pricing sales customer order contract shipping refund inventory discount").split()
+
+
+def load_texts(path: str, count: int) -> List[str]:
+    """从文件按段落读取文本，未指定文件时生成中英混合的样本文本"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            paragraphs = [part.strip() for part in f.read().split("\n\n") if part.strip()]
+        if not paragraphs:
+            raise SystemExit(f"{path} 中没有文本")
+        return [paragraphs[i % len(paragraphs)] for i in range(count)]
+    rng = random.Random(0)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 300))) for _ in range(count)]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+
+
+def bench_ingestion(model, texts: List[str], batch_size: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(model.embed_documents,
+                      [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]))
+    return len(texts) / (time.perf_counter() - start)
+
+
+def bench_queries(model, queries: List[str]) -> Dict[str, float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentiles(latencies)
+
+
+async def bench_concurrent_queries(model, queries: List[str], concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await model.aembed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    return {**percentiles(latencies), "qps": len(queries) / (time.perf_counter() - start)}
+
+
+def run_provider(spec: str, texts: List[str], queries: List[str], args) -> Dict[str, Any]:
+    provider, _, dim = spec.partition("@")
+    model = get_embedding_model(dimensions=int(dim) if dim else None, provider=provider)
+    if isinstance(model, CachedEmbeddings):
+        model = model.embeddings
+
+    # 预热（本地模型首次推理会做图优化，远程API建立连接）
+    model.embed_documents(texts[:2])
+    return {
+        "provider": spec,
+        "docs_per_second": bench_ingestion(model, texts, args.batch_size, args.concurrency),
+        "query": bench_queries(model, queries),
+        "concurrent_query": asyncio.run(bench_concurrent_queries(model, queries, args.concurrency)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比本地CPU向量模型与远程API的吞吐和延迟")
+    parser.add_argument("--providers", nargs="*", default=["dashscope", "local"],
+                        help="提供方，格式为 名称[@维度]")
+    parser.add_argument("--texts", default="", help="样本文本文件（按空行分段），默认生成样本文本")
+    parser.add_argument("--count", type=int, default=200, help="摄取吞吐测试的文本数")
+    parser.add_argument("--queries", type=int, default=50, help="查询数")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("MILVUS_EMBED_BATCH_SIZE", "8")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("MILVUS_EMBED_CONCURRENCY", "4")))
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.count)
+    # 查询取样本文本的前若干个词，长度与实际查询接近
+    queries = [" ".join(text.split()[:12]) + f" {i}" for i, text in enumerate(texts[:args.queries])]
+
+    for spec in args.providers:
+        try:
+            result = run_provider(spec, texts, queries, args)
+        except Exception as e:
+            print(f"{spec}: 跳过（{e}）")
+            continue
+        query, concurrent = result["query"], result["concurrent_query"]
+        print(f"{spec:<16} 摄取={result['docs_per_second']:.1f} 文本/秒  "
+              f"单查询 p50={query['p50_ms']:.1f}ms p99={query['p99_ms']:.1f}ms  "
+              f"并发查询 p50={concurrent['p50_ms']:.1f}ms p99={concurrent['p99_ms']:.1f}ms "
+              f"{concurrent['qps']:.1f} 查询/秒")
+
+
+if __name__ == "__main__":
+    main()
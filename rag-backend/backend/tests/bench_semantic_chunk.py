@@ -0,0 +1,91 @@
+"""
+语义分块性能对比
+
+对比 LangChain SemanticChunker（原 _semantic_chunk 实现）与 SemanticSplitter 的
+耗时、embedding请求次数和请求文本数。默认使用真实向量模型（需配置 VECTOR_DASHSCOPE_API_KEY），
+第二轮运行 SemanticSplitter 时展示embedding缓存的效果。
+
+运行：
+cd rag-backend
+python -m backend.tests.bench_semantic_chunk [文档路径]
+"""
+
+import sys
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_experimental.text_splitter import SemanticChunker
+
+from backend.config.embedding import get_embedding_model
+from backend.rag.chunks.chunks import SemanticSplitter
+
+
+class CountingEmbeddings(Embeddings):
+    """统计请求次数和文本数的包装器"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.requests = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.requests += 1
+        self.texts += len(texts)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def build_text(paragraphs: int = 60) -> str:
+    topics = [
+        "销售管理软件支持客户管理、商机跟踪和合同审批。",
+        "系统部署在云端，提供高可用和自动备份。",
+        "售后服务包括七天二十四小时电话支持和远程协助。",
+        "价格按用户数计费，企业版提供专属客户经理。",
+    ]
+    return "\n".join(f"{topics[i % len(topics)]}第{i}段补充说明。" for i in range(paragraphs))
+
+
+def cache_misses(embeddings: Embeddings) -> int:
+    """实际发送给向量模型的文本数（未启用缓存时返回0）"""
+    return embeddings.stats()["misses"] if hasattr(embeddings, "stats") else 0
+
+
+def run(name, splitter_fn, counter: CountingEmbeddings, text: str):
+    counter.requests = counter.texts = 0
+    misses_before = cache_misses(counter.embeddings)
+    start = time.monotonic()
+    chunks = splitter_fn(text)
+    elapsed = time.monotonic() - start
+    print(f"{name}: {elapsed:.2f}s，{len(chunks)} 块，embedding调用 {counter.requests} 次，文本 {counter.texts} 条，"
+          f"缓存未命中 {cache_misses(counter.embeddings) - misses_before} 条")
+    return elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = build_text()
+
+    counter = CountingEmbeddings(get_embedding_model())
+
+    langchain_chunker = SemanticChunker(
+        embeddings=counter,
+        breakpoint_threshold_type="percentile",
+        breakpoint_threshold_amount=95,
+        sentence_split_regex=r'[。！？.\n]',
+    )
+    baseline = run("SemanticChunker", lambda t: langchain_chunker.split_text(t), counter, text)
+
+    splitter = SemanticSplitter(counter, breakpoint_threshold_amount=95, max_chunk_size=1000)
+    vectorized = run("SemanticSplitter", splitter.split_text, counter, text)
+    cached = run("SemanticSplitter（缓存命中）", splitter.split_text, counter, text)
+
+    print(f"加速比: {baseline / vectorized:.2f}x，缓存命中后: {baseline / cached:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
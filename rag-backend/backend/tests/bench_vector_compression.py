@@ -0,0 +1,234 @@
+"""
+向量压缩方案对比
+
+从已有collection中抽取分块向量，按不同的向量类型/索引/维度分别建立临时collection，
+以numpy精确检索（float32暴力计算）的结果为基准，测量每种方案的 recall@k、检索延迟（p50/p99）和内存。
+
+方案格式为 向量类型:索引类型[@维度]，例如：
+    FLOAT:HNSW          原始float32 + HNSW（当前默认）
+    FLOAT16:HNSW        半精度向量，内存减半
+    BFLOAT16:HNSW       bfloat16向量（需安装 ml_dtypes）
+    FLOAT:IVF_SQ8       标量量化，每维1字节
+    FLOAT:IVF_PQ        乘积量化，每8维1字节（MILVUS_IVF_PQ_M / MILVUS_IVF_PQ_NBITS 可调）
+    FLOAT:HNSW@512      使用 text-embedding-v4 的 dimensions=512 重新向量化（需配置 VECTOR_DASHSCOPE_API_KEY）
+基准始终是原collection中的原始向量，降维方案的召回率因此同时反映了降维带来的质量损失。
+
+内存优先使用Milvus上报的segment内存（get_query_segment_info），取不到时给出按索引结构估算的值。
+
+运行：
+cd rag-backend
+python -m backend.tests.bench_vector_compression <collection> [--samples 5000] [--queries 100] [--k 10]
+    [--filter 'collection_id == "kb1_xxx"'] [--options FLOAT:HNSW FLOAT16:HNSW FLOAT:IVF_PQ FLOAT:HNSW@512] [--keep]
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pymilvus import DataType, MilvusClient
+
+from backend.rag.storage.milvus_schema import TEXT_FIELD, VECTOR_DATA_TYPES, VECTOR_FIELD, IndexConfig
+
+load_dotenv()
+
+DEFAULT_OPTIONS = ["FLOAT:HNSW", "FLOAT16:HNSW", "BFLOAT16:HNSW", "FLOAT:IVF_SQ8", "FLOAT:IVF_PQ"]
+
+
+def parse_option(option: str) -> Dict[str, Any]:
+    spec, _, dim = option.partition("@")
+    vector_type, _, index_type = spec.partition(":")
+    config = IndexConfig.from_env().with_index(index_type or "HNSW", os.getenv("MILVUS_METRIC_TYPE", "COSINE"),
+                                               vector_type or "FLOAT_VECTOR")
+    return {"name": option, "config": config, "dim": int(dim) if dim else None}
+
+
+def to_float32(vector: Any, vector_type: str) -> np.ndarray:
+    """把Milvus返回的向量转换为float32数组（半精度向量返回的是字节串）"""
+    if isinstance(vector, list) and vector and isinstance(vector[0], bytes):
+        vector = vector[0]
+    if isinstance(vector, bytes):
+        if vector_type == "BFLOAT16_VECTOR":
+            from ml_dtypes import bfloat16
+            return np.frombuffer(vector, dtype=bfloat16).astype(np.float32)
+        return np.frombuffer(vector, dtype=np.float16).astype(np.float32)
+    return np.asarray(vector, dtype=np.float32)
+
+
+def load_samples(client: MilvusClient, collection: str, count: int, filter_expr: str):
+    """从源collection读取文本和原始向量"""
+    vector_type = "FLOAT_VECTOR"
+    for field in client.describe_collection(collection).get("fields", []):
+        if field["name"] == VECTOR_FIELD:
+            vector_type = next((name for name, data_type in VECTOR_DATA_TYPES.items()
+                                if data_type == field["type"]), vector_type)
+
+    client.load_collection(collection)
+    iterator = client.query_iterator(collection_name=collection, batch_size=1000, limit=count,
+                                     filter=filter_expr, output_fields=[TEXT_FIELD, VECTOR_FIELD])
+    texts, vectors = [], []
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            for row in rows:
+                texts.append(row[TEXT_FIELD])
+                vectors.append(to_float32(row[VECTOR_FIELD], vector_type))
+    finally:
+        iterator.close()
+    return texts, np.stack(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, k: int, metric: str) -> np.ndarray:
+    """numpy暴力计算的精确top-k（召回率基准）"""
+    if metric == "L2":
+        scores = -((queries ** 2).sum(1)[:, None] - 2 * queries @ base.T + (base ** 2).sum(1)[None, :])
+    elif metric == "COSINE":
+        scores = normalize(queries) @ normalize(base).T
+    else:
+        scores = queries @ base.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def estimate_memory(config: IndexConfig, count: int, dim: int) -> int:
+    """按索引结构估算内存字节数（不含Milvus自身开销）"""
+    bytes_per_value = 4 if config.vector_type == "FLOAT_VECTOR" else 2
+    raw = count * dim * bytes_per_value
+    if config.index_type == "HNSW":
+        return raw + count * config.hnsw_m * 2 * 4          # 第0层约2M个邻居，每个4字节ID
+    if config.index_type == "IVF_SQ8":
+        return count * dim
+    if config.index_type == "IVF_PQ":
+        pq_m = config.build_params(dim)["m"]
+        return count * pq_m * config.pq_nbits // 8
+    return raw
+
+
+def measured_memory(client: MilvusClient, collection: str) -> Optional[int]:
+    """Milvus上报的已加载segment内存，取不到时返回None"""
+    try:
+        from pymilvus import utility
+        segments = utility.get_query_segment_info(collection, using=client._using)
+        return sum(segment.mem_size for segment in segments)
+    except Exception:
+        return None
+
+
+def run_option(client: MilvusClient, option: Dict[str, Any], base: np.ndarray, queries: np.ndarray,
+               truth: np.ndarray, k: int, keep: bool) -> Dict[str, Any]:
+    config: IndexConfig = option["config"]
+    dim = base.shape[1]
+    name = "bench_" + option["name"].lower().replace(":", "_").replace("@", "_d")
+    if client.has_collection(name):
+        client.drop_collection(name)
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field(VECTOR_FIELD, VECTOR_DATA_TYPES[config.vector_type], dim=dim)
+    client.create_collection(collection_name=name, schema=schema)
+
+    start = time.monotonic()
+    for offset in range(0, base.shape[0], 1000):
+        part = base[offset:offset + 1000]
+        client.insert(name, [
+            {"id": offset + i, VECTOR_FIELD: vector}
+            for i, vector in enumerate(config.encode_vectors(part.tolist()))
+        ])
+    client.flush(name)
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name=VECTOR_FIELD, index_type=config.index_type,
+                           metric_type=config.metric_type, params=config.build_params(dim))
+    client.create_index(name, index_params)
+    client.load_collection(name)
+    build_seconds = time.monotonic() - start
+
+    search_params = config.search_params(k)
+    encoded_queries = config.encode_vectors(queries.tolist())
+    latencies, hits = [], 0
+    for query, expected in zip(encoded_queries, truth):
+        start = time.perf_counter()
+        result = client.search(name, data=[query], anns_field=VECTOR_FIELD, limit=k, search_params=search_params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({hit["id"] for hit in result[0]} & set(expected.tolist()))
+
+    memory = measured_memory(client, name)
+    if not keep:
+        client.drop_collection(name)
+    return {
+        "name": option["name"],
+        "dim": dim,
+        f"recall@{k}": hits / (len(truth) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "memory_mb": (memory if memory is not None else estimate_memory(config, base.shape[0], dim)) / 1024 / 1024,
+        "memory_source": "milvus" if memory is not None else "估算",
+        "build_seconds": build_seconds,
+        "params": config.build_params(dim),
+    }
+
+
+def reembed(texts: List[str], dimensions: int) -> np.ndarray:
+    """使用指定维度重新向量化（text-embedding-v4 dimensions参数）"""
+    from backend.config.embedding import get_embedding_model
+
+    embeddings = get_embedding_model(dimensions=dimensions)
+    vectors = []
+    for offset in range(0, len(texts), 10):
+        vectors.extend(embeddings.embed_documents(texts[offset:offset + 10]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比向量压缩方案的召回率、延迟和内存")
+    parser.add_argument("collection", help="提供样本向量的collection")
+    parser.add_argument("--samples", type=int, default=5000, help="建库的向量数")
+    parser.add_argument("--queries", type=int, default=100, help="查询数（从样本之外抽取）")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--filter", default="", help="抽样过滤表达式，如共享collection中的 collection_id == \"kb1_xxx\"")
+    parser.add_argument("--options", nargs="*", default=DEFAULT_OPTIONS)
+    parser.add_argument("--keep", action="store_true", help="保留临时collection")
+    args = parser.parse_args()
+
+    client = MilvusClient(
+        uri=os.getenv('MILVUS_URI', 'http://localhost:19530'),
+        db_name=os.getenv('MILVUS_DB_NAME', 'rag'),
+        token=os.getenv('MILVUS_TOKEN') or ""
+    )
+    texts, vectors = load_samples(client, args.collection, args.samples + args.queries, args.filter)
+    if len(texts) <= args.queries:
+        raise SystemExit(f"样本不足: 只读取到 {len(texts)} 条")
+    base, queries = vectors[:-args.queries], vectors[-args.queries:]
+    print(f"样本 {base.shape[0]} 条，查询 {queries.shape[0]} 条，原始维度 {base.shape[1]}，k={args.k}")
+
+    metric = os.getenv("MILVUS_METRIC_TYPE", "COSINE").upper()
+    truth = exact_top_k(base, queries, args.k, metric)
+
+    results = []
+    for option in map(parse_option, args.options):
+        try:
+            if option["dim"] and option["dim"] != base.shape[1]:
+                reduced = reembed(texts, option["dim"])
+                option_base, option_queries = reduced[:-args.queries], reduced[-args.queries:]
+            else:
+                option_base, option_queries = base, queries
+            results.append(run_option(client, option, option_base, option_queries, truth, args.k, args.keep))
+        except Exception as e:
+            print(f"{option['name']}: 跳过（{e}）")
+            continue
+        result = results[-1]
+        print(f"{result['name']:<18} dim={result['dim']:<5} recall@{args.k}={result[f'recall@{args.k}']:.3f} "
+              f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+              f"内存={result['memory_mb']:.1f}MB({result['memory_source']}) 构建={result['build_seconds']:.1f}s "
+              f"{result['params']}")
+
+
+if __name__ == "__main__":
+    main()
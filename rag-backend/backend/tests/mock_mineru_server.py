@@ -0,0 +1,96 @@
+"""
+本地模拟MinerU服务
+
+实现MinerU的任务创建、任务查询和结果下载接口，任务在被查询若干次后完成，
+结果压缩包中包含由PDF地址生成的full.md，便于在无外网和无API额度时测试解析流程。
+URL中包含 "fail" 的PDF会解析失败。
+
+单元测试中可通过 httpx.ASGITransport(app=create_app()) 直接挂载，无需启动服务；
+也可以单独启动后把 MINERU_API_URL 指向它：
+cd rag-backend
+python -m backend.tests.mock_mineru_server
+MINERU_API_URL=http://127.0.0.1:8765/api/v4 MINERU_API_KEY=mock-key ...
+"""
+
+import io
+import uuid
+import zipfile
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, Response
+
+MOCK_API_KEY = "mock-key"
+
+
+def build_result_zip(pdf_url: str) -> bytes:
+    """生成与MinerU结果结构一致的压缩包"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("layout.json", "{}")
+        zip_file.writestr("auto/full.md", f"# 解析结果\n\n来源: {pdf_url}\n")
+    return buffer.getvalue()
+
+
+def create_app(polls_until_done: int = 2) -> FastAPI:
+    """
+    Args:
+        polls_until_done: 任务被查询多少次后完成（之前依次返回pending/running）
+    """
+    app = FastAPI(title="Mock MinerU")
+    app.state.tasks = {}
+    app.state.max_running = 0
+
+    def running_count() -> int:
+        return sum(1 for task in app.state.tasks.values() if task["state"] in ("pending", "running"))
+
+    @app.post("/api/v4/extract/task")
+    async def create_task(request: Request, authorization: str = Header(default="")):
+        if authorization != f"Bearer {MOCK_API_KEY}":
+            return JSONResponse({"code": -10001, "msg": "认证失败"})
+        body = await request.json()
+        task_id = uuid.uuid4().hex
+        app.state.tasks[task_id] = {"url": body["url"], "polls": 0, "state": "pending"}
+        app.state.max_running = max(app.state.max_running, running_count())
+        return {"code": 0, "msg": "ok", "data": {"task_id": task_id}}
+
+    @app.get("/api/v4/extract/task/{task_id}")
+    async def get_task(task_id: str, request: Request, authorization: str = Header(default="")):
+        if authorization != f"Bearer {MOCK_API_KEY}":
+            return JSONResponse({"code": -10001, "msg": "认证失败"})
+        task = app.state.tasks.get(task_id)
+        if task is None:
+            return {"code": -60012, "msg": "任务不存在"}
+
+        task["polls"] += 1
+        if "fail" in task["url"]:
+            task["state"] = "failed"
+            return {"code": 0, "data": {"task_id": task_id, "state": "failed", "err_msg": "文件无法解析"}}
+        if task["polls"] < polls_until_done:
+            task["state"] = "running"
+            return {"code": 0, "data": {
+                "task_id": task_id,
+                "state": "running",
+                "extract_progress": {"extracted_pages": task["polls"], "total_pages": polls_until_done},
+            }}
+
+        task["state"] = "done"
+        return {"code": 0, "data": {
+            "task_id": task_id,
+            "state": "done",
+            "full_zip_url": f"{str(request.base_url).rstrip('/')}/files/{task_id}.zip",
+        }}
+
+    @app.get("/files/{task_id}.zip")
+    async def download(task_id: str):
+        task = app.state.tasks.get(task_id)
+        if task is None:
+            return Response(status_code=404)
+        return Response(build_result_zip(task["url"]), media_type="application/zip")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host="127.0.0.1", port=8765)
@@ -0,0 +1,57 @@
+from backend.rag.chunks.chunks import TextChunker
+from backend.rag.chunks.models import ChunkConfig, ChunkStrategy, DocumentContent
+from backend.rag.chunks.tokenizer import get_token_counter
+
+MD_CONTENT = (
+    "# 产品手册\n\n简介文字。\n\n"
+    "## 安装\n\n" + "安装步骤说明，需要先下载安装包，然后按照向导操作。" * 80 + "\n\n"
+    "### 系统要求\n\n内存8G。\n\n"
+    "## 使用\n\n短内容。\n"
+)
+
+
+def test_oversized_section_is_resplit_with_header_path():
+    config = ChunkConfig(
+        strategy=ChunkStrategy.MARKDOWN_HYBRID,
+        max_chunk_tokens=200,
+        chunk_overlap_tokens=30,
+        tokenizer="estimate",
+    )
+    result = TextChunker().chunk_document(DocumentContent(content=MD_CONTENT, document_name="manual.md"), config)
+    count_tokens = get_token_counter("estimate")
+
+    paths = [chunk.metadata["header_path"] for chunk in result.chunks]
+    assert paths[0] == "产品手册"
+    assert paths.count("产品手册 > 安装") > 1
+    assert "产品手册 > 安装 > 系统要求" in paths
+    # 标题行不会被单独切成一块
+    assert all(count_tokens(chunk.page_content) >= 5 for chunk in result.chunks)
+    assert all(count_tokens(chunk.page_content) <= 200 for chunk in result.chunks)
+    print([(path, count_tokens(chunk.page_content)) for path, chunk in zip(paths, result.chunks)])
+
+
+def test_byte_limit():
+    config = ChunkConfig(
+        strategy=ChunkStrategy.MARKDOWN_HYBRID,
+        max_chunk_tokens=100000,
+        max_chunk_bytes=2000,
+        tokenizer="estimate",
+    )
+    result = TextChunker().chunk_document(DocumentContent(content=MD_CONTENT, document_name="manual.md"), config)
+    assert all(len(chunk.page_content.encode("utf-8")) <= 2000 for chunk in result.chunks)
+
+
+def test_short_pieces_merged_within_token_limit():
+    count_tokens = get_token_counter("estimate")
+    pieces = ["## 标题", "长" * 190, "## 小节", "短" * 199, "结尾。"]
+    merged = TextChunker._merge_short_pieces(pieces, count_tokens, min_tokens=10, max_tokens=200)
+
+    # 并入相邻片段会超过上限时保持独立
+    assert merged == ["## 标题\n\n" + "长" * 190, "## 小节", "短" * 199, "结尾。"]
+    assert all(count_tokens(piece) <= 200 for piece in merged)
+
+
+if __name__ == "__main__":
+    test_oversized_section_is_resplit_with_header_path()
+    test_byte_limit()
+    test_short_pieces_merged_within_token_limit()
@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+
+from backend.rag.chunks.document_extraction import DocumentExtractor
+from backend.service.document_download import DocumentDownloader, DocumentTooLargeError
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("large.txt"):
+        # 未声明长度，只能在下载过程中发现超限
+        return httpx.Response(200, content=b"x" * 5000)
+    if request.url.path.endswith("declared.md"):
+        return httpx.Response(200, headers={"content-length": "999999"}, content=b"x")
+    return httpx.Response(200, headers={"etag": "\"v1\""}, content="# 标题\n\n正文".encode("utf-8"))
+
+
+def test_download_many_with_size_cap():
+    async def run():
+        async with DocumentDownloader(max_bytes=1000, spool_bytes=16,
+                                      transport=httpx.MockTransport(handler)) as downloader:
+            return await downloader.download_many([
+                "https://example.com/docs/readme.md",
+                "https://example.com/docs/large.txt",
+                "https://example.com/docs/declared.md",
+            ])
+
+    ok, large, declared = asyncio.run(run())
+    assert isinstance(large, DocumentTooLargeError)
+    assert isinstance(declared, DocumentTooLargeError)
+
+    with ok as document:
+        assert document.file_name == "readme.md"
+        assert document.headers["etag"] == "\"v1\""
+        content = DocumentExtractor().read_stream(document.file, document.file_name)
+    assert content.content == "# 标题\n\n正文"
+    print(content)
+
+
+if __name__ == "__main__":
+    test_download_many_with_size_cap()
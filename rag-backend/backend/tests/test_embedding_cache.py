@@ -0,0 +1,86 @@
+import asyncio
+import os
+import tempfile
+
+from langchain_core.embeddings import Embeddings
+
+from backend.agent.models import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """记录请求次数的假向量模型"""
+
+    def __init__(self):
+        self.requested = []
+
+    def embed_documents(self, texts):
+        self.requested.extend(texts)
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_only_misses_sent_to_provider():
+    provider = CountingEmbeddings()
+    cached = CachedEmbeddings(provider, model="fake", dimensions=3)
+
+    first = cached.embed_documents(["a", "bb", "a"])
+    second = cached.embed_documents(["bb", "ccc"])
+
+    assert first == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5], [1.0, 1.0, 0.5]]
+    assert second[0] == first[1]
+    assert provider.requested == ["a", "bb", "ccc"]
+    stats = cached.stats()
+    assert stats["misses"] == 4 and stats["memory_hits"] == 1
+    print(stats)
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        cached = CachedEmbeddings(CountingEmbeddings(), model="fake", dimensions=3, cache_path=path)
+        cached.embed_documents(["hello", "world"])
+        cached.close()
+
+        provider = CountingEmbeddings()
+        reopened = CachedEmbeddings(provider, model="fake", dimensions=3, cache_path=path)
+        vectors = asyncio.run(reopened.aembed_documents(["hello", "world", "new"]))
+        reopened.close()
+
+        assert provider.requested == ["new"]
+        assert vectors[0] == [5.0, 1.0, 0.5]
+        assert reopened.stats()["disk_hits"] == 2
+        print(reopened.stats())
+
+
+class PrefixedEmbeddings(CountingEmbeddings):
+    """查询和文档使用不同前缀的假向量模型（如e5）"""
+
+    def embed_documents(self, texts):
+        return super().embed_documents(["passage: " + text for text in texts])
+
+    def embed_query(self, text):
+        return super().embed_documents(["query: " + text])[0]
+
+
+def test_query_and_document_vectors_not_mixed():
+    provider = PrefixedEmbeddings()
+    cached = CachedEmbeddings(provider, model="fake", dimensions=3,
+                              query_prefix="query: ", document_prefix="passage: ")
+
+    document = cached.embed_documents(["苹果"])[0]
+    query = cached.embed_query("苹果")
+    assert query != document
+    assert provider.requested == ["passage: 苹果", "query: 苹果"]
+
+    # 两种向量各自命中缓存
+    assert cached.embed_query("苹果") == query
+    assert cached.embed_documents(["苹果"])[0] == document
+    assert len(provider.requested) == 2
+
+
+if __name__ == "__main__":
+    test_only_misses_sent_to_provider()
+    test_disk_tier_survives_restart()
+    test_query_and_document_vectors_not_mixed()
@@ -0,0 +1,76 @@
+import numpy as np
+
+from backend.service.graph_summary import build_graph_summary, limit_communities, louvain, pagerank
+
+
+def planted_graph(communities: int, size: int, seed: int = 0):
+    """社区内稠密、社区之间只有少量边的随机图"""
+    rng = np.random.default_rng(seed)
+    edges = []
+    for c in range(communities):
+        base = c * size
+        for _ in range(size * 4):
+            a, b = rng.integers(0, size, 2)
+            if a != b:
+                edges.append((base + a, base + b))
+    for c in range(communities):
+        edges.append((c * size, ((c + 1) % communities) * size + 1))
+    src, tgt = np.array(edges).T
+    return src, tgt, np.ones(len(edges))
+
+
+def test_louvain_recovers_planted_communities():
+    src, tgt, weight = planted_graph(communities=8, size=60)
+    labels = louvain(8 * 60, src, tgt, weight)
+
+    truth = np.arange(8 * 60) // 60
+    # 孤立实体单独成一个社区，只检查有边的实体
+    connected = np.bincount(np.concatenate([src, tgt]), minlength=8 * 60) > 0
+    assert len(np.unique(labels[connected])) == 8
+    for c in range(8):
+        assert len(np.unique(labels[connected & (truth == c)])) == 1
+
+
+def test_limit_communities_merges_into_neighbors():
+    src, tgt, weight = planted_graph(communities=8, size=60)
+    labels = np.arange(8 * 60) // 60
+    # 追加两个孤立实体
+    labels = np.concatenate([labels, [100, 101]])
+
+    cluster, misc = limit_communities(labels, src, tgt, weight, max_clusters=3)
+    sizes = np.bincount(cluster)
+    # 其余5个社区整体并入相连的保留社区，孤立实体归入"其他"
+    assert misc == 3 and sizes[misc] == 2
+    assert sizes[:3].sum() == 8 * 60 and (sizes[:3] % 60 == 0).all()
+
+
+def test_pagerank_prefers_hub():
+    src = np.array([0, 0, 0, 0, 1])
+    tgt = np.array([1, 2, 3, 4, 2])
+    ranks = pagerank(6, src, tgt, np.ones(5))
+    assert abs(ranks.sum() - 1) < 1e-9
+    assert ranks.argmax() == 0 and ranks[5] == ranks.min()
+
+
+def test_summary_layout_separates_clusters():
+    src, tgt, weight = planted_graph(communities=5, size=40)
+    nodes = [{"id": f"n{i}", "entity_type": "org"} for i in range(200)]
+    edges = [{"source": f"n{a}", "target": f"n{b}", "weight": "2"} for a, b in zip(src, tgt)]
+    summary = build_graph_summary(nodes, edges, max_clusters=10)
+
+    assert summary.num_clusters == 5 and summary.misc_cluster is None
+    centers, radius = summary.cluster_centers, summary.cluster_radius
+    dist = np.linalg.norm(centers[:, None] - centers[None], axis=2)
+    np.fill_diagonal(dist, np.inf)
+    assert (dist >= radius[:, None] + radius[None, :]).all()
+    # 节点都落在所属社区的圆内
+    offset = np.linalg.norm(summary.positions - centers[summary.cluster], axis=1)
+    assert (offset <= radius[summary.cluster] + 1e-6).all()
+    assert len(summary.cluster_edges()) == 5
+
+
+if __name__ == "__main__":
+    test_louvain_recovers_planted_communities()
+    test_limit_communities_merges_into_neighbors()
+    test_pagerank_prefers_hub()
+    test_summary_layout_separates_clusters()
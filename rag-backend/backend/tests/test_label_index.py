@@ -0,0 +1,58 @@
+from backend.service.label_index import LabelIndex, normalize_label
+
+
+def build_index():
+    index = LabelIndex()
+    index.update({
+        "阿里巴巴集团": 40,
+        "阿里云": 25,
+        "阿里巴巴": 10,
+        "蚂蚁集团": 30,
+        "OpenAI": 12,
+        "Open Source": 3,
+        "Microsoft": 50,
+    })
+    return index
+
+
+def test_normalize_label():
+    assert normalize_label("  ＯｐｅｎＡＩ\t Inc ") == "openai inc"
+
+
+def test_prefix_ranked_by_match_then_degree():
+    index = build_index()
+    results = index.search("阿里", limit=5)
+    assert [label for label, _, _ in results] == ["阿里巴巴集团", "阿里云", "阿里巴巴"]
+    assert {match for _, _, match in results} == {"prefix"}
+
+    exact = index.search("阿里巴巴")
+    assert exact[0] == ("阿里巴巴", 10, "exact")
+    assert exact[1][0] == "阿里巴巴集团"
+
+    assert [label for label, _, _ in index.search("open")] == ["OpenAI", "Open Source"]
+
+
+def test_substring_and_fuzzy():
+    index = build_index()
+    assert index.search("集团")[:2] == [("阿里巴巴集团", 40, "substring"), ("蚂蚁集团", 30, "substring")]
+    # 拼写错误
+    fuzzy = index.search("microsft")
+    assert fuzzy[0] == ("Microsoft", 50, "fuzzy")
+    assert index.search("microsft", fuzzy=False) == []
+
+
+def test_incremental_updates():
+    index = build_index()
+    index.update({"阿里云": 60, "阿里影业": 1}, removed=["阿里巴巴集团"])
+    assert "阿里巴巴集团" not in index and len(index) == 7
+    assert [label for label, _, _ in index.search("阿里")] == ["阿里云", "阿里巴巴", "阿里影业"]
+    assert index.search("集团") == [("蚂蚁集团", 30, "substring")]
+    # 空查询返回度数最高的实体
+    assert [label for label, _, _ in index.search("", limit=2)] == ["阿里云", "Microsoft"]
+
+
+if __name__ == "__main__":
+    test_normalize_label()
+    test_prefix_ranked_by_match_then_degree()
+    test_substring_and_fuzzy()
+    test_incremental_updates()
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from backend.agent.models.local_embeddings import LocalEmbeddings
+
+VOCAB = ["<pad>", "<unk>"] + [f"w{i}" for i in range(50)]
+DIM = 8
+
+
+def build_model_dir(path: str) -> np.ndarray:
+    """生成一个最小的ONNX模型（last_hidden_state = 词向量查表）和对应的tokenizer.json"""
+    tokenizer = Tokenizer(WordLevel({token: idx for idx, token in enumerate(VOCAB)}, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(os.path.join(path, "tokenizer.json"))
+
+    table = np.random.default_rng(0).random((len(VOCAB), DIM), dtype=np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "toy",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "seq"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "seq", DIM])],
+        [numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, os.path.join(path, "model.onnx"))
+    return table
+
+
+def expected_vector(table: np.ndarray, text: str, max_seq_length: int = 512) -> np.ndarray:
+    ids = [VOCAB.index(word) for word in text.split()][:max_seq_length]
+    vector = table[ids].mean(axis=0)
+    return vector / np.linalg.norm(vector)
+
+
+def test_dynamic_batches_keep_order_and_mean_pooling():
+    with tempfile.TemporaryDirectory() as tmp:
+        table = build_model_dir(tmp)
+        embeddings = LocalEmbeddings(tmp, batch_size=2, max_batch_tokens=8, num_workers=2)
+        texts = ["w1 w2 w3 w4 w5", "w6", "w7 w8", "w9 w10 w11", "w12"]
+
+        vectors = embeddings.embed_documents(texts)
+        async_vectors = asyncio.run(embeddings.aembed_documents(texts))
+        embeddings.close()
+
+        assert len(vectors) == len(texts)
+        for text, vector, async_vector in zip(texts, vectors, async_vectors):
+            assert np.allclose(vector, expected_vector(table, text), atol=1e-5)
+            assert np.allclose(vector, async_vector)
+
+
+def test_plan_batches_respects_limits():
+    with tempfile.TemporaryDirectory() as tmp:
+        build_model_dir(tmp)
+        embeddings = LocalEmbeddings(tmp, batch_size=3, max_batch_tokens=600, max_seq_length=100)
+        lengths = [100, 1, 2, 90, 3, 4, 5]
+        batches = embeddings.plan_batches(lengths)
+        embeddings.close()
+
+        assert sorted(idx for batch in batches for idx in batch) == list(range(len(lengths)))
+        for batch in batches:
+            assert len(batch) <= 3
+            assert len(batch) * max(lengths[idx] for idx in batch) <= 600
+        # 短文本与长文本分在不同批次
+        assert [1, 2, 4] in batches
+        print(batches)
+
+
+def test_truncation_prefix_and_mmap():
+    with tempfile.TemporaryDirectory() as tmp:
+        table = build_model_dir(tmp)
+        embeddings = LocalEmbeddings(tmp, max_seq_length=2, query_prefix="w0 ", dimensions=4)
+
+        vector = embeddings.embed_query("w1 w2 w3")
+        embeddings.close()
+
+        expected = table[[VOCAB.index("w0"), VOCAB.index("w1")]].mean(axis=0)[:4]
+        assert np.allclose(vector, expected / np.linalg.norm(expected), atol=1e-5)
+        assert embeddings.model_path.endswith("model.mmap.onnx")
+        assert os.path.isfile(os.path.join(tmp, "model.mmap.onnx_data"))
+
+
+if __name__ == "__main__":
+    test_dynamic_batches_keep_order_and_mean_pooling()
+    test_plan_batches_respects_limits()
+    test_truncation_prefix_and_mmap()
@@ -0,0 +1,68 @@
+import re
+import threading
+
+from backend.rag.storage.milvus_storage import MilvusStorage
+
+
+class BoundedMilvusClient:
+    """模拟Bounded一致性的Milvus客户端：只有Strong查询能立即看到删除结果"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.snapshot = list(rows)
+
+    def has_collection(self, collection_name):
+        return True
+
+    def _match(self, row, filter_expr):
+        name = re.fullmatch(r'document_name == "(.*)"', filter_expr)
+        if name:
+            return row["document_name"] == name.group(1)
+        texts = re.fullmatch(r"text in \[(.*)\]", filter_expr)
+        return row["text"] in re.findall(r'"(.*?)"', texts.group(1))
+
+    def query(self, collection_name, filter, output_fields, consistency_level=None):
+        rows = self.rows if consistency_level == "Strong" else self.snapshot
+        return [{field: row[field] for field in output_fields} for row in rows if self._match(row, filter)]
+
+    def delete(self, collection_name, filter):
+        before = len(self.rows)
+        self.rows = [row for row in self.rows if not self._match(row, filter)]
+        return {"delete_count": before - len(self.rows)}
+
+
+class FakeVectorStore:
+    _text_field = "text"
+    _primary_field = "pk"
+
+    def __init__(self, client):
+        self.client = client
+
+
+def make_storage(rows):
+    storage = MilvusStorage.__new__(MilvusStorage)
+    storage.collection_name = "kb_test"
+    storage.shared_collection = None
+    storage.vector_store = FakeVectorStore(BoundedMilvusClient(rows))
+    storage._known_chunk_ids = set()
+    storage._known_chunk_ids_lock = threading.Lock()
+    return storage
+
+
+def test_delete_returns_texts_no_longer_used():
+    storage = make_storage([
+        {"document_name": "a.md", "text": "独有内容"},
+        {"document_name": "a.md", "text": "共享内容"},
+        {"document_name": "b.md", "text": "共享内容"},
+    ])
+
+    result = storage.delete_document("a.md", return_texts=True)
+
+    assert result["status"] == "success" and result["deleted_count"] == 2
+    # 删除后立即检查文本是否仍被使用，不能读到刚删除的分块
+    assert result["deleted_texts"] == ["独有内容"]
+    assert result["deleted_documents"] == ["a.md"]
+
+
+if __name__ == "__main__":
+    test_delete_returns_texts_no_longer_used()
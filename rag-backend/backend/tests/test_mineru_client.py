@@ -0,0 +1,83 @@
+import asyncio
+import tempfile
+
+import httpx
+
+from backend.rag.chunks.mineru_client import AsyncMinerUClient, MinerUError, get_shared_client
+from backend.tests.mock_mineru_server import MOCK_API_KEY, create_app
+
+
+def make_client(app, output_dir, **kwargs):
+    return AsyncMinerUClient(
+        api_url="http://mineru.test/api/v4",
+        api_key=MOCK_API_KEY,
+        poll_interval=0.01,
+        max_poll_interval=0.05,
+        output_dir=output_dir,
+        transport=httpx.ASGITransport(app=app),
+        **kwargs,
+    )
+
+
+def test_extract_single_pdf():
+    app = create_app(polls_until_done=3)
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            async with make_client(app, tmp) as client:
+                return await client.extract("https://example.com/manual.pdf")
+
+    text = asyncio.run(run())
+    assert "来源: https://example.com/manual.pdf" in text
+    print(text)
+
+
+def test_extract_many_with_concurrency_cap():
+    app = create_app(polls_until_done=2)
+    urls = [f"https://example.com/doc{i}.pdf" for i in range(6)] + ["https://example.com/fail.pdf"]
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            async with make_client(app, tmp, max_concurrency=2) as client:
+                return await client.extract_many(urls)
+
+    results = asyncio.run(run())
+    assert all(f"doc{i}.pdf" in results[i] for i in range(6))
+    assert isinstance(results[-1], MinerUError)
+    assert app.state.max_running <= 2
+    print(f"最大同时运行任务数: {app.state.max_running}")
+
+
+def test_poll_timeout():
+    app = create_app(polls_until_done=10 ** 6)
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            async with make_client(app, tmp, max_wait_time=0.2) as client:
+                await client.extract("https://example.com/slow.pdf")
+
+    try:
+        asyncio.run(run())
+    except MinerUError as e:
+        print(f"超时: {e}")
+    else:
+        raise AssertionError("应当超时")
+
+
+def test_shared_client_per_event_loop(monkeypatch):
+    monkeypatch.setenv("MINERU_API_URL", "http://mineru.test/api/v4")
+    monkeypatch.setenv("MINERU_API_KEY", MOCK_API_KEY)
+
+    async def run():
+        return get_shared_client(), get_shared_client()
+
+    first, second = asyncio.run(run())
+    assert first is second
+    # 新的事件循环使用新的客户端
+    assert asyncio.run(run())[0] is not first
+
+
+if __name__ == "__main__":
+    test_extract_single_pdf()
+    test_extract_many_with_concurrency_cap()
+    test_poll_timeout()
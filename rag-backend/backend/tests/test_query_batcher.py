@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from backend.agent.models.query_batcher import QueryBatchingEmbeddings
+
+
+class RecordingEmbeddings(Embeddings):
+    """记录每次批量请求的假向量模型"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_concurrent_threads_share_batches():
+    provider = RecordingEmbeddings()
+    batcher = QueryBatchingEmbeddings(provider, window_ms=50, max_batch_size=4)
+    queries = [f"q{i}" * (i + 1) for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        vectors = list(pool.map(batcher.embed_query, queries))
+
+    assert vectors == [[float(len(query)), 1.0] for query in queries]
+    assert len(provider.calls) == 2
+    assert all(len(call) == 4 for call in provider.calls)
+    stats = batcher.stats()
+    assert stats["requests"] == 8 and stats["batches"] == 2
+    assert stats["batch_fill"] == 1.0 and stats["calls_saved"] == 6
+    print(stats)
+
+
+def test_async_callers_window_and_dedup():
+    provider = RecordingEmbeddings()
+    batcher = QueryBatchingEmbeddings(provider, window_ms=20, max_batch_size=10)
+
+    async def main():
+        return await asyncio.gather(*(batcher.aembed_query(text) for text in ["a", "bb", "a"]))
+
+    vectors = asyncio.run(main())
+
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    # 窗口内的查询合并为一批，重复查询只向量化一次
+    assert provider.calls == [["a", "bb"]]
+    stats = batcher.stats()
+    assert stats["batch_fill"] == 0.3
+    assert stats["queue_delay_p99_ms"] >= 10
+    print(stats)
+
+
+def test_errors_reach_every_caller():
+    batcher = QueryBatchingEmbeddings(RecordingEmbeddings(fail=True), window_ms=5, max_batch_size=10)
+    with pytest.raises(RuntimeError):
+        batcher.embed_query("x")
+    assert batcher.stats()["errors"] == 1
+
+
+if __name__ == "__main__":
+    test_concurrent_threads_share_batches()
+    test_async_callers_window_and_dedup()
+    test_errors_reach_every_caller()
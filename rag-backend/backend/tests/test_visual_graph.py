@@ -0,0 +1,268 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from backend.param.visual_graph import KnowledgeGraph, KnowledgeGraphNode
+from backend.rag.storage import lightrag_storage
+from backend.service import visual_graph
+from backend.service.visual_graph import VisualGraphService, notify_graph_changed, to_compact
+
+
+class FakeGraphStorage:
+    """内存中的图存储，记录查询次数"""
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.calls = 0
+        self.label_loads = 0
+        self.traversals = 0
+
+    def _nodes(self):
+        return {node for edge in self.edges for node in edge}
+
+    async def get_node(self, node_id):
+        self.calls += 1
+        return {"entity_id": node_id, "entity_type": "person"} if node_id in self._nodes() else None
+
+    async def get_node_edges(self, node_id):
+        return [(s, t) for s, t in self.edges if node_id in (s, t)]
+
+    async def node_degrees_batch(self, node_ids):
+        return {n: sum(n in edge for edge in self.edges) for n in node_ids}
+
+    async def get_nodes_batch(self, node_ids):
+        nodes = self._nodes()
+        return {n: {"entity_id": n, "entity_type": "person"} for n in node_ids if n in nodes}
+
+    async def get_edges_batch(self, pairs):
+        return {(p["src"], p["tgt"]): {"weight": 2.0} for p in pairs}
+
+    async def get_all_nodes(self):
+        self.calls += 1
+        return [{"id": n, "entity_type": "person"} for n in sorted(self._nodes())]
+
+    async def get_all_edges(self):
+        return [{"source": s, "target": t, "weight": 1.0} for s, t in self.edges]
+
+    async def get_all_labels(self):
+        self.label_loads += 1
+        return sorted(self._nodes())
+
+
+class FakeRag:
+    def __init__(self, graph):
+        self.chunk_entity_relation_graph = graph
+
+    async def get_knowledge_graph(self, node_label, max_depth, max_nodes):
+        self.chunk_entity_relation_graph.traversals += 1
+        return KnowledgeGraph(nodes=[KnowledgeGraphNode(id=node_label, labels=[node_label], properties={})])
+
+
+class FakeStorage:
+    def __init__(self, graph):
+        self.rag = FakeRag(graph)
+
+
+class FailingRedis:
+    async def get(self, key):
+        raise ConnectionError("redis down")
+
+    async def incr(self, key):
+        raise ConnectionError("redis down")
+
+
+class MemoryRedis:
+    """只实现版本号和变更日志用到的命令"""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    async def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    # hub 连接 a..e，其中 a 的度数最高
+    fake = FakeGraphStorage([("hub", n) for n in "abcde"] + [("a", "x"), ("a", "y"), ("b", "x")])
+
+    @asynccontextmanager
+    async def shared_storage(workspace):
+        yield FakeStorage(fake)
+
+    async def get_redis_client():
+        return FailingRedis()
+
+    monkeypatch.setattr(visual_graph, "shared_storage", shared_storage)
+    monkeypatch.setattr(visual_graph, "get_redis_client", get_redis_client)
+    visual_graph._GRAPH_CACHE.clear()
+    visual_graph._SUMMARY_CACHE.clear()
+    visual_graph._LABEL_INDEXES.clear()
+    return fake
+
+
+def test_neighbors_paginated_by_degree(graph):
+    service = VisualGraphService("kb_test")
+    first = asyncio.run(service.get_neighbors("hub", offset=0, limit=2))
+    second = asyncio.run(service.get_neighbors("hub", offset=2, limit=2))
+
+    assert [node.id for node in first.graph.nodes] == ["hub", "a", "b"]
+    assert first.page.total == 5 and first.page.has_more
+    assert [node.id for node in second.graph.nodes] == ["hub", "c", "d"]
+    assert {(edge.source, edge.target) for edge in first.graph.edges} == {("hub", "a"), ("hub", "b")}
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.get_neighbors("missing"))
+
+
+def test_cache_invalidated_by_graph_version(graph):
+    service = VisualGraphService("kb_test")
+    asyncio.run(service.get_neighbors("hub", limit=2))
+    asyncio.run(service.get_neighbors("hub", limit=2))
+    assert graph.calls == 1
+
+    graph.edges.append(("hub", "f"))
+    asyncio.run(notify_graph_changed("kb_test"))
+    result = asyncio.run(service.get_neighbors("hub", limit=10))
+    assert graph.calls == 2
+    assert result.page.total == 6
+
+
+def test_compact_encoding(graph):
+    neighbors = asyncio.run(VisualGraphService("kb_test").get_neighbors("hub", limit=3))
+    compact = to_compact(neighbors.graph)
+
+    assert compact.node_ids == ["hub", "a", "b", "c"]
+    assert compact.entity_types == ["person"] and compact.node_types == [0, 0, 0, 0]
+    assert compact.edges == [0, 1, 0, 2, 0, 3]
+    assert compact.edge_weights == [2.0, 2.0, 2.0]
+    assert compact.is_truncated
+
+
+def test_overview_and_cluster_drill_down(graph):
+    # 追加两个互不相连的稠密社区
+    graph.edges += [(f"p{i}", f"p{j}") for i in range(6) for j in range(i + 1, 6)]
+    graph.edges += [(f"q{i}", f"q{j}") for i in range(5) for j in range(i + 1, 5)]
+    service = VisualGraphService("kb_test")
+
+    overview = asyncio.run(service.get_overview(rank_by="degree", top_nodes=3))
+    assert overview.total_nodes == 19
+    assert sum(cluster.size for cluster in overview.clusters) == 19
+    assert overview.graph.nodes[0].id == "hub"
+    assert {"x", "y", "cluster"} <= set(overview.graph.nodes[0].properties)
+
+    p_cluster = next(c for c in overview.clusters if c.label.startswith("p"))
+    detail = asyncio.run(service.get_cluster(p_cluster.id, limit=4, rank_by="degree"))
+    assert detail.page.total == 6 and detail.page.has_more
+    assert all(node.id.startswith("p") for node in detail.graph.nodes)
+    assert len(detail.graph.edges) == 6
+    assert len(to_compact(detail.graph).positions) == 8
+
+    # 摘要只计算一次，版本变化后重新计算
+    asyncio.run(service.get_overview())
+    assert graph.calls == 1
+    asyncio.run(notify_graph_changed("kb_test"))
+    asyncio.run(service.get_overview())
+    assert graph.calls == 2
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.get_cluster(99))
+
+
+def test_label_index_incremental_updates(graph, monkeypatch):
+    redis = MemoryRedis()
+
+    async def get_redis_client():
+        return redis
+
+    monkeypatch.setattr(visual_graph, "get_redis_client", get_redis_client)
+    service = VisualGraphService("kb_test")
+
+    result = asyncio.run(service.search_labels("h"))
+    assert [(m.label, m.degree, m.match) for m in result.labels] == [("hub", 5, "prefix")]
+    assert result.total_labels == 8 and graph.label_loads == 1
+
+    # 新增实体并记录变更日志，索引只更新受影响的实体
+    graph.edges += [("hub", "helix"), ("helix", "a")]
+    asyncio.run(notify_graph_changed("kb_test", entities=["hub", "helix", "a"]))
+    result = asyncio.run(service.search_labels("h"))
+    assert [(m.label, m.degree) for m in result.labels] == [("hub", 6), ("helix", 2)]
+    assert graph.label_loads == 1
+
+    # 删除实体
+    graph.edges = [edge for edge in graph.edges if "helix" not in edge]
+    asyncio.run(notify_graph_changed("kb_test", entities=["helix", "hub", "a"]))
+    assert [m.label for m in asyncio.run(service.search_labels("hel")).labels] == []
+    assert graph.label_loads == 1
+
+    # 未记录实体的变更全量重建
+    asyncio.run(notify_graph_changed("kb_test"))
+    asyncio.run(service.search_labels("a"))
+    assert graph.label_loads == 2
+
+
+def test_unknown_label_skips_traversal(graph):
+    service = VisualGraphService("kb_test")
+    asyncio.run(service.get_knowledge_graph("hub"))
+    assert graph.traversals == 1
+
+    # 标签索引加载后，不存在的实体不再遍历图数据库
+    asyncio.run(service.search_labels("hu"))
+    assert asyncio.run(service.get_knowledge_graph("nobody")).nodes == []
+    assert graph.traversals == 1
+    asyncio.run(service.get_knowledge_graph("a"))
+    assert graph.traversals == 2
+
+
+class FakeLightRAGStorage:
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.initialized = self.finalized = False
+
+    async def initialize(self):
+        self.initialized = True
+
+    async def finalize(self):
+        self.finalized = True
+
+
+def test_shared_storage_evicts_only_idle_workspaces(monkeypatch):
+    monkeypatch.setattr(lightrag_storage, "LightRAGStorage", FakeLightRAGStorage)
+    monkeypatch.setenv("LIGHTRAG_MAX_SHARED_WORKSPACES", "1")
+    lightrag_storage._SHARED_STORAGES.clear()
+
+    async def scenario():
+        async with lightrag_storage.shared_storage("kb_a") as first:
+            # kb_a 仍在使用时被 kb_b 淘汰，不会立即释放
+            async with lightrag_storage.shared_storage("kb_b") as second:
+                assert first.initialized and second.initialized
+                assert list(lightrag_storage._SHARED_STORAGES) == ["kb_b"]
+                assert not first.finalized
+        assert first.finalized and not second.finalized
+
+        # 空闲的实例被淘汰时立即释放
+        async with lightrag_storage.shared_storage("kb_c"):
+            assert second.finalized
+        await lightrag_storage.release_shared_storage("kb_c")
+        assert not lightrag_storage._SHARED_STORAGES
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+摄取任务 worker 入口
+从Redis任务队列消费爬取/文档入库任务，与API服务分开部署，可在多台机器上按需扩容。
+
+运行：
+    python worker.py --concurrency 2
+"""
+
+import argparse
+import asyncio
+import signal
+
+from dotenv import load_dotenv
+
+from backend.config.log import setup_default_logging, get_logger
+
+
+async def run_worker(concurrency: int = None):
+    from backend.service.crawl import CRAWL_JOB_TYPE, run_crawl_job
+    from backend.service.ingestion_worker import IngestionWorker
+
+    worker = IngestionWorker(
+        handlers={CRAWL_JOB_TYPE: run_crawl_job},
+        concurrency=concurrency
+    )
+
+    # 收到退出信号后不再领取新任务，等待正在执行的任务完成
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows不支持add_signal_handler
+            pass
+
+    await worker.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="摄取任务worker")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="同时执行的任务数，默认读取环境变量INGEST_WORKER_CONCURRENCY")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_default_logging()
+    get_logger(__name__).info("摄取worker启动中...")
+
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -222,6 +222,28 @@ export const useChatStore = defineStore('chat', () => {
     }
   }
 
+  // 节点失败重试时，后端会从失败节点重新输出token：丢弃这些节点之前已输出的token
+  // tokenSegments 按到达顺序记录 { node, content }，返回过滤后的片段
+  const discardRetriedTokens = (aiMessage, tokenSegments, discardNodes) => {
+    const discard = new Set(discardNodes || [])
+    const kept = tokenSegments.filter(segment => !discard.has(segment.node))
+    if (!aiMessage || kept.length === tokenSegments.length) {
+      return kept
+    }
+    const content = kept.map(segment => segment.content).join('')
+    const messageIndex = messages.value.findIndex(m => m.id === aiMessage.id)
+    if (messageIndex !== -1) {
+      messages.value.splice(messageIndex, 1, { ...messages.value[messageIndex], content })
+    }
+    if (currentConversation.value && !currentConversation.value.saved) {
+      const localAiMessage = currentConversation.value.messages?.find(m => m.id === aiMessage.id)
+      if (localAiMessage) {
+        localAiMessage.content = content
+      }
+    }
+    return kept
+  }
+
   const sendMessage = async (messageData) => {
     // 解析messageData参数
     let content, ragMode, selectedLibrary, conversationIdOverride, collectionId, maxRetrievalDocs, systemPrompt
@@ -280,6 +302,7 @@ export const useChatStore = defineStore('chat', () => {
       // 不在开始时创建AI消息占位符，而是在收到第一个token时创建
       // 这样可以确保AI消息显示在所有node_update消息之后
       let aiMessage = null
+      let tokenSegments = []
 
       // 构造聊天请求数据
       const authStore = useAuthStore()
@@ -343,6 +366,8 @@ export const useChatStore = defineStore('chat', () => {
                 }
               }
 
+              tokenSegments.push({ node: data.node_name, content: data.content })
+
               // 找到消息在数组中的索引
               const messageIndex = messages.value.findIndex(m => m.id === aiMessage.id)
               if (messageIndex !== -1) {
@@ -368,6 +393,18 @@ export const useChatStore = defineStore('chat', () => {
                 }
               }
             }
+          } else if (data.type === 'retry') {
+            // 节点失败重试：丢弃失败节点已输出的token，并显示重试提示
+            console.warn('节点重试:', data)
+            tokenSegments = discardRetriedTokens(aiMessage, tokenSegments, data.discard_nodes)
+            messages.value.push({
+              id: `node-${Date.now()}-${Math.random()}`,
+              content: data.content,
+              role: 'node_update',
+              node_name: data.node_name,
+              timestamp: new Date(),
+              expanded: false
+            })
           } else if (data.type === 'node_update') {
             // 处理节点更新消息
             console.log('收到节点更新:', data)
@@ -488,6 +525,7 @@ export const useChatStore = defineStore('chat', () => {
     try {
       streaming.value = true
       let aiMessage = null
+      let tokenSegments = []
 
       const authStore = useAuthStore()
       const chatData = {
@@ -511,6 +549,17 @@ export const useChatStore = defineStore('chat', () => {
           
           if (data.type === 'start') {
             console.log('🚀 开始接收流式数据')
+          } else if (data.type === 'retry') {
+            console.warn('🔁 节点重试:', data.discard_nodes)
+            tokenSegments = discardRetriedTokens(aiMessage, tokenSegments, data.discard_nodes)
+            messages.value.push({
+              id: `node-${Date.now()}-${Math.random()}`,
+              content: data.content || '',
+              role: 'node_update',
+              node_name: data.node_name,
+              timestamp: new Date(),
+              expanded: false
+            })
           } else if (data.type === 'node_update') {
             console.log('📍 节点更新:', data.node_name)
             const nodeUpdateMessage = {
@@ -555,6 +604,7 @@ export const useChatStore = defineStore('chat', () => {
                 }
               }
 
+              tokenSegments.push({ node: data.node_name, content: data.content })
               const messageIndex = messages.value.findIndex(m => m.id === aiMessage.id)
               if (messageIndex !== -1) {
                 const currentMsg = messages.value[messageIndex]